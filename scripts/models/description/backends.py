@@ -0,0 +1,198 @@
+"""
+LLM backends of the description stage.
+
+A backend answers one chat prompt at a time through
+`await backend.complete(system_prompt, prompt, max_tokens, json_mode)`:
+
+- "openai": any OpenAI-compatible HTTP server (api.openai.com, or a local
+  llama.cpp / vLLM server through gpt.base_url). Concurrent requests are sent
+  at the same time over one connection pool, the server batches them.
+- "local": a transformers text-generation model on the CPU of this process.
+  The model is loaded once per process and requests from every video of a
+  batch run (any thread or event loop) are grouped into batched generate calls.
+
+`backend.supports_json` tells whether json_mode is honoured; the local backend
+has no constrained decoding, so gpt.mode "structured" asks for each field
+separately there.
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class OpenAIBackend:
+    """OpenAI-compatible chat completions over HTTP (one client per `async with` session)."""
+
+    supports_json = True  # response_format json_object
+
+    def __init__(self, api_key, model, base_url=None, timeout=60.0, max_retries=2):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._client = None
+
+    async def start(self):
+        import openai
+
+        self._client = openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                          timeout=self.timeout, max_retries=self.max_retries)
+
+    async def close(self):
+        await self._client.close()
+        self._client = None
+
+    async def complete(self, system_prompt, prompt, max_tokens, json_mode=False):
+        extra = {"response_format": {"type": "json_object"}} if json_mode else {}
+        response = await self._client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt},
+            ],
+            max_tokens=max_tokens,
+            **extra,
+        )
+        return response.choices[0].message.content or ""
+
+
+class LocalBackend:
+    """
+    transformers chat model on the CPU. Requests wait up to `batch_wait`
+    seconds for others and are generated `batch_size` at a time by one worker
+    thread, so the model isn't run once per prompt.
+    """
+
+    supports_json = False  # plain generation, json_mode would not be enforced
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, model, batch_size=8, batch_wait=0.05):
+        self.model = model
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.batches = 0
+        self._queue = queue.Queue()
+        self._pipe = None
+        self._worker = threading.Thread(target=self._run, name=f"llm-{model}", daemon=True)
+        self._worker.start()
+
+    @classmethod
+    def shared(cls, model, batch_size=8, batch_wait=0.05):
+        """The backend of `model` shared by the whole process (the model is loaded once)."""
+        with cls._shared_lock:
+            if model not in cls._shared:
+                cls._shared[model] = cls(model, batch_size, batch_wait)
+            return cls._shared[model]
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass  # shared, stays loaded for the next videos
+
+    def _load(self):
+        from transformers import pipeline
+
+        print(f"loading the local model {self.model} ...")
+        pipe = pipeline("text-generation", model=self.model, device="cpu")
+        # batched generation pads the prompts on the left
+        pipe.tokenizer.padding_side = "left"
+        if pipe.tokenizer.pad_token is None:
+            pipe.tokenizer.pad_token = pipe.tokenizer.eos_token
+        return pipe
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                if self._pipe is None:
+                    self._pipe = self._load()
+                outputs = self._pipe(
+                    [messages for messages, _, _ in batch],
+                    max_new_tokens=max(max_tokens for _, max_tokens, _ in batch),
+                    batch_size=len(batch),
+                    return_full_text=False,
+                    do_sample=False,
+                )
+                self.batches += 1
+                for (_, _, future), output in zip(batch, outputs):
+                    future.set_result(output[0]["generated_text"].strip())
+            except Exception as e:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def complete(self, system_prompt, prompt, max_tokens, json_mode=False):
+        if json_mode:
+            raise ValueError("the local backend has no json mode, check supports_json first")
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt},
+        ]
+        future = Future()
+        self._queue.put((messages, max_tokens, future))
+        return await asyncio.wrap_future(future)
+
+
+BACKENDS = ["openai", "local"]
+
+
+def create_backend(config):
+    """Backend of a GptConfig."""
+    if config.backend == "local":
+        return LocalBackend.shared(config.local_model, config.batch_size, config.batch_wait)
+    return OpenAIBackend(config.api_key, config.model, config.base_url, config.timeout, config.max_retries)
+
+
+class LatencyMetrics:
+    """Latency of every completion call, by request kind; shared by the videos of a batch run."""
+
+    def __init__(self):
+        self.calls = []  # (kind, seconds, cached)
+        self._lock = threading.Lock()
+
+    def record(self, kind, seconds, cached=False):
+        with self._lock:
+            self.calls.append((kind, seconds, cached))
+
+    def summary(self):
+        """{kind: {"calls", "cached", "mean", "p50", "p95", "max"}} with the latencies of uncached calls."""
+        with self._lock:
+            calls = list(self.calls)
+        summary = {}
+        for kind in sorted({kind for kind, _, _ in calls}):
+            latencies = sorted(seconds for k, seconds, cached in calls if k == kind and not cached)
+            cached = sum(1 for k, _, c in calls if k == kind and c)
+            entry = {"calls": len(latencies) + cached, "cached": cached}
+            if latencies:
+                entry.update(
+                    mean=sum(latencies) / len(latencies),
+                    p50=latencies[len(latencies) // 2],
+                    p95=latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                    max=latencies[-1],
+                )
+            summary[kind] = entry
+        return summary
+
+    def print_summary(self):
+        for kind, entry in self.summary().items():
+            line = f"[llm] {kind}: {entry['calls']} calls ({entry['cached']} cached)"
+            if "mean" in entry:
+                line += (f", mean {entry['mean']:.2f}s p50 {entry['p50']:.2f}s "
+                         f"p95 {entry['p95']:.2f}s max {entry['max']:.2f}s")
+            print(line)
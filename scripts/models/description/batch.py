@@ -0,0 +1,130 @@
+"""
+Metadata (title, description, hashtags) of many subtitle files in one request stream.
+
+All videos share one client (one connection pool) and their requests are in
+flight at the same time, bounded by `gpt.max_concurrent` videos and by a rate
+limiter on requests and tokens per minute, so a whole batch takes about one
+request round trip instead of one per video. Each result is appended to a
+JSONL file as soon as it is ready; running the same batch again skips the
+subtitles that already have a result.
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+from scripts.src.cancel import Cancelled, check
+from scripts.models.description.backends import LatencyMetrics
+from scripts.models.description.client import ChatClient
+from scripts.models.description.gpt import agenerate_with, prompt_content, read_subtitle_file
+
+
+class RateLimiter:
+    """
+    Token buckets of requests and tokens per minute (None for no limit).
+    `await limiter.acquire(tokens)` waits until one more request of `tokens`
+    tokens fits; waiters are served in order.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.limits = [limit for limit in (requests_per_minute, tokens_per_minute)]
+        self.levels = [limit or 0 for limit in self.limits]
+        self.updated = time.monotonic()
+        self.waited = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed, self.updated = now - self.updated, now
+        self.levels = [min(limit, level + elapsed * limit / 60) if limit else 0
+                       for limit, level in zip(self.limits, self.levels)]
+
+    async def acquire(self, tokens=0):
+        async with self._lock:
+            while True:
+                self._refill()
+                # a request larger than the whole bucket waits for a full bucket
+                needs = [min(amount, limit) if limit else 0 for amount, limit in zip((1, tokens), self.limits)]
+                waits = [(need - level) * 60 / limit if limit and level < need else 0.0
+                         for need, level, limit in zip(needs, self.levels, self.limits)]
+                if max(waits) <= 0:
+                    self.levels = [level - need for level, need in zip(self.levels, needs)]
+                    return
+                self.waited += max(waits)
+                await asyncio.sleep(max(waits))
+
+
+def finished(output_path):
+    """Subtitle paths that already have a result (no error) in the JSONL file."""
+    done = set()
+    try:
+        with open(output_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # a line cut by a crash
+                if not record.get("error"):
+                    done.add(record["subtitle"])
+    except OSError:
+        pass
+    return done
+
+
+async def agenerate_batch(subtitle_paths, output_path, config, cache_dir=None, token=None):
+    """
+    Append one JSONL record per subtitle file to `output_path`:
+    {"subtitle", "title", "description", "hashtags"} or {"subtitle", "error"}.
+    Returns (records written, subtitles skipped as already done).
+    """
+    done = finished(output_path)
+    paths = [os.path.abspath(path) for path in subtitle_paths]
+    todo = [path for path in dict.fromkeys(paths) if path not in done]
+    print(f"[describe] {len(todo)} subtitles to describe, {len(paths) - len(todo)} already done")
+    if not todo:
+        return [], len(paths)
+
+    metrics = LatencyMetrics()
+    # rate limits are an API thing, the local backend is bounded by its batch size
+    limiter = RateLimiter(config.requests_per_minute, config.tokens_per_minute) if config.backend == "openai" else None
+    semaphore = asyncio.Semaphore(config.max_concurrent)
+
+    async def describe(client, path):
+        async with semaphore:
+            check(token)
+            try:
+                content = prompt_content(read_subtitle_file(path), config, cache_dir)
+                title, description, hashtags = await agenerate_with(client, content, config)
+                return {"subtitle": path, "title": title, "description": description, "hashtags": hashtags}
+            except Cancelled:
+                raise
+            except Exception as e:
+                return {"subtitle": path, "error": f"{type(e).__name__}: {e}"}
+
+    records = []
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    async with ChatClient.from_config(config, cache_dir, metrics, limiter) as client:
+        tasks = [asyncio.ensure_future(describe(client, path)) for path in todo]
+        try:
+            with open(output_path, 'a', encoding='utf-8') as output:
+                for next_record in asyncio.as_completed(tasks):
+                    record = await next_record
+                    output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    output.flush()
+                    records.append(record)
+                    print(f"[describe] {len(records)}/{len(todo)} {os.path.basename(record['subtitle'])}"
+                          f"{' failed: ' + record['error'] if 'error' in record else ''}")
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    metrics.print_summary()
+    if limiter is not None and limiter.waited:
+        print(f"[describe] waited {limiter.waited:.1f}s for the rate limits")
+    return records, len(paths) - len(todo)
+
+
+def generate_batch(subtitle_paths, output_path, config, cache_dir=None, token=None):
+    return asyncio.run(agenerate_batch(subtitle_paths, output_path, config, cache_dir, token))
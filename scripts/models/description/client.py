@@ -0,0 +1,113 @@
+"""
+Async chat client of the description stage.
+
+The client sends the prompts to a backend (backends.py: an OpenAI-compatible
+HTTP server with pooled connections, timeouts and retries, or a local model)
+and records the latency of every call. Responses are cached on disk by
+(model, prompt, content hash): generating the metadata of an unchanged
+transcript again costs no request.
+"""
+import hashlib
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+from scripts.src.files import atomic_write_text
+from scripts.models.description.backends import LatencyMetrics, create_backend
+from scripts.models.description.digest import estimate_tokens
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Response texts as <dir>/<key[:2]>/<key>.json files."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    @staticmethod
+    def key(model, system_prompt, prompt, content, max_tokens, json_mode=False):
+        payload = json.dumps([model, system_prompt, prompt, content_hash(content), max_tokens, json_mode],
+                             ensure_ascii=False)
+        return content_hash(payload)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as file:
+                return json.load(file)["text"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key, text):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write_text(path, json.dumps({"text": text}, ensure_ascii=False))
+
+
+class ChatClient:
+    """
+    async with ChatClient(backend, model, ...) as client:
+        text = await client.complete(system_prompt, prompt_template, content, max_tokens)
+
+    `backend` is one of backends.py; `model` names it in the cache key.
+    `prompt_template` is formatted with {content}; the template and the content
+    hash (not the full prompt) key the cache. The latency of every call goes
+    to `metrics` (a LatencyMetrics, possibly shared by many clients). With a
+    `limiter` (batch.RateLimiter) every request not answered by the cache waits
+    for its share of the rate limits first.
+    """
+
+    def __init__(self, backend, model, cache_dir=None, metrics=None, limiter=None):
+        self.backend = backend
+        self.model = model
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
+        self.metrics = metrics if metrics is not None else LatencyMetrics()
+        self.limiter = limiter
+        self.requests = 0
+        self.cache_hits = 0
+
+    @classmethod
+    def from_config(cls, config, cache_dir=None, metrics=None, limiter=None):
+        """Client of the configured backend; the cache is used only if config.cache is set."""
+        model = config.local_model if config.backend == "local" else config.model
+        return cls(create_backend(config), f"{config.backend}:{model}", cache_dir if config.cache else None, metrics,
+                   limiter)
+
+    async def __aenter__(self):
+        await self.backend.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.backend.close()
+
+    async def complete(self, system_prompt, prompt_template, content, max_tokens, json_mode=False, kind="chat"):
+        """Text of the assistant answer (a json string with json_mode)."""
+        start = time.perf_counter()
+        key = None
+        if self.cache is not None:
+            key = ResponseCache.key(self.model, system_prompt, prompt_template, content, max_tokens, json_mode)
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache_hits += 1
+                self.metrics.record(kind, time.perf_counter() - start, cached=True)
+                return cached
+
+        prompt = prompt_template.format(content=content)
+        if self.limiter is not None:
+            # the API counts max_tokens against the token limit too
+            await self.limiter.acquire(estimate_tokens(system_prompt + prompt) + max_tokens)
+            start = time.perf_counter()
+        self.requests += 1
+        text = await self.backend.complete(system_prompt, prompt, max_tokens, json_mode)
+        self.metrics.record(kind, time.perf_counter() - start)
+
+        if key is not None:
+            self.cache.put(key, text)
+        return text
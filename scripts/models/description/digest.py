@@ -0,0 +1,148 @@
+"""
+Token-budgeted transcript digest for the description prompts.
+
+Long transcripts make every prompt slow and expensive, or too long for the
+context. The digest keeps the most informative sentences (TextRank over
+TF-IDF sentence vectors, in plain Python) in their original order until the
+token budget is used, and is cached per transcript so the title, description
+and hashtag prompts (and re-runs) share it.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+from scripts.src.files import atomic_write_text
+
+DIGEST_VERSION = 1
+# above this many sentences the similarity graph is skipped, sentences are scored by TF-IDF alone
+MAX_GRAPH_SENTENCES = 3000
+
+_encoding = None
+
+
+def estimate_tokens(text):
+    """Token count with tiktoken if it is installed, else ~4 characters per token."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return max(1, math.ceil(len(text) / 4))
+
+
+def split_sentences(text):
+    sentences = re.split(r'(?<=[.!?؟。])\s+', text.strip())
+    return [sentence.strip() for sentence in sentences if sentence.strip()]
+
+
+def _terms(sentence):
+    return [word for word in re.findall(r'\w+', sentence.lower()) if len(word) > 2]
+
+
+def tfidf_vectors(sentences):
+    """Normalized {term: weight} vector of every sentence, sentences being the documents."""
+    term_lists = [_terms(sentence) for sentence in sentences]
+    document_frequency = Counter(term for terms in term_lists for term in set(terms))
+    count = len(sentences)
+
+    vectors = []
+    for terms in term_lists:
+        vector = {term: tf * math.log(count / document_frequency[term]) + tf * 1e-3
+                  for term, tf in Counter(terms).items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+        vectors.append({term: weight / norm for term, weight in vector.items()})
+    return vectors
+
+
+def textrank(vectors, damping=0.85, iterations=30, tolerance=1e-6):
+    """PageRank of the sentences over their cosine similarity graph."""
+    count = len(vectors)
+    # only sentences sharing a term are similar; terms in most sentences weigh ~0 and are skipped
+    postings = defaultdict(list)
+    for i, vector in enumerate(vectors):
+        for term, weight in vector.items():
+            postings[term].append((i, weight))
+    similarities = defaultdict(float)
+    for entries in postings.values():
+        if len(entries) > count / 2:
+            continue
+        for a, (i, weight_i) in enumerate(entries):
+            for j, weight_j in entries[a + 1:]:
+                similarities[i, j] += weight_i * weight_j
+
+    neighbours = [[] for _ in range(count)]
+    for (i, j), similarity in similarities.items():
+        neighbours[i].append((j, similarity))
+        neighbours[j].append((i, similarity))
+    totals = [sum(similarity for _, similarity in edges) or 1.0 for edges in neighbours]
+
+    scores = [1.0 / count] * count
+    for _ in range(iterations):
+        new_scores = [(1 - damping) / count + damping * sum(scores[j] * similarity / totals[j]
+                                                            for j, similarity in neighbours[i])
+                      for i in range(count)]
+        if max(abs(a - b) for a, b in zip(scores, new_scores)) < tolerance:
+            return new_scores
+        scores = new_scores
+    return scores
+
+
+def centroid_scores(vectors):
+    """Similarity of every sentence to the whole transcript (linear time)."""
+    centroid = Counter()
+    for vector in vectors:
+        centroid.update(vector)
+    return [sum(weight * centroid[term] for term, weight in vector.items()) for vector in vectors]
+
+
+def transcript_sentences(subtitle_data):
+    # segments end sentences too, whisper output isn't always punctuated
+    return [sentence for item in subtitle_data for sentence in split_sentences(item['text'])]
+
+
+def summarize(sentences, token_budget):
+    """The best of `sentences`, in their original order, within `token_budget` tokens."""
+    vectors = tfidf_vectors(sentences)
+    scores = textrank(vectors) if len(sentences) <= MAX_GRAPH_SENTENCES else centroid_scores(vectors)
+
+    chosen, used = [], 0
+    for i in sorted(range(len(sentences)), key=lambda i: scores[i], reverse=True):
+        tokens = estimate_tokens(sentences[i])
+        if used + tokens <= token_budget:
+            chosen.append(i)
+            used += tokens
+    return " ".join(sentences[i] for i in sorted(chosen))
+
+
+def digest(subtitle_data, token_budget, cache_dir=None):
+    """
+    The transcript text, summarized if it is over `token_budget` tokens (None
+    for no limit). Cached as <cache_dir>/<hash of transcript and budget>.json.
+    """
+    text = " ".join(item['text'] for item in subtitle_data)
+    if not token_budget:
+        return text
+    key = hashlib.sha256(json.dumps([DIGEST_VERSION, token_budget, text], ensure_ascii=False).encode("utf-8")).hexdigest()
+    path = os.path.join(cache_dir, f"{key}.json") if cache_dir else None
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)["digest"]
+
+    tokens = estimate_tokens(text)
+    if tokens <= token_budget:
+        return text
+    summary = summarize(transcript_sentences(subtitle_data), token_budget)
+    print(f"transcript digest: {tokens} -> {estimate_tokens(summary)} tokens")
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        atomic_write_text(path, json.dumps({"digest": summary}, ensure_ascii=False))
+    return summary
@@ -1,139 +1,170 @@
-import openai
+import asyncio
 import json
 import os
-import yaml  # Add yaml import for config parsing
+import re
+import sys
 
-def load_config():
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+from scripts.src.config import load_config as load_full_config
+from scripts.models.description.client import ChatClient
+from scripts.models.description.digest import digest
+
+def load_config(config_path=None):
     """Load GPT configuration settings from config file."""
-    config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), 
-                               "config", "config.yaml")
-    
-    if not os.path.exists(config_path):
-        raise FileNotFoundError(f"Configuration file not found at {config_path}")
-    
-    with open(config_path, 'r') as config_file:
-        config = yaml.safe_load(config_file)
-    
-    # Check if GPT configuration exists
-    if "gpt" not in config:
-        raise ValueError("GPT configuration is missing in the config file")
-    
-    return config["gpt"]
+    return load_full_config(config_path, check_files=False).gpt
 
 def read_subtitle_file(file_path):
     """Read a JSON file containing subtitle data."""
     with open(file_path, 'r') as file:
         return json.load(file)
 
-def generate_instagram_description(subtitle_data, config):
-    """Generate an Instagram description from subtitle data."""
-    # Extract the text from each segment
-    text_segments = [item['text'] for item in subtitle_data]
-    
-    # Combine all text segments
-    full_text = " ".join(text_segments)
-    
-    # Generate description using GPT
-    response = openai.chat.completions.create(
-        model=config.get("model", "gpt-4o"),
-        messages=[
-            {"role": "system", "content": config["description"]["system_prompt"]},
-            {"role": "user", "content": config["description"]["user_prompt_template"].format(content=full_text)}
-        ],
-        max_tokens=config["description"]["max_tokens"]
-    )
-    
-    description = response.choices[0].message.content
-    
+def prompt_content(subtitle_data, config, cache_dir=None):
+    """The transcript, cut down to config.digest_tokens tokens of its most informative sentences."""
+    return digest(subtitle_data, config.digest_tokens, os.path.join(cache_dir, "digests") if cache_dir else None)
+
+def clean_description(description, config):
     # Ensure the description is under max_length characters
-    max_length = config["description"].get("max_length", 150)
+    max_length = config.description.max_length
     if len(description) > max_length:
         description = description[:max_length-3] + "..."
-        
     return description
 
-def generate_hashtags(subtitle_data, config):
-    """Generate 10 relevant hashtags for Instagram based on subtitle content."""
-    # Extract the text from each segment
-    text_segments = [item['text'] for item in subtitle_data]
-    
-    # Combine all text segments
-    full_text = " ".join(text_segments)
-    
-    # Generate hashtags using GPT
-    response = openai.chat.completions.create(
-        model=config.get("model", "gpt-4o"),
-        messages=[
-            {"role": "system", "content": config["hashtags"]["system_prompt"]},
-            {"role": "user", "content": config["hashtags"]["user_prompt_template"].format(content=full_text)}
-        ],
-        max_tokens=config["hashtags"]["max_tokens"]
-    )
-    
-    hashtags_text = response.choices[0].message.content
-    
+def clean_hashtags(hashtags_text, config):
+    """Exactly config.hashtags.count hashtags out of the model answer."""
     # Process the hashtags to ensure we have exactly the requested number
-    import re
     hashtags = re.findall(r'#\w+', hashtags_text)
     
     # If we don't have enough formatted hashtags, extract from a numbered or bulleted list
-    if len(hashtags) != config["hashtags"]["count"]:
+    if len(hashtags) != config.hashtags.count:
         list_items = re.findall(r'[\d\.\*\-]\s*#?(\w+)', hashtags_text)
         hashtags = [f"#{item}" if not item.startswith('#') else item for item in list_items]
     
     # If we still don't have enough hashtags, use any words we can find
-    if len(hashtags) != config["hashtags"]["count"]:
+    if len(hashtags) != config.hashtags.count:
         words = re.findall(r'\b(\w+)\b', hashtags_text)
-        hashtags = [f"#{word.lower()}" for word in words if len(word) > 3][:config["hashtags"]["count"]]
+        hashtags = [f"#{word.lower()}" for word in words if len(word) > 3][:config.hashtags.count]
     
     # Ensure we have exactly the requested number of hashtags
-    if len(hashtags) > config["hashtags"]["count"]:
-        hashtags = hashtags[:config["hashtags"]["count"]]
+    if len(hashtags) > config.hashtags.count:
+        hashtags = hashtags[:config.hashtags.count]
     
     return " ".join(hashtags)
 
-def generate_video_title(subtitle_data, config):
-    """Generate an engaging video title based on subtitle content."""
-    # Extract the text from each segment
-    text_segments = [item['text'] for item in subtitle_data]
-    
-    # Combine all text segments
-    full_text = " ".join(text_segments)
-    
-    # Generate title using GPT
-    response = openai.chat.completions.create(
-        model=config.get("model", "gpt-4o"),
-        messages=[
-            {"role": "system", "content": config["title"]["system_prompt"]},
-            {"role": "user", "content": config["title"]["user_prompt_template"].format(content=full_text)}
-        ],
-        max_tokens=config["title"]["max_tokens"]
-    )
-    
-    title = response.choices[0].message.content.strip()
-    
+def clean_title(title):
+    title = title.strip()
     # Remove quotes if they exist
     if title.startswith('"') and title.endswith('"'):
         title = title[1:-1]
-    
     return title
 
-def main(file_path, output_file=None):
-    """Main function to process subtitle file and generate content."""
+async def agenerate_instagram_description(client, content, config):
+    prompt = config.description
+    text = await client.complete(prompt.system_prompt, prompt.user_prompt_template, content, prompt.max_tokens,
+                                 kind="description")
+    return clean_description(text, config)
+
+async def agenerate_hashtags(client, content, config):
+    prompt = config.hashtags
+    text = await client.complete(prompt.system_prompt, prompt.user_prompt_template, content, prompt.max_tokens,
+                                 kind="hashtags")
+    return clean_hashtags(text, config)
+
+async def agenerate_video_title(client, content, config):
+    prompt = config.title
+    text = await client.complete(prompt.system_prompt, prompt.user_prompt_template, content, prompt.max_tokens,
+                                 kind="title")
+    return clean_title(text)
+
+def structured_prompt(config):
+    """(system prompt, prompt template) asking for title, description and hashtags as one json object."""
+    system_prompt = " ".join([
+        config.title.system_prompt,
+        config.description.system_prompt,
+        config.hashtags.system_prompt,
+        "Answer with a JSON object only.",
+    ])
+    parts = [
+        'Return a JSON object with the string fields "title", "description" and "hashtags".',
+        "title: " + config.title.user_prompt_template.format(content="the content below"),
+        "description: " + config.description.user_prompt_template.format(content="the content below"),
+        "hashtags: " + config.hashtags.user_prompt_template.format(content="the content below"),
+    ]
+    template = "\n\n".join(part.replace("{", "{{").replace("}", "}}") for part in parts)
+    return system_prompt, template + "\n\nContent: {content}"
+
+async def agenerate_structured(client, content, config):
+    """Title, description and hashtags from one json-mode request (None if the answer isn't usable json)."""
+    system_prompt, template = structured_prompt(config)
+    max_tokens = config.title.max_tokens + config.description.max_tokens + config.hashtags.max_tokens
+    text = await client.complete(system_prompt, template, content, max_tokens, json_mode=True, kind="structured")
+    try:
+        data = json.loads(text)
+        hashtags = data["hashtags"]
+        if isinstance(hashtags, list):
+            hashtags = " ".join(str(tag) for tag in hashtags)
+        return (clean_title(str(data["title"])), clean_description(str(data["description"]), config),
+                clean_hashtags(hashtags, config))
+    except (ValueError, KeyError, TypeError):
+        print("structured answer is not valid json, asking for each field separately")
+        return None
+
+async def agenerate_with(client, content, config):
+    """(title, description, hashtags): one structured request, or the three requests at the same time."""
+    result = None
+    # a backend without json mode gets the per-field requests right away
+    if config.mode == "structured" and client.backend.supports_json:
+        result = await agenerate_structured(client, content, config)
+    if result is None:
+        result = await asyncio.gather(
+            agenerate_video_title(client, content, config),
+            agenerate_instagram_description(client, content, config),
+            agenerate_hashtags(client, content, config),
+        )
+    return tuple(result)
+
+async def agenerate_all(subtitle_data, config, cache_dir=None, metrics=None):
+    """agenerate_with() for one subtitle. Call latencies are added to `metrics`."""
+    # one digest shared by the three prompts
+    content = prompt_content(subtitle_data, config, cache_dir)
+    async with ChatClient.from_config(config, cache_dir, metrics) as client:
+        result = await agenerate_with(client, content, config)
+        print(f"{client.requests} requests, {client.cache_hits} cached answers")
+        if metrics is None:
+            client.metrics.print_summary()
+        return result
+
+async def _generate_one(generate, subtitle_data, config, cache_dir=None):
+    # same client, digest and answer cache as agenerate_all
+    async with ChatClient.from_config(config, cache_dir) as client:
+        return await generate(client, prompt_content(subtitle_data, config, cache_dir), config)
+
+def generate_instagram_description(subtitle_data, config, cache_dir=None):
+    """Generate an Instagram description from subtitle data (answers cached in `cache_dir`)."""
+    return asyncio.run(_generate_one(agenerate_instagram_description, subtitle_data, config, cache_dir))
+
+def generate_hashtags(subtitle_data, config, cache_dir=None):
+    """Generate 10 relevant hashtags for Instagram based on subtitle content (answers cached in `cache_dir`)."""
+    return asyncio.run(_generate_one(agenerate_hashtags, subtitle_data, config, cache_dir))
+
+def generate_video_title(subtitle_data, config, cache_dir=None):
+    """Generate an engaging video title based on subtitle content (answers cached in `cache_dir`)."""
+    return asyncio.run(_generate_one(agenerate_video_title, subtitle_data, config, cache_dir))
+
+def main(file_path, output_file=None, config=None, cache_dir=None):
+    """
+    Main function to process subtitle file and generate content. `cache_dir`
+    keeps the model answers (defaults to <cache>/gpt when the config is loaded here).
+    """
     # Load configuration
-    config = load_config()
-    
-    # Set API key
-    openai.api_key = config["api_key"]
+    if config is None:
+        full_config = load_full_config(check_files=False)
+        config = full_config.gpt
+        cache_dir = cache_dir or full_config.cache_dir("gpt")
     
     subtitle_data = read_subtitle_file(file_path)
     
-    # Generate title
-    title = generate_video_title(subtitle_data, config)
-    
-    # Generate Instagram content
-    description = generate_instagram_description(subtitle_data, config)
-    hashtags = generate_hashtags(subtitle_data, config)
+    # Generate title, Instagram description and hashtags together
+    title, description, hashtags = asyncio.run(agenerate_all(subtitle_data, config, cache_dir))
     
     # Prepare output content as JSON
     output_content = {
@@ -1,10 +1,13 @@
 from moviepy.video.compositing.CompositeVideoClip import CompositeVideoClip
 from moviepy.video.io.VideoFileClip import VideoFileClip
+from moviepy.video.VideoClip import ImageClip
 
 import subprocess
 import time
 import os
 from . import segment_parser
+from . import layout_cache
+from .caption_sprites import CaptionSprites
 from SmartAITool.core import cprint
 import arabic_reshaper
 from bidi.algorithm import get_display
@@ -14,6 +17,7 @@ from .text_drawer import (
     get_text_size_ex,
     create_text_ex,
     blur_text_clip,
+    word_offsets,
     Word,
 )
 
@@ -57,18 +61,23 @@ def create_word_objects(text, highlight_word=None, highlight_color=None): #FIXME
 
     return word_list
 
+def highlight_index(text, highlight_word):
+    """Index of the word create_word_objects colors in `text` (its first occurrence, in reversed order), or None."""
+    if not highlight_word:
+        return None
+    highlight_word = highlight_word.strip().lower()
+    for i, w in enumerate(text.split()[::-1]):
+        if process_arabic_text(w).lower() == highlight_word:
+            return i
+    return None
+
 def fits_frame(line_count, font, font_size, stroke_width, frame_width):
-    def fit_function(text):
-        lines = calculate_lines(
-            text,
-            font,
-            font_size,
-            stroke_width,
-            frame_width
-        )
-        return len(lines["lines"]) <= line_count
-    
-    return fit_function
+    def measure(text):
+        return get_text_size_ex(text, font, font_size, stroke_width)[0]
+
+    # Incremental fit check: each word is measured once, not the whole caption for every word.
+    # Captions are processed (reshaped, visual order) whole, as calculate_lines does.
+    return segment_parser.LineFitter(measure, frame_width, line_count, process=process_arabic_text)
 
 def calculate_lines(text, font, font_size, stroke_width, frame_width):
     global lines_cache
@@ -158,49 +167,27 @@ def get_font_path(font):
 
     return font
 
-def add_captions(
-    video_path,
-    subtitle,
-    font="Bangers-Regular.ttf",
-    font_size=130,
-    font_color="yellow",
-    stroke_width=3,
-    stroke_color="black",
-    highlight_current_word=True,
-    word_highlight_color="red",
-    line_count=1,
-    fit_function=None,
+def iter_subcaptions(
+    captions,
+    font,
+    font_size,
+    stroke_width,
+    frame_size,
     padding=50,
-    position=("center", "bottom"),  # Changed default to center-bottom
-    shadow_strength=1.0,
-    shadow_blur=0.1,
-    print_info=False,
-    initial_prompt=None,
-    
+    position=("center", "bottom"),
+    highlight_current_word=True,
 ):
-    _start_time = time.time()
+    """
+    Lay out captions on the frame, lazily.
 
-    font = get_font_path(font)
+    Yields one dict per text shown on screen, in time order:
+    {"start", "end", "current_word", "lines": [{"text", "height", "x", "y", "highlight"}]}
+    where x is "center" or a pixel offset, y a pixel offset and highlight the
+    index of the highlighted word of the line (or None).
+    """
+    frame_width, frame_height = frame_size
+    text_bbox_width = frame_width - padding * 2
 
-            
-    if print_info:
-        print("Generating video elements")
-
-    # Open the video file
-    video = VideoFileClip(video_path)
-    text_bbox_width = video.w - padding * 2
-    clips = [video]
-    
-    captions = segment_parser.parse(
-        segments=subtitle,
-        fit_function=fit_function if fit_function else fits_frame(
-            line_count,
-            font,
-            font_size,
-            stroke_width,
-            text_bbox_width,
-        ),
-    )
     # For each text determine time current word and add in list of captions_to_draw
     for caption in captions:
         captions_to_draw = []
@@ -231,7 +218,7 @@ def add_captions(
             words = caption_item['text'].split(' ')[::-1]
             caption_item['text'] = ' '.join(words)
             
-        for current_index, subcaption in enumerate(captions_to_draw): 
+        for subcaption in captions_to_draw:
             line_data = calculate_lines(subcaption["text"], font, font_size, stroke_width, text_bbox_width)
             
             lines_to_render = line_data["lines"]
@@ -246,7 +233,7 @@ def add_captions(
             if x_pos == "left":
                 x_position = padding
             elif x_pos == "right":
-                x_position = video.w - padding
+                x_position = frame_width - padding
             else:  # center or default
                 x_position = "center"
                 
@@ -254,33 +241,211 @@ def add_captions(
             if y_pos == "top":
                 text_y_offset = padding
             elif y_pos == "bottom":
-                text_y_offset = video.h - line_total_height - padding
+                text_y_offset = frame_height - line_total_height - padding
             else:  # center or default
-                text_y_offset = video.h // 2 - line_total_height // 2
+                text_y_offset = frame_height // 2 - line_total_height // 2
 
+            lines = []
             for line in lines_to_render:
-                pos = (x_position, text_y_offset)
-
-                # Pass the current word that should be highlighted
-                word_list = create_word_objects(
-                    line["text"], 
-                    subcaption["current_word"] if highlight_current_word else None,
-                    word_highlight_color
-                )
-
-                text = create_text_ex(
-                    word_list,
-                    font_size,
-                    font_color,
-                    font,
-                    stroke_color=stroke_color,
-                    stroke_width=stroke_width,
-                )
-                text = text.with_position(pos).with_start(subcaption["start"]).with_end(subcaption["end"])
-                clips.append(text)
-
+                lines.append({
+                    "text": line["text"],
+                    "height": line["height"],
+                    "x": x_position,
+                    "y": text_y_offset,
+                    "highlight": highlight_index(line["text"], subcaption["current_word"]),
+                })
                 text_y_offset += line["height"]
 
+            yield {
+                "start": subcaption["start"],
+                "end": subcaption["end"],
+                "current_word": subcaption["current_word"],
+                "lines": lines,
+            }
+
+def line_words(text):
+    """Words of a caption line in the order create_word_objects draws them."""
+    return [process_arabic_text(w) for w in text.split()[::-1]]
+
+def bitmap_clip(rgb, alpha):
+    return ImageClip(rgb).with_mask(ImageClip(alpha, is_mask=True))
+
+def create_line_clip(
+    line_text,
+    current_word,
+    font,
+    font_size,
+    font_color,
+    stroke_color,
+    stroke_width,
+    word_highlight_color,
+):
+    """Text clip of one caption line with `current_word` (or None) highlighted."""
+    # Pass the current word that should be highlighted
+    word_list = create_word_objects(
+        line_text, 
+        current_word,
+        word_highlight_color
+    )
+
+    return create_text_ex(
+        word_list,
+        font_size,
+        font_color,
+        font,
+        stroke_color=stroke_color,
+        stroke_width=stroke_width,
+    )
+
+def add_captions(
+    video_path,
+    subtitle,
+    font="Bangers-Regular.ttf",
+    font_size=130,
+    font_color="yellow",
+    stroke_width=3,
+    stroke_color="black",
+    highlight_current_word=True,
+    word_highlight_color="red",
+    line_count=1,
+    fit_function=None,
+    padding=50,
+    position=("center", "bottom"),  # Changed default to center-bottom
+    shadow_strength=1.0,
+    shadow_blur=0.1,
+    print_info=False,
+    initial_prompt=None,
+    streaming=False,
+    window_seconds=30.0,
+    layout_path=None,
+):
+    """
+    Burn `subtitle` (whisper segments with words) into the video.
+
+    With streaming=True no caption clip is built up front: captions are laid out
+    and drawn while the video is rendered, keeping only the next
+    `window_seconds` of captions in memory (for hour-long videos).
+    With a `layout_path` the caption layout is loaded from (or saved to) that
+    file, keyed by the transcript, the layout style and the frame size.
+    """
+    _start_time = time.time()
+
+    font = get_font_path(font)
+
+            
+    if print_info:
+        print("Generating video elements")
+
+    # Open the video file (or use the already opened clip)
+    video = VideoFileClip(video_path) if isinstance(video_path, str) else video_path
+    text_bbox_width = video.w - padding * 2
+    clips = [video]
+
+    custom_fit = fit_function is not None
+    fit_function = fit_function if fit_function else fits_frame(
+        line_count,
+        font,
+        font_size,
+        stroke_width,
+        text_bbox_width,
+    )
+
+    def compute_layout():
+        captions = segment_parser.iter_parse(segments=subtitle, fit_function=fit_function)
+        return iter_subcaptions(
+            captions,
+            font,
+            font_size,
+            stroke_width,
+            (video.w, video.h),
+            padding,
+            position,
+            highlight_current_word,
+        )
+
+    layout = compute_layout
+    # a custom fit_function can't be part of the cache key
+    if layout_path and not custom_fit:
+        key = layout_cache.layout_key(
+            subtitle, (video.w, video.h), font, font_size=font_size, stroke_width=stroke_width,
+            line_count=line_count, padding=padding, position=list(position),
+            highlight_current_word=highlight_current_word,
+        )
+        if print_info:
+            found = layout_cache.has_layout(layout_path, key)
+            print(f"Caption layout {'loaded from' if found else 'saved to'}: {layout_path}")
+
+        def layout():
+            # lazy both ways: rows are written as the first pass lays them out and read back one by one
+            if layout_cache.has_layout(layout_path, key):
+                return layout_cache.load_layout(layout_path)
+            return layout_cache.save_layout(layout_path, key, compute_layout())
+
+    def draw_line(line, current_word):
+        return create_line_clip(
+            line["text"],
+            current_word if highlight_current_word else None,
+            font,
+            font_size,
+            font_color,
+            stroke_color,
+            stroke_width,
+            word_highlight_color,
+        )
+
+    # Each line is drawn once in the base color, a highlighted word is a patch over it
+    sprites = CaptionSprites(
+        lambda text: create_line_clip(
+            text, None, font, font_size, font_color, stroke_color, stroke_width, word_highlight_color,
+        ),
+        lambda word: create_text_ex(
+            [Word(word, word_highlight_color)], font_size, font_color, font,
+            stroke_color=stroke_color, stroke_width=stroke_width,
+        ),
+        line_words,
+        lambda words: word_offsets(words, font, font_size),
+        # streaming keeps only recent bitmaps, the others are kept for the whole video
+        max_lines=64 if streaming else None,
+        max_words=1024 if streaming else None,
+    )
+
+    if streaming:
+        from .streaming import StreamingCaptions
+
+        if print_info:
+            print(f"Streaming mode: captions are drawn while rendering ({window_seconds:.0f}s window)")
+        return StreamingCaptions(layout, draw_line, window_seconds, sprites).apply(video)
+
+    base_clips = {}  # one clip per bitmap, the timed copies share its pixels
+    spans = []  # [base layer, line, start, end] of each line on screen, consecutive states merged
+    last_span = {}
+    patches = []
+    for subcaption in layout():
+        for line in subcaption["lines"]:
+            layers = sprites.layers(line["text"], line.get("highlight"))
+            base = layers[0]
+            x = (video.w - base[1].shape[1]) // 2 if line["x"] == "center" else int(line["x"])
+
+            span = last_span.get((line["text"], x, line["y"]))
+            if span is not None and abs(span[3] - subcaption["start"]) < 1e-6:
+                span[3] = subcaption["end"]
+            else:
+                span = [base, (x, line["y"]), subcaption["start"], subcaption["end"]]
+                last_span[(line["text"], x, line["y"])] = span
+                spans.append(span)
+
+            for rgb, alpha, dx in layers[1:]:
+                patches.append(((rgb, alpha), (x + dx, line["y"]), subcaption["start"], subcaption["end"]))
+
+    # the patches go over the base lines
+    for (rgb, alpha, *_), position, start, end in spans + patches:
+        if id(rgb) not in base_clips:
+            base_clips[id(rgb)] = bitmap_clip(rgb, alpha)
+        clips.append(base_clips[id(rgb)].with_position(position).with_start(start).with_end(end))
+
+    if print_info:
+        sprites.report()
+
     end_time = time.time()
     generation_time = end_time - _start_time
 
@@ -292,21 +457,6 @@ def add_captions(
 
     video_with_subtitle = CompositeVideoClip(clips)
 
-    # video_filename = os.path.splitext(os.path.basename(download_video_path))[0]
-
-    # base_dir = os.path.dirname(os.path.dirname(download_video_path))  # Gets output/youtube/11_youtube_Motivate_me
-    # final_video_dir = os.path.join(base_dir, "final_video") 
-    # os.makedirs(final_video_dir, exist_ok=True)
-
-    # output_file = os.path.join(final_video_dir, f"sub_{video_filename}.mp4")
-
-    # video_with_text.write_videofile(
-    #     filename=output_file,
-    #     codec="libx264",
-    #     fps=video.fps,
-    #     logger="bar" if print_info else None,
-    # )
-
     end_time = time.time()
     total_time = end_time - _start_time
     render_time = total_time - generation_time
@@ -316,4 +466,4 @@ def add_captions(
         print(f"Rendered in {render_time//60:02.0f}:{render_time%60:02.0f}")
         print(f"Done in {total_time//60:02.0f}:{total_time%60:02.0f}")
 
-    return video_with_subtitle
\ No newline at end of file
+    return video_with_subtitle
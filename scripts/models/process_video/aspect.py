@@ -0,0 +1,92 @@
+import math
+
+import numpy as np
+
+
+def parse_ratio(ratio):
+    width, height = map(int, ratio.split(':'))
+    return width / height
+
+
+def _even(value, round_up=False):
+    # yuv420p frames need even sizes (and chroma-aligned offsets)
+    if round_up:
+        return math.ceil(value / 2) * 2
+    return max(0, int(value)) // 2 * 2
+
+
+def crop_box(width, height, ratio, position="center"):
+    """
+    (x, y, w, h) of the crop window - same geometry as the downloader's ffmpeg
+    crop filter on a yuv420p source: size and offset are rounded, then
+    truncated to even values.
+    """
+    if width / height > ratio:
+        crop_width, crop_height = height * ratio, height
+    else:
+        crop_width, crop_height = width, width / ratio
+
+    x = (width - crop_width) / 2
+    y = (height - crop_height) / 2
+    if position == "left":
+        x = 0
+    elif position == "right":
+        x = width - crop_width
+    elif position == "top":
+        y = 0
+    elif position == "bottom":
+        y = height - crop_height
+
+    crop_width, crop_height = _even(round(crop_width)), _even(round(crop_height))
+    x, y = min(round(x), width - crop_width), min(round(y), height - crop_height)
+    return _even(x), _even(y), crop_width, crop_height
+
+
+def pad_box(width, height, ratio):
+    """
+    (x, y, w, h) of the video inside the black-padded frame of the target ratio:
+    the size of the downloader's ffmpeg pad filter, rounded up to even values.
+    """
+    pad_width = _even(int(max(width, height * ratio)), round_up=True)
+    pad_height = _even(int(max(height, width / ratio)), round_up=True)
+    return (pad_width - width) // 2, (pad_height - height) // 2, pad_width, pad_height
+
+
+def _image_transform(clip, image_func):
+    # moviepy 2 renamed fl_image() to image_transform()
+    if hasattr(clip, "image_transform"):
+        return clip.image_transform(image_func)
+    return clip.fl_image(image_func)
+
+
+def apply_aspect(video, aspect):
+    """
+    Apply the crop/scale aspect ratio the downloader left for the render
+    (see downloader.read_pending_aspect) as a per-frame transform, so it is
+    done in the same encode as the captions and the logo.
+    """
+    if not aspect:
+        return video
+    ratio = parse_ratio(aspect["ratio"])
+    width, height = video.w, video.h
+
+    if aspect["mode"] == "crop":
+        x, y, crop_width, crop_height = crop_box(width, height, ratio, aspect.get("crop_position", "center"))
+        if (crop_width, crop_height) == (width, height):
+            return video
+        return _image_transform(video, lambda frame: frame[y:y + crop_height, x:x + crop_width])
+
+    # Scale/pad (black bars) is not applied to short videos
+    if aspect["mode"] == "scale" and not aspect.get("is_short"):
+        x, y, pad_width, pad_height = pad_box(width, height, ratio)
+        if (pad_width, pad_height) == (width, height):
+            return video
+
+        def pad(frame):
+            padded = np.zeros((pad_height, pad_width) + frame.shape[2:], dtype=frame.dtype)
+            padded[y:y + frame.shape[0], x:x + frame.shape[1]] = frame
+            return padded
+
+        return _image_transform(video, pad)
+
+    return video
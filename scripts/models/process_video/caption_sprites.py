@@ -0,0 +1,86 @@
+"""
+Deduplicated caption bitmaps.
+
+With highlight_current_word every word of a caption line gets its own
+subcaption, which used to draw the whole line again and differ only in the
+color of one word. Here a line is drawn once in the base color, and the
+highlighted word is a small patch of that word alone, blitted at its x offset
+in the line. Both are keyed by content (line text / word), so a line or word
+repeated anywhere in the video is drawn once. The patch is blended over the
+base word, so its opaque pixels are exactly the fully drawn highlight and only
+its anti-aliased edges come out slightly stronger.
+"""
+from collections import OrderedDict
+
+from .streaming import clip_to_rgba
+
+
+def _nbytes(bitmap):
+    rgb, alpha = bitmap
+    return rgb.nbytes + alpha.nbytes
+
+
+class CaptionSprites:
+    """
+    `draw_line(text)` and `draw_word(word)` return the text clips of a line in the
+    base color and of a highlighted word; `words(text)` splits a line the way
+    the line clip orders its words and `offsets(words)` gives their x offsets.
+    At most `max_lines` lines and `max_words` patches are kept (least recently
+    used dropped first), so streaming renders stay bounded in memory.
+    """
+
+    def __init__(self, draw_line, draw_word, words, offsets, max_lines=None, max_words=None):
+        self.draw_line = draw_line
+        self.draw_word = draw_word
+        self.words = words
+        self.offsets = offsets
+        self.max_lines = max_lines
+        self.max_words = max_words
+        self.line_bitmaps = OrderedDict()  # text -> ((rgb, alpha), word offsets)
+        self.word_bitmaps = OrderedDict()  # word -> (rgb, alpha)
+        self.drawn_bytes = 0  # bitmaps actually drawn
+        self.full_bytes = 0  # a full line bitmap per highlight state, as before
+        self.drawn_count = 0
+        self.layer_count = 0
+
+    def _get(self, cache, key, limit, create):
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        value = cache[key] = create()
+        self.drawn_count += 1
+        if limit is not None and len(cache) > limit:
+            cache.popitem(last=False)
+        return value
+
+    def _line(self, text):
+        def create():
+            bitmap = clip_to_rgba(self.draw_line(text))
+            self.drawn_bytes += _nbytes(bitmap)
+            return bitmap, self.offsets(self.words(text))
+        return self._get(self.line_bitmaps, text, self.max_lines, create)
+
+    def _word(self, word):
+        def create():
+            bitmap = clip_to_rgba(self.draw_word(word))
+            self.drawn_bytes += _nbytes(bitmap)
+            return bitmap
+        return self._get(self.word_bitmaps, word, self.max_words, create)
+
+    def layers(self, text, highlight=None):
+        """[(rgb, alpha, dx)] to blit for a line: the base line, then the highlighted word patch if any."""
+        (rgb, alpha), offsets = self._line(text)
+        self.full_bytes += rgb.nbytes + alpha.nbytes
+        self.layer_count += 1
+        layers = [(rgb, alpha, 0)]
+        if highlight is not None:
+            word_rgb, word_alpha = self._word(self.words(text)[highlight])
+            layers.append((word_rgb, word_alpha, offsets[highlight]))
+        return layers
+
+    def report(self):
+        saved = self.full_bytes - self.drawn_bytes
+        share = saved / self.full_bytes * 100 if self.full_bytes else 0.0
+        print(f"Caption bitmaps: {self.drawn_count} drawn for {self.layer_count} line states, "
+              f"{self.drawn_bytes / 2 ** 20:.1f} MB instead of {self.full_bytes / 2 ** 20:.1f} MB "
+              f"({saved / 2 ** 20:.1f} MB, {share:.0f}% saved)")
@@ -0,0 +1,93 @@
+"""
+Caption layout cache.
+
+Laying captions out (segment_parser + calculate_lines for every highlighted
+subcaption) measures text with rendered text clips, which is most of the work
+before the encode starts. The result only depends on the transcript, the
+caption style that affects layout and the frame size, so it is saved next to
+the subtitle json and re-renders (another logo, another output path) load it
+instead.
+
+The file is json lines: a {"version", "key"} header, then one
+[start, end, current_word, [[text, height, x, y, highlight], ...]] row per
+subcaption, where highlight is the index of the highlighted word in the line
+(see highlight_index) or null. Rows are written while the first render lays
+them out and read back one at a time, so neither side holds the whole layout
+(streaming renders of hour-long videos stay bounded in memory).
+"""
+import hashlib
+import json
+import os
+import threading
+
+LAYOUT_VERSION = 2
+
+
+def layout_path(subtitle_path):
+    return os.path.splitext(subtitle_path)[0] + ".layout.jsonl"
+
+
+def layout_key(subtitle, frame_size, font, **style):
+    """Hash of the transcript, the font file, the layout-relevant style and the frame size."""
+    transcript = json.dumps(subtitle, sort_keys=True, ensure_ascii=False, default=str)
+    stat = os.stat(font)
+    payload = json.dumps([LAYOUT_VERSION, hashlib.sha256(transcript.encode("utf-8")).hexdigest(), list(frame_size),
+                          os.path.abspath(font), stat.st_size, stat.st_mtime, style],
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _header(key):
+    return json.dumps({"version": LAYOUT_VERSION, "key": key}) + "\n"
+
+
+def encode(item):
+    return [item["start"], item["end"], item["current_word"],
+            [[line["text"], line["height"], line["x"], line["y"], line.get("highlight")] for line in item["lines"]]]
+
+
+def decode(row):
+    """A fresh subcaption dict (in the iter_subcaptions format)."""
+    start, end, current_word, lines = row
+    return {
+        "start": start,
+        "end": end,
+        "current_word": current_word,
+        "lines": [{"text": text, "height": height, "x": x, "y": y, "highlight": highlight}
+                  for text, height, x, y, highlight in lines],
+    }
+
+
+def has_layout(path, key):
+    """Whether `path` holds the layout of `key` (only the header line is read)."""
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return file.readline() == _header(key)
+    except OSError:
+        return False
+
+
+def load_layout(path):
+    """The stored subcaptions, read one row at a time."""
+    with open(path, 'r', encoding='utf-8') as file:
+        file.readline()
+        for line in file:
+            yield decode(json.loads(line))
+
+
+def save_layout(path, key, subcaptions):
+    """
+    Yield `subcaptions` while writing their rows; the file only replaces the
+    old one once every row is written, a render stopped half-way leaves none.
+    """
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.write(_header(key))
+            for item in subcaptions:
+                file.write(json.dumps(encode(item), ensure_ascii=False, separators=(",", ":")) + "\n")
+                yield item
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -1,144 +1,340 @@
-import yaml
 import os
+import sys
 import numpy as np
 import random  # Add import for random module
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from PIL import Image, ImageColor, ImageDraw, ImageFilter, ImageFont
 from moviepy.video.io.VideoFileClip import VideoFileClip
-from moviepy.video.compositing.CompositeVideoClip import CompositeVideoClip
-
-def create_shadow_text(text, fontsize, text_color, bg_color, shadow_config, size=None):
-    """Create text with shadow effect"""
-    # Create shadow text clip
-    if shadow_config.get("enabled", False):
-        shadow_color = shadow_config.get("color", "black")
-        offset_x = shadow_config.get("offset_x", 2)
-        offset_y = shadow_config.get("offset_y", 2)
-        blur = shadow_config.get("blur", 3)
-        
-        # Create shadow clip (positioned behind the main text)
-        shadow = TextClip(text, fontsize=fontsize, color=shadow_color, 
-                         font="Arial", size=size, method="caption")
-        
-        if blur > 0 and hasattr(shadow, "filter"):
-            # Apply blur if available and requested
-            try:
-                shadow = shadow.filter(lambda image: Image.fromarray(image).filter(
-                    ImageFilter.GaussianBlur(radius=blur)))
-            except (ImportError, NameError):
-                # If PIL filters not available, skip blur
-                pass
-                
-        # Main text clip
-        txt_clip = TextClip(text, fontsize=fontsize, color=text_color, bg_color=bg_color,
-                           font="Arial", size=size, method="caption")
-        
-        # Combine shadow and text with shadow offset
-        return CompositeVideoClip([
-            shadow.set_position((offset_x, offset_y)),
-            txt_clip.set_position((0, 0))
-        ])
-    else:
-        # Return simple text clip without shadow
-        return TextClip(text, fontsize=fontsize, color=text_color, bg_color=bg_color,
-                       font="Arial", size=size, method="caption")
-
-def apply_text_effect(txt_clip, effect, duration, speed=1.0):
-    """Apply visual effects to text clip"""
-    if effect == "fade_in_out":
-        # Fade in and out effect
-        fade_duration = min(1.0, duration / 4) * speed
-        return txt_clip.fadein(fade_duration).fadeout(fade_duration)
-    
-    elif effect == "pulse":
-        # Pulsing size effect
-        def resize_func(t):
-            # Pulse between 90% and 110% size
-            pulse = 0.1 * np.sin(2 * np.pi * t * speed)
-            return 1.0 + pulse
-        
-        return txt_clip.fx(vfx.resize, resize_func)
-    
-    elif effect == "bounce":
-        # Bouncing effect
-        def y_pos(t):
-            # Simple bounce with sin function
-            return 20 * np.abs(np.sin(2 * np.pi * t * speed))
-        
-        return txt_clip.set_position(lambda t: (txt_clip.pos(t)[0], txt_clip.pos(t)[1] + y_pos(t)))
-    
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+from scripts.src.config import load_config
+from scripts.models.process_video.streaming import blit
+from scripts.models.process_video.motion import bounce_offsets, linear_path, pulse_scales, waypoint_path
+
+# movements picked from when video_editor.subtitle.movement is "random"
+RANDOM_MOVEMENTS = ["diagonal", "horizontal", "vertical"]
+
+
+def parse_color(color):
+    """PIL color name/hex or css "rgba(r,g,b,a)" with a in 0..1 -> (r, g, b, a) in 0..255."""
+    if color is None:
+        return (0, 0, 0, 0)
+    color = color.strip()
+    if color.startswith("rgba(") and color.endswith(")"):
+        r, g, b, a = (part.strip() for part in color[5:-1].split(","))
+        alpha = float(a)
+        return int(r), int(g), int(b), int(round(alpha * 255 if alpha <= 1 else alpha))
+    rgb = ImageColor.getrgb(color)
+    return rgb if len(rgb) == 4 else rgb + (255,)
+
+
+def _load_font(font, fontsize):
+    try:
+        return ImageFont.truetype(font, fontsize)
+    except OSError:
+        print(f"Font '{font}' not found, using the default font")
+        return ImageFont.load_default()
+
+
+def _wrap(text, font, max_width, draw):
+    lines, line = [], ""
+    for word in text.split():
+        candidate = f"{line} {word}".strip()
+        if line and draw.textlength(candidate, font=font) > max_width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    return lines + [line] if line else lines
+
+
+def create_shadow_text(text, fontsize, text_color, bg_color, shadow_config, size=None, font=None):
+    """
+    Rasterize the watermark text (background box and optional blurred shadow) once
+    with PIL. `size` is (max width, None) like the caption method of TextClip.
+    Returns a PIL RGBA image.
+    """
+    pil_font = _load_font(font, fontsize)
+    measure = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    max_width = int(size[0]) if size and size[0] else 10 ** 6
+    lines = _wrap(text, pil_font, max_width, measure) or [""]
+
+    spacing = int(fontsize * 0.2)
+    boxes = [measure.textbbox((0, 0), line, font=pil_font) for line in lines]
+    line_height = max(box[3] for box in boxes) + spacing
+    padding = max(2, fontsize // 5)
+    shadow_pad = (max(abs(shadow_config.offset_x), abs(shadow_config.offset_y)) + int(shadow_config.blur) * 2
+                  if shadow_config.enabled else 0)
+    width = max(box[2] for box in boxes) + 2 * (padding + shadow_pad)
+    height = line_height * len(lines) + 2 * (padding + shadow_pad)
+
+    image = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    ImageDraw.Draw(image).rectangle(
+        (shadow_pad, shadow_pad, width - shadow_pad - 1, height - shadow_pad - 1), fill=parse_color(bg_color))
+
+    def draw_lines(target, color, dx=0, dy=0):
+        draw = ImageDraw.Draw(target)
+        for i, (line, box) in enumerate(zip(lines, boxes)):
+            x = (width - (box[2] - box[0])) // 2 + dx
+            y = padding + shadow_pad + i * line_height + dy
+            draw.text((x, y), line, font=pil_font, fill=color)
+
+    if shadow_config.enabled:
+        shadow = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+        draw_lines(shadow, parse_color(shadow_config.color), shadow_config.offset_x, shadow_config.offset_y)
+        if shadow_config.blur > 0:
+            shadow = shadow.filter(ImageFilter.GaussianBlur(radius=shadow_config.blur))
+        image = Image.alpha_composite(image, shadow)
+
+    draw_lines(image, parse_color(text_color))
+    return image
+
+
+def _to_arrays(image):
+    pixels = np.asarray(image, dtype=np.uint8)
+    return np.ascontiguousarray(pixels[:, :, :3]), pixels[:, :, 3].astype(np.float32) / 255.0
+
+
+def build_sprite(image, effect, fps, speed=1.0):
+    """
+    Precompute one cycle of the text effect as a list of (rgb, alpha, dx, dy)
+    frames, one per animation phase at the output fps; frame i is shown at
+    phase i of the cycle. (dx, dy) offsets the frame from the watermark position.
+    "pulse" is the only effect changing pixels; "bounce" only moves the bitmap, so
+    it is part of the motion path (see watermark_path) and needs a single frame.
+    """
+    period = 1.0 / max(speed, 1e-6)
+    phases = max(1, int(round(fps * period)))
+    base_w, base_h = image.size
+
+    if effect == "pulse":
+        # Pulse between 90% and 110% size, resized once per phase
+        frames = []
+        for scale in pulse_scales(phases, phases, speed=1.0):
+            w, h = max(1, int(round(base_w * scale))), max(1, int(round(base_h * scale)))
+            rgb, alpha = _to_arrays(image.resize((w, h), Image.LANCZOS))
+            frames.append((rgb, alpha, (base_w - w) // 2, (base_h - h) // 2))
+        return frames
+
+    rgb, alpha = _to_arrays(image)
+    return [(rgb, alpha, 0, 0)]
+
+
+def fade_factor(effect, t, duration, speed=1.0):
+    """Opacity of the "fade_in_out" effect at t (1.0 for the other effects)."""
+    if effect != "fade_in_out":
+        return 1.0
+    fade_duration = min(1.0, duration / 4) * speed
+    if fade_duration <= 0:
+        return 1.0
+    return max(0.0, min(1.0, t / fade_duration, (duration - t) / fade_duration))
+
+
+def watermark_path(movement, frame_size, sprite_size, fps, duration, easing="linear", effect=None, speed=1.0):
+    """MotionPath of the watermark sprite (top-left corner) for every frame of the video."""
+    width, height = frame_size
+    sub_w, sub_h = sprite_size
+    frame_count = int(np.ceil(duration * fps)) + 1
+
+    if movement == "horizontal":
+        start, end = (-sub_w / 2, height - sub_h - 50), (width - sub_w / 2, height - sub_h - 50)
+    elif movement == "vertical":
+        start, end = (width / 2 - sub_w / 2, -sub_h / 2), (width / 2 - sub_w / 2, height - sub_h / 2)
+    else:  # Default: diagonal
+        start, end = (-sub_w / 2, height - sub_h / 2), (width - sub_w / 2, -sub_h / 2)
+
+    if movement == "waypoints":
+        path = waypoint_path(frame_count, fps, (0, 0), (max(width - sub_w, 0), max(height - sub_h, 0)))
     else:
-        # No effect
-        return txt_clip
+        path = linear_path(start, end, frame_count, fps, duration, easing)
+
+    if effect == "bounce":
+        # Simple bounce with sin function
+        path = path.shifted(dy=bounce_offsets(frame_count, fps, 20, speed))
+    return path
+
+
+class SpriteOverlay:
+    """Blit the precomputed sprite frame of phase `t` at `position(t)` - no text or resize work per frame."""
+
+    def __init__(self, frames, fps, position, opacity=None):
+        self.frames = frames
+        self.fps = fps
+        self.position = position
+        self.opacity = opacity
+
+    def draw(self, get_frame, t):
+        rgb, alpha, dx, dy = self.frames[int(t * self.fps) % len(self.frames)]
+        opacity = self.opacity(t) if self.opacity is not None else 1.0
+        if opacity <= 0:
+            return get_frame(t)
+        if opacity < 1.0:
+            alpha = alpha * opacity
+        x, y = self.position(t)
+        frame = np.array(get_frame(t), dtype=np.uint8, copy=True)
+        return blit(frame, rgb, alpha, int(x) + dx, int(y) + dy)
+
+    def apply(self, video):
+        # moviepy 2 renamed fl() to transform()
+        if hasattr(video, "transform"):
+            return video.transform(self.draw)
+        return video.fl(self.draw)
+
+
+# Decoded and scaled logos shared by every video of the process (a batch renders
+# many videos of the same size): (path, mtime, width, opacity) -> (premultiplied rgb, alpha)
+LOGO_CACHE_SIZE = 16
+_logo_cache = OrderedDict()
+_logo_cache_lock = threading.Lock()
+
+
+def _decode_logo(path, width):
+    if path.lower().endswith(".svg"):
+        try:
+            import cairosvg
+        except ImportError:
+            raise RuntimeError("svg logos need cairosvg (pip install cairosvg), or use a png")
+        # rasterize at the target width instead of scaling a bitmap
+        return Image.open(BytesIO(cairosvg.svg2png(url=path, output_width=width))).convert("RGBA")
+
+    image = Image.open(path).convert("RGBA")
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def load_logo(path, width, opacity=1.0):
+    """
+    The logo scaled to `width` pixels with `opacity` applied, as premultiplied
+    rgb and alpha uint8 arrays. Decoded once per (file, size, opacity) and kept
+    in a small LRU cache shared by all videos.
+    """
+    key = (os.path.abspath(path), os.path.getmtime(path), width, opacity)
+    with _logo_cache_lock:
+        if key in _logo_cache:
+            _logo_cache.move_to_end(key)
+            return _logo_cache[key]
+
+    pixels = np.asarray(_decode_logo(path, width), dtype=np.uint16)
+    alpha = (pixels[:, :, 3] * opacity + 0.5).astype(np.uint16)
+    premultiplied = ((pixels[:, :, :3] * alpha[:, :, None] + 127) // 255).astype(np.uint8)
+    asset = (np.ascontiguousarray(premultiplied), alpha.astype(np.uint8))
+
+    with _logo_cache_lock:
+        _logo_cache[key] = asset
+        while len(_logo_cache) > LOGO_CACHE_SIZE:
+            _logo_cache.popitem(last=False)
+    return asset
+
+
+def blit_premultiplied(frame, premultiplied, alpha, x, y):
+    """frame = logo + frame * (1 - alpha), in integer math on the covered region only (in place)."""
+    frame_height, frame_width = frame.shape[:2]
+    height, width = alpha.shape
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + width, frame_width), min(y + height, frame_height)
+    if x0 >= x1 or y0 >= y1:
+        return frame
+
+    inverse = 255 - alpha[y0 - y:y1 - y, x0 - x:x1 - x, None].astype(np.uint16)
+    region = frame[y0:y1, x0:x1].astype(np.uint16)
+    frame[y0:y1, x0:x1] = premultiplied[y0 - y:y1 - y, x0 - x:x1 - x] + (region * inverse + 127) // 255
+    return frame
+
+
+def logo_position(position, frame_size, logo_size, margin):
+    """Top-left corner of the logo; "random" picks one corner per video."""
+    frame_w, frame_h = frame_size
+    logo_w, logo_h = logo_size
+    if position == "random":
+        position = random.choice(["top-left", "top-right", "bottom-left", "bottom-right"])
+        print(f"Randomly selected logo position: {position}")
+    if position == "center":
+        return (frame_w - logo_w) // 2, (frame_h - logo_h) // 2
+    vertical, horizontal = position.split("-")
+    x = margin if horizontal == "left" else frame_w - logo_w - margin
+    y = margin if vertical == "top" else frame_h - logo_h - margin
+    return x, y
+
+
+def add_image_logo(video, logo_config):
+    """Overlay the png/svg logo of `logo_config` (LogoConfig) on every frame."""
+    width = max(1, int(video.w * logo_config.size))
+    premultiplied, alpha = load_logo(logo_config.image, width, logo_config.opacity)
+    x, y = logo_position(logo_config.position, (video.w, video.h), (alpha.shape[1], alpha.shape[0]),
+                         logo_config.margin)
+
+    def draw(get_frame, t):
+        frame = np.array(get_frame(t), dtype=np.uint8, copy=True)
+        return blit_premultiplied(frame, premultiplied, alpha, x, y)
+
+    # moviepy 2 renamed fl() to transform()
+    if hasattr(video, "transform"):
+        return video.transform(draw)
+    return video.fl(draw)
+
 
 def add_logo(config, video):
     """Main function to process video with subtitle and logo effects"""
 
 # Check if the path is valid
-    if os.path.isfile(video):
+    if isinstance(video, str):
         video = VideoFileClip(video)
 
 
     # Check if subtitle is enabled
-    subtitle_enabled = config["video_editor"].get("subtitle", {}).get("enabled", True)
-
-    # List to hold all clips (starting with the base video)
-    clips = [video]
+    subtitle_config = config.video_editor.subtitle
+    subtitle_enabled = subtitle_config.enabled
 
     # Add subtitle if enabled
     if subtitle_enabled:
-        subtitle_config = config["video_editor"].get("subtitle", {})
-        subtitle_text = subtitle_config.get("text", "Sample Subtitle")
-        subtitle_fontsize = subtitle_config.get("fontsize", 30)
-        subtitle_color = subtitle_config.get("color", "white")
-        subtitle_bg = subtitle_config.get("background_color", "rgba(0,0,0,0.5)")
-        
-        # Randomly select movement type instead of using the config value
-        movement_options = ["diagonal", "horizontal", "vertical"]
-        subtitle_movement = random.choice(movement_options)
-        print(f"Randomly selected movement: {subtitle_movement}")
-        
-        shadow_config = subtitle_config.get("shadow", {})
-        text_effect = subtitle_config.get("effect", "none")
-        animation_speed = subtitle_config.get("animation_speed", 1.0)
-
-        # Create subtitle text clip with shadow
-        subtitle = create_shadow_text(
-            subtitle_text, 
+        subtitle_text = subtitle_config.text
+        subtitle_fontsize = subtitle_config.fontsize
+        subtitle_color = subtitle_config.color
+        subtitle_bg = subtitle_config.background_color
+
+        subtitle_movement = subtitle_config.movement
+        if subtitle_movement == "random":
+            subtitle_movement = random.choice(RANDOM_MOVEMENTS)
+            print(f"Randomly selected movement: {subtitle_movement}")
+
+        shadow_config = subtitle_config.shadow
+        text_effect = subtitle_config.effect
+        animation_speed = subtitle_config.animation_speed
+
+        # Rasterize the subtitle text with shadow once, then one sprite frame per effect phase
+        image = create_shadow_text(
+            subtitle_text,
             subtitle_fontsize,
             subtitle_color,
             subtitle_bg,
             shadow_config,
-            size=(video.w * 0.8, None)
-        ).set_duration(video.duration)
-        
-        # Apply configured text effect
-        subtitle = apply_text_effect(subtitle, text_effect, video.duration, animation_speed)
-
-        # Define subtitle movement based on configuration
-        if subtitle_movement == "horizontal":
-            subtitle_position = lambda t: (int(video.w * t / video.duration - subtitle.w / 2), video.h - subtitle.h - 50)
-        elif subtitle_movement == "vertical":
-            subtitle_position = lambda t: (int(video.w / 2 - subtitle.w / 2), int(video.h * t / video.duration - subtitle.h / 2))
-        else:  # Default: diagonal
-            subtitle_position = lambda t: (int(video.w * t / video.duration - subtitle.w / 2), 
-                                         int(video.h * (1 - t / video.duration) - subtitle.h / 2))
-
-        # Apply movement to subtitle
-        subtitle = subtitle.set_position(subtitle_position)
-        clips.append(subtitle)
-
-    # Create the final composite video with all enabled elements
-    final_video = CompositeVideoClip(clips).set_duration(video.duration)
-
-    # Save the video in high quality
-    # final_video.write_videofile(output_video_path)
-
-    return final_video
-if __name__ == "__main__":
-    # Path to config file (in the same directory as this script)
-    config_path = "/home/rteam2/m15kh/auto-subtitle/config/config.yaml"
-    with open(config_path, 'r') as file:
-        config = yaml.safe_load(file)
+            size=(video.w * 0.8, None),
+            font=subtitle_config.font,
+        )
+        fps = video.fps or 30
+        frames = build_sprite(image, text_effect, fps, animation_speed)
+        duration = video.duration
+
+        # Positions of every frame computed up front, looked up by frame index while rendering
+        subtitle_position = watermark_path(subtitle_movement, (video.w, video.h), image.size, fps, duration,
+                                           subtitle_config.easing, text_effect, animation_speed)
 
+        opacity = None
+        if text_effect == "fade_in_out":
+            opacity = lambda t: fade_factor(text_effect, t, duration, animation_speed)
 
+        # Apply the sprite with its movement to the video
+        video = SpriteOverlay(frames, fps, subtitle_position, opacity).apply(video)
+
+    # Add the image logo if one is configured
+    logo_config = config.video_editor.logo
+    if logo_config.image:
+        video = add_image_logo(video, logo_config)
+
+    return video
+if __name__ == "__main__":
+    config = load_config()
 
-    add_logo(config)
\ No newline at end of file
+    add_logo(config, config.video_path)
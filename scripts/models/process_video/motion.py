@@ -0,0 +1,161 @@
+"""
+Precomputed motion paths for moving overlays (the watermark).
+
+A path holds the top-left position (and optionally the scale) of the overlay
+for every output frame as numpy arrays, computed at once with vectorized math,
+so the renderer looks the frame index up instead of evaluating position lambdas
+per frame. The same arrays export to ffmpeg `overlay` x/y expressions
+(piecewise linear within a pixel tolerance) for a render without moviepy.
+"""
+import numpy as np
+
+EASINGS = {
+    "linear": lambda p: p,
+    "ease_in": lambda p: p ** 3,
+    "ease_out": lambda p: 1 - (1 - p) ** 3,
+    "ease_in_out": lambda p: np.where(p < 0.5, 4 * p ** 3, 1 - (2 - 2 * p) ** 3 / 2),
+}
+
+
+class MotionPath:
+    """Per-frame (x, y) positions and scales of an overlay; `path(t)` is an O(1) lookup."""
+
+    def __init__(self, xs, ys, fps, scales=None):
+        self.xs = np.rint(xs).astype(np.int32)
+        self.ys = np.rint(ys).astype(np.int32)
+        self.fps = fps
+        self.scales = None if scales is None else np.asarray(scales, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.xs)
+
+    def index(self, t):
+        # the epsilon keeps t = i / fps on frame i despite float rounding
+        return min(max(int(t * self.fps + 1e-6), 0), len(self.xs) - 1)
+
+    def __call__(self, t):
+        i = self.index(t)
+        return int(self.xs[i]), int(self.ys[i])
+
+    def scale(self, t):
+        return 1.0 if self.scales is None else float(self.scales[self.index(t)])
+
+    def shifted(self, dx=0, dy=0):
+        """The same path moved by per-frame (or constant) offsets."""
+        return MotionPath(self.xs + dx, self.ys + dy, self.fps, self.scales)
+
+    def to_ffmpeg(self, tolerance=1.0):
+        """(x, y) expressions of the path in `t` for the ffmpeg overlay filter."""
+        return piecewise_expression(self.xs, self.fps, tolerance), piecewise_expression(self.ys, self.fps, tolerance)
+
+    def overlay_filter(self, tolerance=1.0):
+        x, y = self.to_ffmpeg(tolerance)
+        return f"overlay=x='{x}':y='{y}':eval=frame"
+
+
+#-----------------------------------paths-----------------------------------
+def frame_times(frame_count, fps):
+    return np.arange(frame_count, dtype=np.float64) / fps
+
+
+def progress(frame_count, fps, duration, easing="linear"):
+    """Eased 0..1 progress of every frame over `duration` seconds (held at 1 after)."""
+    p = np.clip(frame_times(frame_count, fps) / max(duration, 1e-6), 0.0, 1.0)
+    return EASINGS[easing](p)
+
+
+def linear_path(start, end, frame_count, fps, duration=None, easing="linear"):
+    """From `start` to `end` (x, y) over `duration` seconds (the whole path by default)."""
+    duration = duration if duration is not None else (frame_count - 1) / fps
+    p = progress(frame_count, fps, duration, easing)
+    return MotionPath(start[0] + (end[0] - start[0]) * p, start[1] + (end[1] - start[1]) * p, fps)
+
+
+def waypoint_path(frame_count, fps, low, high, leg_seconds=2.0, easing="ease_in_out", seed=None):
+    """
+    Random waypoints inside the (low, high) corners of the allowed top-left
+    positions, one every `leg_seconds`, joined by eased legs.
+    """
+    rng = np.random.default_rng(seed)
+    leg_frames = max(1, int(round(leg_seconds * fps)))
+    legs = (frame_count - 1) // leg_frames + 1
+    points = rng.uniform(low, high, size=(legs + 1, 2))
+
+    frames = np.arange(frame_count)
+    leg = frames // leg_frames
+    p = EASINGS[easing]((frames % leg_frames) / leg_frames)
+    xy = points[leg] + (points[leg + 1] - points[leg]) * p[:, None]
+    return MotionPath(xy[:, 0], xy[:, 1], fps)
+
+
+def bounce_offsets(frame_count, fps, height=20, speed=1.0):
+    """Vertical offsets of a bounce, `speed` cycles per second."""
+    return height * np.abs(np.sin(2 * np.pi * speed * frame_times(frame_count, fps)))
+
+
+def pulse_scales(frame_count, fps, speed=1.0, amplitude=0.1):
+    """Scale factors pulsing between 1 - amplitude and 1 + amplitude, `speed` cycles per second."""
+    return 1.0 + amplitude * np.sin(2 * np.pi * speed * frame_times(frame_count, fps))
+
+
+def pulse_path(path, size, speed=1.0, amplitude=0.1):
+    """`path` with pulse scales, shifted so the scaled overlay of `size` (w, h) stays centered."""
+    scales = pulse_scales(len(path), path.fps, speed, amplitude)
+    dx = np.rint(size[0] * (1 - scales) / 2).astype(np.int32)
+    dy = np.rint(size[1] * (1 - scales) / 2).astype(np.int32)
+    return MotionPath(path.xs + dx, path.ys + dy, path.fps, scales)
+
+
+#-----------------------------------ffmpeg export-----------------------------------
+def _fits(values, start, end, tolerance):
+    line = np.linspace(values[start], values[end], end - start + 1)
+    return np.max(np.abs(values[start:end + 1] - line)) <= tolerance
+
+
+def breakpoints(values, tolerance=1.0):
+    """
+    Frame indices of a piecewise-linear fit of `values` where every frame is
+    within `tolerance` of its segment. Each segment is grown by doubling, then
+    binary search, so long straight runs cost O(log n) fit checks.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    last = len(values) - 1
+    points = [0]
+    start = 0
+    while start < last:
+        step = 1
+        while start + step * 2 <= last and _fits(values, start, start + step * 2, tolerance):
+            step *= 2
+        low, high = start + step, min(start + step * 2, last)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if _fits(values, start, middle, tolerance):
+                low = middle
+            else:
+                high = middle - 1
+        points.append(low)
+        start = low
+    return points
+
+
+def piecewise_expression(values, fps, tolerance=1.0):
+    """
+    ffmpeg expression of `t` following the per-frame `values`: a flat sum of
+    gated linear segments (no nested if(), whose parse depth ffmpeg limits),
+    holding the last value after the end.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    points = breakpoints(values, tolerance)
+    if len(points) == 1:
+        return f"{values[0]:g}"
+
+    terms = []
+    for k, (start, end) in enumerate(zip(points, points[1:])):
+        t0, t1 = start / fps, end / fps
+        slope = (values[end] - values[start]) / (t1 - t0)
+        is_last = k == len(points) - 2
+        t = f"min(t,{t1:.6f})" if is_last else "t"
+        segment = f"{values[start]:g}" if slope == 0 else f"({values[start]:g}+({t}-{t0:.6f})*{slope:.6g})"
+        gates = ([f"gte(t,{t0:.6f})"] if k else []) + ([] if is_last else [f"lt(t,{t1:.6f})"])
+        terms.append("*".join(gates + [segment]))
+    return "+".join(terms)
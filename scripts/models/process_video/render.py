@@ -0,0 +1,124 @@
+import json
+import math
+import os
+import shutil
+import subprocess
+
+from proglog import TqdmProgressBarLogger
+
+from scripts.src.cancel import check, run_command
+
+MANIFEST = "manifest.json"
+
+
+class CancellableLogger(TqdmProgressBarLogger):
+    """Progress bar that stops write_videofile when the token is cancelled (checked on every frame)."""
+
+    def __init__(self, token, print_info=True):
+        super().__init__(print_messages=print_info)
+        self.token = token
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        check(self.token)
+        super().bars_callback(bar, attr, value, old_value)
+
+
+def _subclip(clip, start, end):
+    # moviepy 2 renamed subclip() to subclipped()
+    if hasattr(clip, "subclipped"):
+        return clip.subclipped(start, end)
+    return clip.subclip(start, end)
+
+
+def _load_manifest(chunks_dir, fingerprint, frames_per_chunk):
+    path = os.path.join(chunks_dir, MANIFEST)
+    if os.path.exists(path):
+        with open(path, 'r') as file:
+            manifest = json.load(file)
+        if manifest.get("fingerprint") == fingerprint and manifest.get("frames_per_chunk") == frames_per_chunk:
+            return manifest
+        print("Render inputs changed, previous chunks are discarded")
+        shutil.rmtree(chunks_dir)
+    os.makedirs(chunks_dir, exist_ok=True)
+    return {"fingerprint": fingerprint, "frames_per_chunk": frames_per_chunk, "done": [], "audio": False}
+
+
+def _save_manifest(chunks_dir, manifest):
+    path = os.path.join(chunks_dir, MANIFEST)
+    with open(path + ".tmp", 'w') as file:
+        json.dump(manifest, file)
+    os.replace(path + ".tmp", path)
+
+
+def concat_chunks(chunk_files, output_path, audio_path=None, token=None):
+    """Join the encoded chunks (and the audio track) without re-encoding."""
+    list_file_path = output_path + ".chunks.txt"
+    with open(list_file_path, 'w') as list_file:
+        for file in chunk_files:
+            list_file.write(f"file '{os.path.abspath(file)}'\n")
+
+    cmd = ['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', list_file_path]
+    if audio_path:
+        cmd.extend(['-i', audio_path, '-map', '0:v:0', '-map', '1:a:0', '-shortest'])
+    cmd.extend(['-c', 'copy', '-movflags', '+faststart', output_path])
+
+    result = run_command(cmd, token=token, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.remove(list_file_path)
+    return result.returncode == 0
+
+
+def write_chunked(clip, output_path, chunk_seconds=60.0, fingerprint=None, token=None,
+                  codec="libx264", threads=None, print_info=True):
+    """
+    write_videofile() in chunks of `chunk_seconds` so a crashed or cancelled render
+    resumes from the last finished chunk instead of frame 0.
+
+    Chunks and a manifest live in `<output_path>.chunks/`; they are reused only
+    when `fingerprint` (hash of the render inputs) matches. The audio track is
+    written once and muxed when the chunks are concatenated.
+    """
+    fps = clip.fps
+    frames_per_chunk = max(1, round(chunk_seconds * fps))
+    chunk_duration = frames_per_chunk / fps
+    chunk_count = max(1, math.ceil(clip.duration / chunk_duration))
+
+    chunks_dir = output_path + ".chunks"
+    manifest = _load_manifest(chunks_dir, fingerprint, frames_per_chunk)
+    done = set(manifest["done"])
+    logger = CancellableLogger(token, print_info) if token is not None else ("bar" if print_info else None)
+
+    chunk_files = []
+    for i in range(chunk_count):
+        check(token)
+        chunk_path = os.path.join(chunks_dir, f"chunk_{i:05d}.mp4")
+        chunk_files.append(chunk_path)
+        if i in done and os.path.exists(chunk_path):
+            continue
+
+        start = i * chunk_duration
+        end = min(clip.duration, start + chunk_duration)
+        if print_info:
+            print(f"Rendering chunk {i + 1}/{chunk_count} ({start:.1f}s - {end:.1f}s)")
+
+        temp_path = os.path.join(chunks_dir, f"chunk_{i:05d}.part.mp4")
+        _subclip(clip, start, end).write_videofile(
+            temp_path, codec=codec, fps=fps, audio=False, threads=threads, logger=logger,
+        )
+        os.replace(temp_path, chunk_path)
+        manifest["done"].append(i)
+        _save_manifest(chunks_dir, manifest)
+
+    audio_path = None
+    if clip.audio is not None:
+        audio_path = os.path.join(chunks_dir, "audio.m4a")
+        if not manifest["audio"] or not os.path.exists(audio_path):
+            check(token)
+            clip.audio.write_audiofile(audio_path, fps=44100, codec="aac", logger=logger)
+            manifest["audio"] = True
+            _save_manifest(chunks_dir, manifest)
+
+    check(token)
+    if not concat_chunks(chunk_files, output_path, audio_path, token):
+        raise RuntimeError(f"Joining the rendered chunks failed, they are kept in {chunks_dir}")
+    shutil.rmtree(chunks_dir)
+    return output_path
@@ -1,4 +1,4 @@
-from typing import Callable
+from typing import Callable, Iterable, Iterator
 
 def has_partial_sentence(text):
     words = text.split()
@@ -8,12 +8,128 @@ def has_partial_sentence(text):
             return True
     return False
 
-def parse(
-    segments: list[dict],
+class LineFitter:
+    """
+    Fit check of a caption growing word by word: does it still wrap into
+    `line_count` lines of less than `max_width` pixels (same greedy wrap as
+    calculate_lines)?
+
+    `measure(text)` returns the pixel width of a text. It need not be additive
+    (get_text_size_ex adds the text clip margin once per call), so every word
+    has two cached measurements: its width as the last word of a line and its
+    advance, `measure(word + " x") - measure("x")`, as any other word. The
+    width of a line is the sum of the advances of its words but the last plus
+    the width of the last, so adding a word costs O(1). Should the sum be off
+    (kerning), a line within `slack` of the limit is measured exactly.
+
+    `process(text)` (process_arabic_text) is applied to the whole caption as
+    calculate_lines does. A caption it changes (RTL text: the words are
+    reshaped and put in visual order, so the wrap starts from the other end)
+    is wrapped again from scratch for every word, from the cached measurements
+    of its processed words.
+    Called with a whole text it does the same check from scratch, so it also
+    works as a plain fit_function.
+    """
+
+    def __init__(self, measure: Callable, max_width, line_count=1, slack=0.1, process: Callable = None):
+        self.measure = measure
+        self.max_width = max_width
+        self.line_count = line_count
+        self.slack = slack
+        self.process = process
+        self.widths = {}
+        self.advances = {}
+        self.reset()
+
+    def reset(self):
+        self.words = []
+        self.state = (0, (), 0)  # lines, words of the last line, advance of the last line
+
+    def word_width(self, word):
+        width = self.widths.get(word)
+        if width is None:
+            width = self.widths[word] = self.measure(word)
+        return width
+
+    def word_advance(self, word):
+        advance = self.advances.get(word)
+        if advance is None:
+            advance = self.advances[word] = self.measure(word + " x") - self.word_width("x")
+        return advance
+
+    def _fits_line(self, line_words, line_advance, word):
+        estimate = line_advance + self.word_width(word)
+        if estimate < self.max_width * (1 - self.slack):
+            return True
+        if estimate > self.max_width * (1 + self.slack):
+            return False
+        return self.measure(" ".join(line_words + (word,))) < self.max_width
+
+    def _wrap(self, words, state=(0, (), 0)):
+        """Wrap state after `words` continue the caption in `state`, None if they need too many lines."""
+        lines, line_words, line_advance = state
+        for word in words:
+            if line_words and self._fits_line(line_words, line_advance, word):
+                line_words += (word,)
+                line_advance += self.word_advance(word)
+                continue
+            # a new line; a word too long for the frame still gets its own line
+            if lines == self.line_count:
+                return None
+            lines, line_words, line_advance = lines + 1, (word,), self.word_advance(word)
+        return lines, line_words, line_advance
+
+    def add(self, text):
+        """Add the words of `text` if the caption still fits (True), otherwise leave it unchanged (False)."""
+        words = self.words + text.split()
+        state = None
+        if self.process is not None:
+            joined = " ".join(words)
+            processed = self.process(joined)
+            if processed != joined:
+                state = self._wrap(processed.split())
+                if state is None:
+                    return False
+        if state is None:
+            state = self._wrap(text.split(), self.state)
+            if state is None:
+                return False
+        self.words, self.state = words, state
+        return True
+
+    def __call__(self, text):
+        self.reset()
+        fits = self.add(text)
+        self.reset()
+        return fits
+
+def merge_words(words):
+    """Copies of the words with the ones not separated by a space merged into the previous one."""
+    merged = []
+    for word in words:
+        if merged and not word["word"].startswith(" "):
+            merged[-1]["word"] += word["word"]
+            merged[-1]["end"] = word["end"]
+        else:
+            merged.append(dict(word))
+    return merged
+
+def iter_parse(
+    segments: Iterable[dict],
     fit_function: Callable,
     allow_partial_sentences: bool = False,
-):
-    captions = []
+) -> Iterator[dict]:
+    """
+    Group the words of `segments` into captions that fit on the video, in one
+    pass over a (possibly lazy) iterable; each caption is yielded as soon as it
+    is complete. The segments are not modified. With a LineFitter as
+    fit_function each word costs O(1), otherwise fit_function is called with the
+    whole caption text for every word.
+    """
+    incremental = isinstance(fit_function, LineFitter)
+    if incremental:
+        fit_function.reset()
+
     caption = {
         "start": None,
         "end": 0,
@@ -21,38 +137,97 @@ def parse(
         "text": "",
     }
 
-    # Merge words that are not separated by spaces
-    for s, segment in enumerate(segments):
-        for w, word in enumerate(segment["words"]):
-            if w > 0 and word["word"][0] != " ":
-                segments[s]["words"][w-1]["word"] += word["word"]
-                segments[s]["words"][w-1]["end"] = word["end"]
-                del segments[s]["words"][w]
-
     # Parse segments into captions that fit on the video
     for segment in segments:
-        for word in segment["words"]:
+        for word in merge_words(segment["words"]):
             if caption["start"] is None:
                 caption["start"] = word["start"]
 
-            text = caption["text"]+word["word"]
-
-            caption_fits = allow_partial_sentences or not has_partial_sentence(text)
-            caption_fits = caption_fits and fit_function(text)
+            # A caption doesn't go on past the end of a sentence
+            caption_fits = allow_partial_sentences or not (
+                caption["words"] and caption["words"][-1]["word"].strip().endswith(".")
+            )
+            if caption_fits:
+                if incremental:
+                    caption_fits = fit_function.add(word["word"])
+                else:
+                    caption_fits = fit_function(caption["text"] + word["word"])
 
             if caption_fits:
                 caption["words"].append(word)
                 caption["end"] = word["end"]
-                caption["text"] = text
+                caption["text"] += word["word"]
             else:
-                captions.append(caption)
+                yield caption
                 caption = {
                     "start": word["start"],
                     "end": word["end"],
                     "words": [word],
                     "text": word["word"],
                 }
+                if incremental:
+                    fit_function.reset()
+                    fit_function.add(word["word"])
+
+    yield caption
+
+
+def parse(
+    segments: Iterable[dict],
+    fit_function: Callable,
+    allow_partial_sentences: bool = False,
+):
+    return list(iter_parse(segments, fit_function, allow_partial_sentences))
+
+
+def benchmark(word_count=100_000, line_count=2, max_width=900):
+    """Time parse() on a synthetic transcript, incremental LineFitter vs the calculate_lines wrap."""
+    import random
+    import time
+
+    rng = random.Random(0)
+    vocabulary = ["a", "the", "video", "subtitle", "caption", "render", "frame", "word.", "un", "believable"]
+    segments, t = [], 0.0
+    for s in range(word_count // 20):
+        words = []
+        for w in range(20):
+            text = rng.choice(vocabulary)
+            # a few tokens without a leading space get merged into the previous word
+            words.append({"word": text if w and rng.random() < 0.05 else " " + text, "start": t, "end": t + 0.3})
+            t += 0.3
+        segments.append({"words": words})
+
+    measured = [0]
+    advance = {c: 10 + (ord(c) * 7) % 13 for c in set("".join(vocabulary) + " x")}
+
+    def measure(text):
+        # stand-in for get_text_size_ex, which renders a text clip per call: the advances of all
+        # characters but the last, plus the last character's clip with its (50, 50) margin
+        measured[0] += 1
+        return sum(advance[c] for c in text[:-1]) + advance[text[-1]] + 100
+
+    def whole_text(text):
+        # the calculate_lines wrap, measuring the growing line for every word
+        lines, line = 0, ""
+        for word in text.split():
+            if line and measure(f"{line} {word}") < max_width:
+                line = f"{line} {word}"
+            else:
+                lines, line = lines + 1, word
+        return lines <= line_count
+
+    results = []
+    for name, fit_function in (("incremental", LineFitter(measure, max_width, line_count)),
+                               ("whole text", whole_text)):
+        measured[0] = 0
+        start = time.perf_counter()
+        captions = parse(segments, fit_function)
+        elapsed = time.perf_counter() - start
+        results.append([caption["text"] for caption in captions])
+        print(f"{name:>12}: {len(captions)} captions from {word_count} words in {elapsed:.3f}s, "
+              f"{measured[0]} text measurements")
+    print("same captions" if results[0] == results[1] else "captions differ")
 
-    captions.append(caption)
 
-    return captions
\ No newline at end of file
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,111 @@
+from collections import deque
+
+import numpy as np
+
+
+def clip_to_rgba(clip):
+    """First frame of a (text) clip as an RGB uint8 array and an alpha float array."""
+    rgb = np.asarray(clip.get_frame(0), dtype=np.uint8)
+    if clip.mask is not None:
+        alpha = np.asarray(clip.mask.get_frame(0), dtype=np.float32)
+    else:
+        alpha = np.ones(rgb.shape[:2], dtype=np.float32)
+    return rgb, alpha
+
+
+def blit(frame, rgb, alpha, x, y):
+    """Alpha-blend rgb/alpha onto frame (in place) with its top-left corner at (x, y)."""
+    frame_height, frame_width = frame.shape[:2]
+    height, width = alpha.shape
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + width, frame_width), min(y + height, frame_height)
+    if x0 >= x1 or y0 >= y1:
+        return frame
+
+    a = alpha[y0 - y:y1 - y, x0 - x:x1 - x, None]
+    src = rgb[y0 - y:y1 - y, x0 - x:x1 - x].astype(np.float32)
+    region = frame[y0:y1, x0:x1].astype(np.float32)
+    frame[y0:y1, x0:x1] = (src * a + region * (1.0 - a)).astype(np.uint8)
+    return frame
+
+
+class StreamingCaptions:
+    """
+    Draw captions while the video is rendered instead of building every caption clip up front.
+
+    `layout_factory()` returns a fresh iterator of laid-out subcaptions in time order
+    (see iter_subcaptions); `draw_line(line, current_word)` returns the text clip of
+    one line. Only subcaptions starting within `window_seconds` of the current frame
+    are pulled from the iterator, their bitmaps are drawn when they appear on screen
+    and dropped when they end, so memory doesn't grow with the video length.
+    Frames are expected in increasing time order (as write_videofile requests them);
+    seeking backwards restarts the layout iterator.
+    With `sprites` (CaptionSprites) a line is drawn once and the highlighted
+    word is blitted over it as a patch, instead of calling draw_line.
+    """
+
+    def __init__(self, layout_factory, draw_line, window_seconds=30.0, sprites=None):
+        self.layout_factory = layout_factory
+        self.draw_line = draw_line
+        self.window_seconds = window_seconds
+        self.sprites = sprites
+        self._reported = False
+        self._reset()
+
+    def _reset(self):
+        self._items = iter(self.layout_factory())
+        self._next = next(self._items, None)
+        self._pending = deque()
+        self._last_t = float("-inf")
+
+    def _advance(self, t):
+        if t < self._last_t:
+            self._reset()
+        self._last_t = t
+
+        # pull the subcaptions that start inside the look-ahead window
+        while self._next is not None and self._next["start"] <= t + self.window_seconds:
+            self._pending.append(self._next)
+            self._next = next(self._items, None)
+
+        # forget the ones that already ended
+        if any(item["end"] <= t for item in self._pending):
+            self._pending = deque(item for item in self._pending if item["end"] > t)
+
+        if self.sprites is not None and self._next is None and not self._pending and not self._reported:
+            self.sprites.report()
+            self._reported = True
+
+    def _bitmaps(self, item):
+        if "bitmaps" not in item:
+            if self.sprites is not None:
+                item["bitmaps"] = [(line, self.sprites.layers(line["text"], line.get("highlight")))
+                                   for line in item["lines"]]
+            else:
+                item["bitmaps"] = [(line, [clip_to_rgba(self.draw_line(line, item["current_word"])) + (0,)])
+                                   for line in item["lines"]]
+        return item["bitmaps"]
+
+    def draw(self, get_frame, t):
+        frame = get_frame(t)
+        self._advance(t)
+
+        active = [item for item in self._pending if item["start"] <= t < item["end"]]
+        if not active:
+            return frame
+
+        frame = np.array(frame, dtype=np.uint8, copy=True)
+        for item in active:
+            for line, layers in self._bitmaps(item):
+                # the first layer is the whole line, the others are offset from its left edge
+                line_width = layers[0][1].shape[1]
+                x = (frame.shape[1] - line_width) // 2 if line["x"] == "center" else int(line["x"])
+                for rgb, alpha, dx in layers:
+                    blit(frame, rgb, alpha, x + dx, int(line["y"]))
+        return frame
+
+    def apply(self, video):
+        # moviepy 2 renamed fl() to transform()
+        if hasattr(video, "transform"):
+            return video.transform(self.draw)
+        return video.fl(self.draw)
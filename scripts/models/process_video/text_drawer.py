@@ -160,6 +160,18 @@ def create_composite_text(text_clips: list[VideoClip], font, font_size) -> Compo
 
     return CompositeVideoClip(clips)
 
+def word_offsets(words: list[str], font, fontsize) -> list[int]:
+    """x offset of every word in the clip create_text_ex draws for these words (same spacing as create_composite_text)."""
+    pil_font = ImageFont.truetype(font, fontsize // 3)
+    scale_factor = 3.012 # factor to convert Pillow to MoviePy width
+
+    offsets = []
+    offset_x = 0
+    for word in words:
+        offsets.append(int(offset_x))
+        offset_x += (sum(pil_font.getlength(char) for char in word) + pil_font.getlength(" ")) * scale_factor
+    return offsets
+
 def str_to_charlist(text: str) -> list[Character]:
     return [Character(char) for char in text]
 
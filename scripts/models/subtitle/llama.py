@@ -39,7 +39,7 @@ def get_audio(paths):
     return audio_paths
 
 
-def get_subtitles(audio_paths: list, output_srt: bool, output_dir: str, model:whisper.model.Whisper, args: dict, translate_to: str = None) -> Tuple[dict, str]:
+def get_subtitles(audio_paths: list, output_srt: bool, output_dir: str, model:whisper.model.Whisper, args: dict, translate_to: str = None, token=None) -> Tuple[dict, str]:
     subtitles_path = {}
 
     for path, audio_path in audio_paths.items():
@@ -73,11 +73,13 @@ def get_subtitles(audio_paths: list, output_srt: bool, output_dir: str, model:wh
             print(f"Using language: {args['language']}")
             
         result = model.transcribe(audio_path, **args)
+        if token is not None:
+            token.check()
         
         if translate_to is not None and translate_to not in current_lang:
             print("[Step3] translate (Llama2)")
             text_batch = get_text_batch(segments=result["segments"])
-            translated_batch = translates(translate_to=translate_to, text_batch=text_batch)
+            translated_batch = translates(translate_to=translate_to, text_batch=text_batch, token=token)
             result["segments"] = replace_text_batch(segments=result["segments"], translated_batch=translated_batch)
             print(f"translated to {translate_to}")
         
@@ -90,10 +92,10 @@ def get_subtitles(audio_paths: list, output_srt: bool, output_dir: str, model:wh
 
         print("reforamt_subtitle")
         
-        pretty_subtitle = reforamt_subtitle(result["segments"]) #reforamt subtitle to json for currect format moviepy
+        pretty_subtitle = iter_reformat_subtitle(result["segments"]) #reforamt subtitle to json for currect format moviepy
 
         with open(f"{srt_path_base}.json", 'w', encoding='utf-8') as json_file:
-            json.dump(pretty_subtitle, json_file, indent=4, ensure_ascii=False)
+            write_subtitle_json(pretty_subtitle, json_file)  # one entry at a time, the reformatted copy is never held whole
         print(f"json file is saved: {srt_path_base}.json")
         
         
@@ -108,7 +110,7 @@ def get_subtitles(audio_paths: list, output_srt: bool, output_dir: str, model:wh
 
     return subtitles_path, detected_language
 
-def translates(translate_to: str, text_batch: List[str], max_batch_size: int = 32):
+def translates(translate_to: str, text_batch: List[str], max_batch_size: int = 32, token=None):
     model, tokenizer = load_translator()
     
     # split text_batch into max_batch_size
@@ -117,6 +119,8 @@ def translates(translate_to: str, text_batch: List[str], max_batch_size: int = 3
     translated_batch = []
     
     for batch in tqdm(divided_text_batches, desc="batch translate"):
+        if token is not None:
+            token.check()
         model_inputs = tokenizer(batch, return_tensors="pt", padding=True)
         generated_tokens = model.generate(
             **model_inputs,
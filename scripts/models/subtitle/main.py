@@ -7,7 +7,7 @@ from auto_subtitle_llama.llama import *
 from SmartAITool.core import cprint, bprint
 
 
-def generate_subtitle(video_path, output_dir, model_name, language, translate_to, args):
+def generate_subtitle(video_path, output_dir, model_name, language, translate_to, args, token=None):
     """
     Generate subtitles for video files
     
@@ -18,6 +18,7 @@ def generate_subtitle(video_path, output_dir, model_name, language, translate_to
         language (str): Language code
         translate_to (str): Target language for translation
         args (dict): Additional arguments
+        token (CancelToken): checked between the steps, None to never stop
     """
     if model_name.endswith(".en"):
         warnings.warn(
@@ -30,11 +31,15 @@ def generate_subtitle(video_path, output_dir, model_name, language, translate_to
     
     print("Loading Whisper model")
     model = whisper.load_model(model_name)
+    if token is not None:
+        token.check()
     
     print("Extracting audio from video")
 # Ensure video_path is a list for get_audio function
     video_paths = [video_path] if isinstance(video_path, str) else video_path
     audios = get_audio(video_paths)
+    if token is not None:
+        token.check()
     
     # Extract subtitle output directory from output_dir tuple
     _, _, subtitle_dir, _ = output_dir
@@ -48,6 +53,7 @@ def generate_subtitle(video_path, output_dir, model_name, language, translate_to
         model,
         args, 
         translate_to=translate_to,
+        token=token,
     )
     
     return pretty_subtitle
@@ -133,101 +133,116 @@ def replace_text_batch(segments:List[dict], translated_batch:List[str]):
 
 
 
-def reforamt_subtitle(json_subtitle):
-    
-    # Characters to filter out
-    filter_chars = [';', '"', "'", ',', '.', '!', '?', '،',':', '؟', '؛', '(', ')', '[', ']', '{', '}', '<', '>', '«', '»']
-    # Process each entry
-    for entry in json_subtitle:
-        # Clean the main text field
-        text = entry['text']
-        for char in filter_chars:
-            text = text.replace(char, '')
-        entry['text'] = text.strip()
+# Characters to filter out
+FILTER_CHARS = [';', '"', "'", ',', '.', '!', '?', '،',':', '؟', '؛', '(', ')', '[', ']', '{', '}', '<', '>', '«', '»']
 
 
+def reformat_entry(entry):
     """
-    Process subtitle file to add start and end times for each word based on word length.
+    Reformat one subtitle entry: clean the text and add start and end times for
+    each word based on word length. Returns a new dict, `entry` is not modified.
     """
+    subtitle = dict(entry)
 
-    # Process each subtitle entry
-    for subtitle in json_subtitle:
-        start_time = subtitle['start']
-        end_time = subtitle['end']
-        total_duration = end_time - start_time
-        
-        # Ensure 'words' key exists, initialize as an empty list if not present
-        if 'words' not in subtitle:
-            subtitle['words'] = []
-        
-        # Extract words from the text
-        words = subtitle['text'].split()
-        
-        # Calculate total length of all words
-        total_length = sum(len(word.strip()) for word in words)
+    # Clean the main text field
+    text = subtitle['text']
+    for char in FILTER_CHARS:
+        text = text.replace(char, '')
+    subtitle['text'] = text.strip()
+
+    start_time = subtitle['start']
+    end_time = subtitle['end']
+    total_duration = end_time - start_time
+    
+    # Keep existing words, initialize as an empty list if not present
+    subtitle['words'] = list(subtitle.get('words', []))
+    
+    # Extract words from the text
+    words = subtitle['text'].split()
+    
+    # Calculate total length of all words
+    total_length = sum(len(word.strip()) for word in words)
+    
+    # Edge case: if total_length is 0, distribute time equally
+    if total_length == 0:
+        time_per_word = total_duration / len(words) if words else 0
+        current_time = start_time
         
-        # Edge case: if total_length is 0, distribute time equally
-        if total_length == 0:
-            time_per_word = total_duration / len(words) if words else 0
-            current_time = start_time
-            
-            for word in words:
-                word_data = {
-                    'word': " " + word,  # Add space at the beginning
-                    'start': round(current_time, 3),
-                    'end': round(current_time + time_per_word, 3)
-                }
-                subtitle['words'].append(word_data)
-                current_time += time_per_word
-        else:
-            # Distribute time based on word length
-            current_time = start_time
-            for word in words:
-                word_length = len(word.strip())
-                # Calculate word duration based on its proportion of total length
-                if word_length == 0:  # Handle empty words
-                    word_duration = total_duration / (2 * len(words))  # Give half of average time
-                else:
-                    word_duration = (word_length / total_length) * total_duration
-                
-                word_data = {
-                    'word': " " + word,  # Add space at the beginning
-                    'start': round(current_time, 3),
-                    'end': round(current_time + word_duration, 3)
-                }
-                subtitle['words'].append(word_data)
-                current_time += word_duration
+        for word in words:
+            word_data = {
+                'word': " " + word,  # Add space at the beginning
+                'start': round(current_time, 3),
+                'end': round(current_time + time_per_word, 3)
+            }
+            subtitle['words'].append(word_data)
+            current_time += time_per_word
+    else:
+        # Distribute time based on word length
+        current_time = start_time
+        for word in words:
+            word_length = len(word.strip())
+            # Calculate word duration based on its proportion of total length
+            if word_length == 0:  # Handle empty words
+                word_duration = total_duration / (2 * len(words))  # Give half of average time
+            else:
+                word_duration = (word_length / total_length) * total_duration
             
-            # Adjust the last word to exactly match the subtitle end time
-            if words:
-                subtitle['words'][-1]['end'] = end_time
+            word_data = {
+                'word': " " + word,  # Add space at the beginning
+                'start': round(current_time, 3),
+                'end': round(current_time + word_duration, 3)
+            }
+            subtitle['words'].append(word_data)
+            current_time += word_duration
+        
+        # Adjust the last word to exactly match the subtitle end time
+        if words:
+            subtitle['words'][-1]['end'] = end_time
     
-    # Merge words starting with "می" with the next word (if needed)
     """
     Merge words starting with "می" with the next word.
     For example, "می" and "کند" become "میکند".
     """
-    for subtitle in json_subtitle:
-        words = subtitle['words']
-        i = 0
-        while i < len(words) - 1:  # Ensure we don't go out of bounds with next word check
-            word = words[i]
-            # Check if current word is "می" (with or without space)
-            if word['word'].strip() == "می":
-                next_word = words[i + 1]
-                # Create merged word - ensure no space between می and the next word
-                merged_word = {
-                    "word": " " + word['word'].strip() + next_word['word'].strip(),  # Add space at the beginning of the merged word
-                    "start": word['start'],
-                    "end": next_word['end']
-                }
-                # Replace the two words with the merged one
-                words[i] = merged_word
-                words.pop(i + 1)
-            else:
-                i += 1
-                
-    return json_subtitle
+    words = subtitle['words']
+    i = 0
+    while i < len(words) - 1:  # Ensure we don't go out of bounds with next word check
+        word = words[i]
+        # Check if current word is "می" (with or without space)
+        if word['word'].strip() == "می":
+            next_word = words[i + 1]
+            # Create merged word - ensure no space between می and the next word
+            merged_word = {
+                "word": " " + word['word'].strip() + next_word['word'].strip(),  # Add space at the beginning of the merged word
+                "start": word['start'],
+                "end": next_word['end']
+            }
+            # Replace the two words with the merged one
+            words[i] = merged_word
+            words.pop(i + 1)
+        else:
+            i += 1
+
+    return subtitle
+
+
+def iter_reformat_subtitle(json_subtitle):
+    """Generator version of reforamt_subtitle: one entry in, one entry out, nothing kept in memory."""
+    for entry in json_subtitle:
+        yield reformat_entry(entry)
+
+
+def reforamt_subtitle(json_subtitle):
+    return list(iter_reformat_subtitle(json_subtitle))
+
+
+def write_subtitle_json(entries, file: TextIO):
+    """json.dump(list(entries), file, indent=4) without building the list: entries are written as they come."""
+    file.write("[")
+    i = -1
+    for i, entry in enumerate(entries):
+        item = json.dumps(entry, indent=4, ensure_ascii=False).replace("\n", "\n    ")
+        file.write(("," if i else "") + "\n    " + item)
+    file.write("]" if i < 0 else "\n]")
      
 
 
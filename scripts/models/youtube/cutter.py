@@ -0,0 +1,302 @@
+"""
+Cut segments out of a local video with ffmpeg, copying the streams where possible.
+
+The part between the first and the last keyframe inside a segment is stream
+copied; only the partial GOPs at the two boundaries are re-encoded, with the
+profile, level and pixel format of the source. The parts are MPEG-TS files
+whose parameter sets (SPS/PPS) are repeated in-band at every keyframe, since
+the mp4 concat demuxer keeps only the first part's extradata and the re-encoded
+parts can't share it. The audio track is cut separately (re-encoding audio is
+cheap) and muxed when the video parts are joined, and the joined file is probed
+before it is used. Cuts that need a video filter, or sources whose codec we
+can't re-encode to match, fall back to a full re-encode of the segment.
+"""
+import json
+import os
+import shutil
+import subprocess
+
+from scripts.src.cancel import check, run_command, run_command_output
+from scripts.src.files import atomic_write_text
+
+# Keyframe times closer than this to a cut point count as "on" the cut
+TOLERANCE = 0.01
+
+# Seeks of stream-copied parts are nudged this far past their keyframe (rounding
+# them below it would copy the whole previous GOP), and parts end this far before
+# the next part's first frame; far less than a frame
+SEEK_EPSILON = 0.001
+
+# Encoders producing a stream that can be joined with a copied stream of the codec
+MATCHING_ENCODERS = {
+    "h264": "libx264",
+    "hevc": "libx265",
+}
+
+# Bitstream filter putting the parameter sets in-band, for the MPEG-TS parts
+ANNEXB_FILTERS = {
+    "h264": "h264_mp4toannexb",
+    "hevc": "hevc_mp4toannexb",
+}
+
+# ffprobe profile names to encoder profile names
+PROFILES = {
+    "constrained baseline": "baseline",
+    "high 10": "high10",
+    "high 4:2:2": "high422",
+    "high 4:4:4 predictive": "high444",
+    "main 10": "main10",
+    "main still picture": "mainstillpicture",
+}
+
+
+def parse_time(value):
+    """HH:MM:SS(.ms), MM:SS or plain seconds to seconds; None stays None."""
+    if value is None or value == "":
+        return None
+    seconds = 0.0
+    for part in str(value).split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def parse_rate(value):
+    """ffprobe rate like "30000/1001" to frames per second, None if unknown."""
+    numerator, _, denominator = str(value or "").partition("/")
+    try:
+        rate = float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return rate or None
+
+
+def probe_streams(source_path, token=None):
+    """
+    Codec, profile, level, pixel format, frame rate and B-frame reorder delay
+    (in frames) of the first video stream and whether there is audio, None if
+    ffprobe fails.
+    """
+    cmd = ['ffprobe', '-v', 'error', '-show_entries',
+           'stream=codec_type,codec_name,profile,level,pix_fmt,r_frame_rate,has_b_frames', '-of', 'json', source_path]
+    returncode, stdout, _ = run_command_output(cmd, token=token)
+    if returncode != 0:
+        return None
+    streams = json.loads(stdout or "{}").get("streams", [])
+    video = next((stream for stream in streams if stream.get("codec_type") == "video"), None)
+    if video is None:
+        return None
+    return {
+        "codec": video.get("codec_name"),
+        "profile": video.get("profile"),
+        "level": video.get("level"),
+        "pix_fmt": video.get("pix_fmt"),
+        "frame_rate": parse_rate(video.get("r_frame_rate")),
+        "reorder_frames": int(video.get("has_b_frames") or 0),
+        "has_audio": any(stream.get("codec_type") == "audio" for stream in streams),
+    }
+
+
+def keyframes(source_path, token=None):
+    """
+    Sorted keyframe times of the first video stream. Read from the packet
+    flags (no decoding) and cached next to the source, since sources are reused.
+    """
+    cache_path = source_path + ".keyframes.json"
+    size = os.path.getsize(source_path)
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r') as file:
+            cached = json.load(file)
+        if cached.get("size") == size:
+            return cached["times"]
+
+    cmd = ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'packet=pts_time,flags',
+           '-of', 'csv=p=0', source_path]
+    returncode, stdout, _ = run_command_output(cmd, token=token)
+    if returncode != 0:
+        return []
+
+    times = []
+    for line in stdout.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            times.append(float(pts_time))
+    times.sort()
+    atomic_write_text(cache_path, json.dumps({"size": size, "times": times}))
+    return times
+
+
+def _ffmpeg(cmd, token):
+    result = run_command(['ffmpeg', '-y', '-v', 'error'] + cmd, token=token,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return result.returncode == 0
+
+
+def _range_args(start, end, copy=False, exclusive=False):
+    """
+    -ss/-t of [start, end). A `copy` start (a keyframe) is nudged forward, as an
+    input seek lands on the last keyframe at or before it; an `exclusive` end
+    leaves out a frame starting exactly at `end`.
+    """
+    start = (start or 0.0) + (SEEK_EPSILON if copy else 0.0)
+    args = []
+    if start:
+        args.extend(['-ss', f"{start:.6f}"])
+    if end is not None:
+        args.extend(['-t', f"{end - (SEEK_EPSILON if exclusive else 0.0) - start:.6f}"])
+    return args
+
+
+def encoder_args(info):
+    """Options re-encoding a boundary GOP like the source stream, parameter sets at every keyframe."""
+    codec = info["codec"]
+    args = ['-c:v', MATCHING_ENCODERS[codec], '-pix_fmt', info["pix_fmt"] or 'yuv420p']
+    profile = (info.get("profile") or "").lower()
+    profile = PROFILES.get(profile, profile.replace(" ", ""))
+    if profile:
+        args.extend(['-profile:v', profile])
+    level = info.get("level")
+    params = ["repeat-headers=1"]
+    if codec == "h264":
+        if level and level > 0:
+            args.extend(['-level', f"{level / 10:g}"])
+        args.extend(['-x264-params', ":".join(params)])
+    else:
+        if level and level > 0:
+            params.append(f"level-idc={level / 30:g}")
+        args.extend(['-x265-params', ":".join(params)])
+    return args
+
+
+def validate_cut(output_path, duration, joins, token=None):
+    """
+    Whether the joined cut is sound: its video stream lasts `duration` seconds
+    (within a frame or two) and the second around every join (times in the
+    output) decodes without errors.
+    """
+    cmd = ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'stream=duration,r_frame_rate',
+           '-of', 'json', output_path]
+    returncode, stdout, _ = run_command_output(cmd, token=token)
+    if returncode != 0:
+        return False
+    streams = json.loads(stdout or "{}").get("streams", [])
+    rate = parse_rate(streams[0].get("r_frame_rate")) if streams else None
+    try:
+        actual = float(streams[0]["duration"]) if streams else None
+    except (KeyError, ValueError):
+        actual = None
+    if rate is None or actual is None:
+        return False
+    if duration is not None and abs(actual - duration) > 2 / rate + TOLERANCE:
+        return False
+
+    for join in joins:
+        cmd = ['ffmpeg', '-v', 'error', '-ss', f"{max(join - 0.5, 0):.6f}", '-t', '1', '-i', output_path,
+               '-map', '0:v:0', '-f', 'null', '-']
+        returncode, _, stderr = run_command_output(cmd, token=token)
+        if returncode != 0 or stderr.strip():
+            return False
+    return True
+
+
+def reencode_cut(source_path, start, end, output_path, video_filter=None, token=None):
+    """Cut [start, end) with a full re-encode (and the optional -vf filter)."""
+    cmd = _range_args(start, end) + ['-i', source_path]
+    if video_filter:
+        cmd.extend(['-vf', video_filter])
+    cmd.extend(['-c:v', 'libx264', '-c:a', 'aac', output_path])
+    return output_path if _ffmpeg(cmd, token) and os.path.exists(output_path) else None
+
+
+def plan_cut(keyframe_times, start, end):
+    """
+    Split [start, end) into ("encode" | "copy", start, end) parts: re-encoded
+    boundary GOPs around a stream-copied middle running from keyframe to keyframe.
+    Returns None when there is no whole GOP inside the segment to copy.
+    """
+    start = start or 0.0
+    first = next((k for k in keyframe_times if k >= start - TOLERANCE), None)
+    if end is None:
+        last = None  # copy up to the end of the file
+    else:
+        last = next((k for k in reversed(keyframe_times) if k <= end + TOLERANCE), None)
+        if last is not None and abs(last - end) <= TOLERANCE:
+            last = end
+    if first is None or (last is not None and last - first <= TOLERANCE):
+        return None
+
+    parts = []
+    if first - start > TOLERANCE:
+        parts.append(("encode", start, first))
+    parts.append(("copy", first, last))
+    if last is not None and end - last > TOLERANCE:
+        parts.append(("encode", last, end))
+    return parts
+
+
+def cut(source_path, start, end, output_path, video_filter=None, token=None):
+    """
+    Cut [start, end) seconds (end None = to the end) of `source_path` into `output_path`.
+    Stream copy when the cuts are on keyframes, otherwise only the boundary
+    GOPs are re-encoded (a full re-encode if the joined parts don't probe as
+    sound). Returns `output_path`, or None if ffmpeg failed.
+    """
+    info = probe_streams(source_path, token)
+    encoder = MATCHING_ENCODERS.get(info["codec"]) if info else None
+    parts = plan_cut(keyframes(source_path, token), start, end) if encoder and not video_filter else None
+    if not parts:
+        return reencode_cut(source_path, start, end, output_path, video_filter, token)
+
+    work_dir = output_path + ".parts"
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        part_files = []
+        for i, (mode, part_start, part_end) in enumerate(parts):
+            check(token)
+            part_path = os.path.join(work_dir, f"part_{i}.ts")
+            if mode == "copy" and part_end is not None and info["frame_rate"]:
+                # a stream copy stops on decode timestamps, which trail the presentation ones by the
+                # B-frame reorder delay: without this the next keyframe (and more) would be copied too
+                part_end -= info["reorder_frames"] / info["frame_rate"]
+            cmd = _range_args(part_start, part_end, copy=mode == "copy", exclusive=True)
+            cmd += ['-i', source_path, '-map', '0:v:0', '-an']
+            if mode == "copy":
+                cmd.extend(['-c:v', 'copy', '-avoid_negative_ts', 'make_zero'])
+            else:
+                cmd.extend(encoder_args(info))
+            cmd.extend(['-bsf:v', ANNEXB_FILTERS[info["codec"]], '-f', 'mpegts'])
+            if not _ffmpeg(cmd + [part_path], token):
+                print(f"Smart cut failed at part {i} ({mode}), re-encoding the whole segment")
+                return reencode_cut(source_path, start, end, output_path, None, token)
+            part_files.append(part_path)
+
+        audio_path = None
+        if info["has_audio"]:
+            audio_path = os.path.join(work_dir, "audio.m4a")
+            cmd = _range_args(start, end) + ['-i', source_path, '-vn', '-c:a', 'aac', audio_path]
+            if not _ffmpeg(cmd, token):
+                audio_path = None
+
+        list_path = os.path.join(work_dir, "parts.txt")
+        with open(list_path, 'w') as list_file:
+            for part_path in part_files:
+                list_file.write(f"file '{os.path.abspath(part_path)}'\n")
+        cmd = ['-f', 'concat', '-safe', '0', '-i', list_path]
+        if audio_path:
+            cmd.extend(['-i', audio_path, '-map', '0:v:0', '-map', '1:a:0', '-shortest'])
+        cmd.extend(['-c', 'copy', '-movflags', '+faststart', output_path])
+        if not _ffmpeg(cmd, token):
+            print("Joining the cut parts failed, re-encoding the whole segment")
+            return reencode_cut(source_path, start, end, output_path, None, token)
+
+        # output times of the joins; the last copy part may run to the end of the file
+        joins = [part_start - (start or 0.0) for _, part_start, _ in parts[1:]]
+        duration = None if end is None else end - (start or 0.0)
+        if not validate_cut(output_path, duration, joins, token):
+            print("The joined cut doesn't probe as sound, re-encoding the whole segment")
+            return reencode_cut(source_path, start, end, output_path, None, token)
+
+        encoded = sum(part_end - part_start for mode, part_start, part_end in parts if mode == "encode")
+        print(f"Cut {os.path.basename(output_path)}: {len(parts)} parts, {encoded:.1f}s re-encoded, rest stream copied")
+        return output_path
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
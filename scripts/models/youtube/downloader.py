@@ -1,14 +1,27 @@
-import yaml
-import subprocess
 import os
 import re
+import sys
 import tempfile
 import shutil
 import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
+from scripts.src.cancel import Cancelled, check, run_command, run_command_output
+from scripts.models.youtube import cutter, metadata, sources
+from scripts.models.youtube.locks import file_lock
+from scripts.src.files import atomic_write_text
+from scripts.models.youtube.formats import preflight_selector
+from scripts.models.youtube.metadata import MetadataCache
+from scripts.models.youtube.retry import run_with_retry
+from scripts.src.config import AspectRatioConfig, RetryConfig, SegmentConfig, TimeConfig, load_config
 
 
+
+# Suffix of the sidecar file with the aspect ratio transform left to the render
+ASPECT_SIDECAR = ".aspect.json"
+
 def is_short_video(url):
     """Detect if URL is for a YouTube Short."""
     return '/shorts/' in url or 'youtube.com/shorts' in url
@@ -21,17 +34,66 @@ def parse_aspect_ratio(ratio_str):
     except (ValueError, ZeroDivisionError):
         return 16 / 9  # Default to 16:9 if parsing fails
 
-def get_video_info(url):
-    """Get channel name and video title from YouTube URL using yt-dlp."""
+def is_short_target(url, aspect_mode, manual_video_type=None):
+    """Short or regular video - use manual override if provided, else detect from the URL."""
+    if manual_video_type is not None:
+        return manual_video_type.lower() == "short"
+    return is_short_video(url) if aspect_mode == 'auto' else False
+
+def build_aspect_filter(aspect_config, is_short=False):
+    """ffmpeg -vf filter of the crop/scale aspect ratio modes, None when the video is kept as it is."""
+    ratio = parse_aspect_ratio(aspect_config.ratio)
+    
+    if aspect_config.mode == 'crop':
+        crop_filter = f"crop='if(gt(dar,{ratio}),ih*{ratio},iw):if(gt(dar,{ratio}),ih,iw/{ratio})"
+        
+        # Handle crop position
+        offsets = {
+            'center': "if(gt(dar,{0}),(iw-ih*{0})/2,0):if(gt(dar,{0}),0,(ih-iw/{0})/2)",
+            'left': "0:if(gt(dar,{0}),0,(ih-iw/{0})/2)",
+            'right': "if(gt(dar,{0}),iw-ih*{0},0):if(gt(dar,{0}),0,(ih-iw/{0})/2)",
+            'top': "if(gt(dar,{0}),(iw-ih*{0})/2,0):0",
+            'bottom': "if(gt(dar,{0}),(iw-ih*{0})/2,0):if(gt(dar,{0}),ih-ih,ih-iw/{0})",
+        }
+        return crop_filter + ":" + offsets[aspect_config.crop_position].format(ratio) + "'"
+    
+    # Scale/pad (black bars) is not applied to short videos
+    if aspect_config.mode == 'scale' and not is_short:
+        # Calculate scaling and padding to maintain aspect ratio while fitting into target ratio
+        return f"scale=iw:ih,setsar=1,pad=max(iw\\,ih*{ratio}):max(ih\\,iw/{ratio}):(ow-iw)/2:(oh-ih)/2:black"
+    
+    return None
+
+def format_selector(is_short, quality, resolution, url=None, aspect_config=None, preflight=False, token=None,
+                    metadata_cache=None):
+    """
+    yt-dlp -f value - ensure we're only downloading a single format to avoid multiple downloads.
+    With preflight, the smallest format under the same height cap still meeting `resolution`
+    after the crop is picked from the cached metadata (see formats.py).
+    """
+    if is_short:
+        # For shorts, use a simpler format selector
+        return 'best'
+    if resolution and preflight and url:
+        selector = preflight_selector(url, resolution, aspect_config, token, metadata_cache)
+        if selector:
+            return selector
+    if resolution:
+        # For regular videos with resolution, use a more specific selector
+        # The slash indicates fallback, not multiple formats
+        res_value = resolution.rstrip("p")
+        return f'best[height<={res_value}]/best'
+    # Use the specific quality parameter if provided, default to best format
+    return quality or 'best'
+
+def get_video_info(url, token=None, metadata_cache=None):
+    """Get channel name and video title from YouTube URL using the (cached) yt-dlp metadata."""
     try:
-        # Use yt-dlp to fetch video metadata in JSON format
-        cmd = ['yt-dlp', '--dump-json', '--skip-download', url]
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        info = (metadata_cache or MetadataCache()).fetch(url, token)
         
-        if result.returncode == 0 and result.stdout:
-            metadata = json.loads(result.stdout)
-            channel_name = metadata.get('channel', metadata.get('uploader', 'unknown'))
-            video_title = metadata.get('title', 'video')
+        if info:
+            channel_name = info.get('channel', info.get('uploader', 'unknown'))
+            video_title = info.get('title', 'video')
             
             # Clean channel name (remove special characters, spaces to underscores)
             channel_name = re.sub(r'[^\w\s-]', '', channel_name).strip().replace(' ', '_')
@@ -40,6 +102,8 @@ def get_video_info(url):
                 'channel': channel_name,
                 'title': video_title
             }
+    except Cancelled:
+        raise
     except Exception as e:
         print(f"Error getting video info: {str(e)}")
     
@@ -50,30 +114,52 @@ def get_video_info(url):
     }
 
 def get_next_counter(counter_file=None):
-    """Get the next counter value and increment the stored value."""
+    """
+    Get the next counter value and increment the stored value. The file lock makes
+    the read-increment-write atomic across threads and processes, so parallel
+    downloads never get the same counter.
+    """
     if counter_file is None:
         counter_file = os.path.join(os.path.dirname(__file__), 'download_counter.txt')
     
-    # Default starting counter
-    counter = 1
-    
-    # Try to read existing counter
-    try:
-        if os.path.exists(counter_file):
-            with open(counter_file, 'r') as f:
-                counter = int(f.read().strip())
-    except Exception as e:
-        print(f"Error reading counter: {str(e)}")
-    
-    # Write incremented counter back to file
-    try:
-        with open(counter_file, 'w') as f:
-            f.write(str(counter + 1))
-    except Exception as e:
-        print(f"Error writing counter: {str(e)}")
+    with file_lock(counter_file + '.lock'):
+        # Default starting counter
+        counter = 1
+        
+        # Try to read existing counter
+        try:
+            if os.path.exists(counter_file):
+                with open(counter_file, 'r') as f:
+                    counter = int(f.read().strip())
+        except Exception as e:
+            print(f"Error reading counter: {str(e)}")
+        
+        # Write incremented counter back to file
+        try:
+            atomic_write_text(counter_file, str(counter + 1))
+        except Exception as e:
+            print(f"Error writing counter: {str(e)}")
     
     return counter
 
+def allocate_nested_folders(output_base_dir, channel_name, counter_file=None):
+    """
+    Reserve the next counter and create its nested folders. The main folder is
+    created exclusively, so a counter whose folder already exists (e.g. after the
+    counter file was reset) is skipped instead of shared.
+    Returns (counter, folders) - see create_nested_folder_structure.
+    """
+    youtube_folder_path = os.path.join(output_base_dir, "youtube")
+    Path(youtube_folder_path).mkdir(parents=True, exist_ok=True)
+    while True:
+        counter = get_next_counter(counter_file)
+        try:
+            os.mkdir(os.path.join(youtube_folder_path, f"{counter}_youtube_{channel_name}"))
+        except FileExistsError:
+            print(f"Folder for counter {counter} already exists, taking the next one")
+            continue
+        return counter, create_nested_folder_structure(output_base_dir, counter, channel_name)
+
 def create_nested_folder_structure(output_base_dir, counter, channel_name):
     """Create a nested folder structure for the downloaded video."""
     # First create a youtube folder inside the output directory
@@ -97,63 +183,31 @@ def create_nested_folder_structure(output_base_dir, counter, channel_name):
         "download_folder": download_folder_path
     }
 
-def download_video(config):
+def download_video(config, token=None, apply_aspect=True, metadata_cache=None):
     """
     Extract YouTube configuration and download video segments using yt-dlp.
     Returns the path to the downloaded video or list of segment files.
+    With apply_aspect=False the crop/scale aspect ratio is left to the final render.
     """
-    # Extract all YouTube configuration parameters from the config dict
-    params = {
-        # Basic video parameters
-        'url': config.get('video_path', ''),
-        'quality': config['youtube'].get('quality', 'best'),
-        'resolution': config['youtube'].get('resolution', None),
-        'download_full': config['youtube'].get('download_full', False),
-        'video_type': config['youtube'].get('video_type', None),
-        
-        # Filename format settings
-        'filename_format': {
-            'use_counter': config['youtube'].get('filename_format', {}).get('use_counter', True),
-            'use_channel': config['youtube'].get('filename_format', {}).get('use_channel', True),
-            'prefix': config['youtube'].get('filename_format', {}).get('prefix', ''),
-            'use_nested_folders': config['youtube'].get('filename_format', {}).get('use_nested_folders', True),
-        },
-        
-        # Output parameters
-        'output_dir': config.get('output_dir', './output'),
-        'output': {
-            'filename': config['youtube']['output'].get('filename', None) if 'output' in config['youtube'] else None,
-            'merge': config['youtube']['output'].get('merge', True) if 'output' in config['youtube'] else True,
-        },
-        
-        # Segments for partial download
-        'segments': config['youtube'].get('segments', [])
-    }
-    
-    # For backward compatibility with old format
-    if 'time' in config['youtube']:
-        params['time'] = config['youtube'].get('time', {})
-    if 'aspect_ratio' in config['youtube']:
-        params['aspect_ratio'] = config['youtube'].get('aspect_ratio', {})
-    
+    youtube = config.youtube
+    metadata_cache = metadata_cache or MetadataCache.from_config(config)
+
     # Extract common parameters from the parsed config
-    url = params['url']
-    quality = params['quality']
-    resolution = params['resolution']
-    download_full = params['download_full']
-    manual_video_type = params['video_type']
+    url = config.video_path
+    quality = youtube.quality
+    resolution = youtube.resolution
+    download_full = youtube.download_full
+    manual_video_type = youtube.video_type
     
     # Get filename format settings
-    filename_format = params['filename_format']
-    use_counter = filename_format['use_counter']
-    use_channel = filename_format['use_channel']
-    custom_prefix = filename_format['prefix']
-    use_nested_folders = filename_format['use_nested_folders']
+    use_counter = youtube.filename_format.use_counter
+    use_channel = youtube.filename_format.use_channel
+    use_nested_folders = youtube.filename_format.use_nested_folders
     
     # Output parameters
-    output_dir = params['output_dir']
-    base_filename = params['output']['filename']
-    should_merge = params['output']['merge']
+    output_dir = config.output_dir
+    base_filename = youtube.output.filename
+    should_merge = youtube.output.merge
     
     # If custom filename formatting is enabled and no base_filename is provided
     if not base_filename and (use_counter or use_channel):
@@ -172,43 +226,57 @@ def download_video(config):
     if download_full:
         print("\n==== Downloading Full Video ====")
         # Create a segment with no time constraints but with aspect ratio settings
-        aspect_config = {}
+        segment = SegmentConfig()
         
         # For full video downloads, get aspect ratio from first segment if available
-        if params['segments']:
-            aspect_config = params['segments'][0].get('aspect_ratio', {})
-        
-        segment = {
-            'aspect_ratio': aspect_config
-        }
+        if youtube.segments:
+            segment.aspect_ratio = youtube.segments[0].aspect_ratio
         
         # Download the full video
-        result = download_segment(url, segment, quality, resolution, output_dir, base_filename, manual_video_type)
+        result = download_segment(url, segment, quality, resolution, output_dir, base_filename, manual_video_type, token,
+                                  apply_aspect, youtube.retry, youtube.preflight_format,
+                                  metadata_cache=metadata_cache)
         return result
         
     # Handle segments if not downloading full video
-    if params['segments']:
-        segments = params['segments']
+    if youtube.segments:
+        segments = youtube.segments
         print(f"Processing {len(segments)} video segments")
         
-        segment_files = []
-        
         # If not merging, use the final output directory for individual segments
         segments_dir = tempfile.mkdtemp(prefix="yt_segments_") if should_merge else output_dir
         
-        for i, segment in enumerate(segments):
-            # Create a unique filename for each segment
+        # Create a unique filename for each segment
+        segment_filenames = []
+        for i in range(len(segments)):
             if base_filename and not should_merge:
-                segment_filename = f"{base_filename}_segment{i+1}"
-            elif should_merge:
-                segment_filename = f"segment_{i+1:03d}"
+                segment_filenames.append(f"{base_filename}_segment{i+1}")
             else:
-                segment_filename = f"segment_{i+1:03d}"
-                
-            print(f"\n==== Processing Segment {i+1} ====")
-            output_file = download_segment(url, segment, quality, resolution, segments_dir, segment_filename, manual_video_type)
-            if output_file:
-                segment_files.append(output_file)
+                segment_filenames.append(f"segment_{i+1:03d}")
+        
+        segment_files = None
+        sources_dir = config.cache_dir("sources")
+        is_short = is_short_target(url, segments[0].aspect_ratio.mode, manual_video_type)
+        selector = format_selector(is_short, quality, resolution, url, segments[0].aspect_ratio,
+                                   youtube.preflight_format, token, metadata_cache)
+        cached = sources.cached_source(url, selector, sources_dir)
+        many = youtube.local_cut_min_segments and len(segments) >= youtube.local_cut_min_segments
+        if cached or many:
+            # Source already cached or many segments of one video: cut locally from a single download
+            segment_files = download_source_and_cut(url, segments, quality, resolution, segments_dir, segment_filenames,
+                                                    manual_video_type, youtube.max_parallel_downloads,
+                                                    sources_dir, config.cache.sources_max_mb, apply_aspect, youtube.retry,
+                                                    token, youtube.preflight_format, metadata_cache)
+        if segment_files is None:
+            segment_files = download_segments(url, segments, quality, resolution, segments_dir, segment_filenames,
+                                              manual_video_type, youtube.max_parallel_downloads, youtube.retry,
+                                              apply_aspect, token, youtube.preflight_format, metadata_cache)
+        
+        failed = [i + 1 for i, file in enumerate(segment_files) if not file]
+        if failed:
+            print(f"Segments {failed} failed and are left out")
+        # Keep the config order of the segments for the merge
+        segment_files = [file for file in segment_files if file]
         
         if segment_files and should_merge:
             # Merge all segments into final output
@@ -218,7 +286,7 @@ def download_video(config):
                 final_output = os.path.join(output_dir, "merged_output.mp4")
                 
             print(f"\n==== Merging {len(segment_files)} segments into final output ====")
-            success = merge_video_segments(segment_files, final_output)
+            success = merge_video_segments(segment_files, final_output, token)
             
             # Clean up temp directory if merging was successful
             if success:
@@ -238,47 +306,48 @@ def download_video(config):
         return None
     else:
         # Backward compatibility with old format
-        time_config = params.get('time', {})
-        aspect_config = params.get('aspect_ratio', {})
-        
         # Create a segment from the old format
-        segment = {
-            'time': time_config,
-            'aspect_ratio': aspect_config
-        }
+        segment = SegmentConfig(
+            time=youtube.time or TimeConfig(),
+            aspect_ratio=youtube.aspect_ratio or AspectRatioConfig(),
+        )
         
-        result = download_segment(url, segment, quality, resolution, output_dir, base_filename, manual_video_type)
+        result = download_segment(url, segment, quality, resolution, output_dir, base_filename, manual_video_type, token,
+                                  apply_aspect, youtube.retry, youtube.preflight_format,
+                                  metadata_cache=metadata_cache)
         return result
 
-def download_segment(url, segment, quality, resolution, output_dir, segment_filename=None, manual_video_type=None):
-    """Download a video segment with specific settings."""
+def download_segment(url, segment, quality, resolution, output_dir, segment_filename=None, manual_video_type=None, token=None,
+                     apply_aspect=True, retry=None, preflight=False, format_override=None, metadata_cache=None):
+    """
+    Download a video segment with specific settings (apply_aspect=False leaves the
+    crop/scale to the render). Failures are retried by the `retry` policy (RetryConfig).
+    `format_override` replaces the -f selector, `preflight` picks it from the metadata (see format_selector).
+    `metadata_cache` (MetadataCache) provides the metadata and the yt-dlp command.
+    """
+    retry = retry or RetryConfig()
+    metadata_cache = metadata_cache or MetadataCache()
     # Time range parameters
-    time_config = segment.get('time', {})
-    start_time = time_config.get('start', None)
-    end_time = time_config.get('end', None)
+    start_time = segment.time.start
+    end_time = segment.time.end
     
     # Aspect ratio parameters
-    aspect_config = segment.get('aspect_ratio', {})
-    aspect_mode = aspect_config.get('mode', 'auto')
-    aspect_ratio = aspect_config.get('ratio', '16:9')
-    crop_position = aspect_config.get('crop_position', 'center')
+    aspect_mode = segment.aspect_ratio.mode
+    aspect_ratio = segment.aspect_ratio.ratio
+    crop_position = segment.aspect_ratio.crop_position
     
     # Determine if it's a short video - use manual override if provided
+    is_short = is_short_target(url, aspect_mode, manual_video_type)
     if manual_video_type is not None:
-        is_short = manual_video_type.lower() == "short"
         print(f"Using manual video type: {'Short' if is_short else 'Regular'}")
-    else:
-        # Fall back to automatic detection
-        is_short = is_short_video(url) if aspect_mode == 'auto' else False
     
     # Get video info for naming
-    video_info = get_video_info(url)
-    counter = get_next_counter()
+    video_info = get_video_info(url, token, metadata_cache)
     
     # Create nested folder structure if no filename was provided
     if not segment_filename:
-        # Create folder structure - using output_dir as base
-        folders = create_nested_folder_structure(output_dir, counter, video_info['channel'])
+        # Reserve a counter and its folder structure - using output_dir as base
+        counter, folders = allocate_nested_folders(output_dir, video_info['channel'])
         
         # Set the output path to the download subfolder
         output_dir = folders["download_folder"]
@@ -293,27 +362,14 @@ def download_segment(url, segment, quality, resolution, output_dir, segment_file
         print(f"  Download folder: {folders['download_folder']}")
     
     # Build yt-dlp command
-    cmd = ['yt-dlp']
+    cmd = [metadata_cache.ytdlp]
     
     # Add URL
     cmd.append(url)
     
     # Handle quality and resolution for YouTube videos
-    # Ensure we're only downloading a single format to avoid multiple downloads
-    if is_short:
-        # For shorts, use a simpler format selector
-        cmd.extend(['-f', 'best'])
-    elif resolution:
-        # For regular videos with resolution, use a more specific selector
-        # The slash indicates fallback, not multiple formats
-        res_value = resolution.rstrip("p")
-        cmd.extend(['-f', f'best[height<={res_value}]/best'])
-    elif quality != 'best':
-        # Use the specific quality parameter if provided
-        cmd.extend(['-f', quality])
-    else:
-        # Default to best format
-        cmd.extend(['-f', 'best'])
+    cmd.extend(['-f', format_override or format_selector(is_short, quality, resolution, url, segment.aspect_ratio,
+                                                         preflight, token, metadata_cache)])
     
     # Add --no-playlist to ensure only the video is downloaded, not related videos
     cmd.append('--no-playlist')
@@ -343,35 +399,11 @@ def download_segment(url, segment, quality, resolution, output_dir, segment_file
     # Add metadata about video type/aspect ratio
     cmd.extend(['--add-metadata'])
     
-    # Add crop options if crop mode is enabled
-    if aspect_mode == 'crop':
-        # Add ffmpeg post-processing to crop the video
-        crop_filter = f"\"crop='if(gt(dar,{parse_aspect_ratio(aspect_ratio)}),ih*{parse_aspect_ratio(aspect_ratio)},iw):"
-        crop_filter += f"if(gt(dar,{parse_aspect_ratio(aspect_ratio)}),ih,iw/{parse_aspect_ratio(aspect_ratio)})"
-        
-        # Handle crop position
-        if crop_position == 'center':
-            crop_filter += ":if(gt(dar,{0}),(iw-ih*{0})/2,0):if(gt(dar,{0}),0,(ih-iw/{0})/2)'\"".format(parse_aspect_ratio(aspect_ratio))
-        elif crop_position == 'left':
-            crop_filter += ":0:if(gt(dar,{0}),0,(ih-iw/{0})/2)'\"".format(parse_aspect_ratio(aspect_ratio))
-        elif crop_position == 'right':
-            crop_filter += ":if(gt(dar,{0}),iw-ih*{0},0):if(gt(dar,{0}),0,(ih-iw/{0})/2)'\"".format(parse_aspect_ratio(aspect_ratio))
-        elif crop_position == 'top':
-            crop_filter += ":if(gt(dar,{0}),(iw-ih*{0})/2,0):0'\"".format(parse_aspect_ratio(aspect_ratio))
-        elif crop_position == 'bottom':
-            crop_filter += ":if(gt(dar,{0}),(iw-ih*{0})/2,0):if(gt(dar,{0}),ih-ih,ih-iw/{0})'\"".format(parse_aspect_ratio(aspect_ratio))
-        
+    # Add crop or scale/pad post-processing for the target aspect ratio
+    aspect_filter = build_aspect_filter(segment.aspect_ratio, is_short) if apply_aspect else None
+    if aspect_filter:
         # Add the -c:v libx264 parameter to force re-encoding instead of stream copying
-        cmd.extend(['--postprocessor-args', f"ffmpeg:-vf {crop_filter} -c:v libx264"])
-    
-    # Add scale/pad options if scale mode is enabled (and not a short video)
-    elif aspect_mode == 'scale' and not is_short:
-        target_ratio = parse_aspect_ratio(aspect_ratio)
-        # Calculate scaling and padding to maintain aspect ratio while fitting into target ratio
-        pad_filter = f"\"scale=iw:ih,setsar=1,pad=max(iw\\,ih*{target_ratio}):max(ih\\,iw/{target_ratio}):(ow-iw)/2:(oh-ih)/2:black'\"" 
-        
-        # Add the filter to FFmpeg command
-        cmd.extend(['--postprocessor-args', f"ffmpeg:-vf {pad_filter} -c:v libx264"])
+        cmd.extend(['--postprocessor-args', f'ffmpeg:-vf "{aspect_filter}" -c:v libx264'])
     
     # Print segment information
     print(f"Segment time: {start_time} to {end_time}")
@@ -384,42 +416,17 @@ def download_segment(url, segment, quality, resolution, output_dir, segment_file
     if aspect_mode == 'scale' and is_short:
         print("Short video detected - downloading without modification")
     
-    # Execute the command
+    # Execute the command, retrying according to the kind of failure
     print(f"Executing command: {' '.join(cmd)}")
-    result = subprocess.run(cmd)
-    
-    # First fallback: if initial download fails, try with --force-generic-extractor
-    if result.returncode != 0:
-        print("\nInitial download failed. Trying with force-generic-extractor...")
-        # Remove any format specification that might be causing problems
-        cmd = [c for c in cmd if not (c.startswith('best[height') or c.startswith('bv*[height'))]
-        if '-f' in cmd:
-            idx = cmd.index('-f')
-            if idx < len(cmd)-1:
-                cmd.pop(idx+1)  # Remove format specifier
-            cmd.pop(idx)  # Remove -f flag
-        
-        # Add force-generic-extractor which can help with signature extraction issues
-        cmd.append('--force-generic-extractor')
-        print(f"Retrying with command: {' '.join(cmd)}")
-        result = subprocess.run(cmd)
-    
-    # Second fallback: If that still fails, try with --no-check-certificate
-    if result.returncode != 0:
-        print("\nSecond attempt failed. Trying with no-check-certificate...")
-        if '--force-generic-extractor' not in cmd:
-            cmd.append('--force-generic-extractor')
-        cmd.append('--no-check-certificate')
-        print(f"Retrying with command: {' '.join(cmd)}")
-        result = subprocess.run(cmd)
+    returncode, _ = run_with_retry(cmd, output_template, retry.max_attempts, retry.base_delay, retry.max_delay, token)
     
     # Return the output filename if successful
-    if result.returncode == 0 and expected_output:
+    if returncode == 0 and expected_output:
         if os.path.exists(expected_output):
             return expected_output
     
     # If we don't have a predetermined filename, try to find the downloaded file
-    if not expected_output and result.returncode == 0:
+    if not expected_output and returncode == 0:
         # Look for the newest mp4 file in the output directory
         files = [os.path.join(output_dir, f) for f in os.listdir(output_dir) 
                 if f.endswith('.mp4') and os.path.isfile(os.path.join(output_dir, f))]
@@ -430,7 +437,67 @@ def download_segment(url, segment, quality, resolution, output_dir, segment_file
     
     return None
 
-def merge_video_segments(segment_files, output_file):
+def download_segments(url, segments, quality, resolution, segments_dir, segment_filenames, manual_video_type=None,
+                      max_parallel=3, retry=None, apply_aspect=True, token=None, preflight=False, metadata_cache=None):
+    """
+    Download segments with at most `max_parallel` yt-dlp processes at once.
+    Returns one path per segment in config order (None for a segment that
+    still failed after its retries); one failing segment doesn't stop the others.
+    """
+    def download_one(i, segment):
+        check(token)
+        print(f"\n==== Processing Segment {i+1} ====")
+        output_file = download_segment(url, segment, quality, resolution, segments_dir, segment_filenames[i],
+                                       manual_video_type, token, apply_aspect, retry, preflight,
+                                       metadata_cache=metadata_cache)
+        if not output_file:
+            print(f"Segment {i+1} failed")
+        return output_file
+    
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+        futures = [pool.submit(download_one, i, segment) for i, segment in enumerate(segments)]
+        return [future.result() for future in futures]
+
+def download_source_and_cut(url, segments, quality, resolution, segments_dir, segment_filenames, manual_video_type=None,
+                            max_parallel=3, cache_dir=None, cache_max_mb=None, apply_aspect=True, retry=None, token=None,
+                            preflight=False, metadata_cache=None):
+    """
+    Cut every segment locally from the full source video, downloaded once into
+    the source cache (or reused from it) instead of one yt-dlp download per
+    segment. Returns None if the source download fails so the caller can fall
+    back to per-segment downloads.
+    """
+    # same aspect mode as download_segment and download_video, so the source cache key matches
+    is_short = is_short_target(url, segments[0].aspect_ratio.mode, manual_video_type)
+    selector = format_selector(is_short, quality, resolution, url, segments[0].aspect_ratio, preflight, token,
+                               metadata_cache)
+    
+    def download(output_dir, filename):
+        print(f"\n==== Downloading the source once for {len(segments)} segments ====")
+        return download_segment(url, SegmentConfig(), quality, resolution, output_dir, filename, manual_video_type, token,
+                                retry=retry, format_override=selector, metadata_cache=metadata_cache)
+    
+    source_path = sources.get_source(url, selector, cache_dir, download, cache_max_mb)
+    if not source_path:
+        print("Source download failed, downloading the segments one by one")
+        return None
+    print(f"Cutting {len(segments)} segments from {source_path}")
+    
+    def cut_one(i, segment):
+        check(token)
+        print(f"Cutting segment {i+1}: {segment.time.start} to {segment.time.end}")
+        aspect_filter = None
+        if apply_aspect:
+            aspect_filter = build_aspect_filter(segment.aspect_ratio, is_short_target(url, segment.aspect_ratio.mode, manual_video_type))
+        output_path = os.path.join(segments_dir, f"{segment_filenames[i]}.mp4")
+        return cutter.cut(source_path, cutter.parse_time(segment.time.start), cutter.parse_time(segment.time.end),
+                          output_path, aspect_filter, token)
+    
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+        futures = [pool.submit(cut_one, i, segment) for i, segment in enumerate(segments)]
+        return [future.result() for future in futures]
+
+def merge_video_segments(segment_files, output_file, token=None):
     """Merge multiple video segments into a single file using FFmpeg."""
     if not segment_files:
         print("No segments to merge.")
@@ -456,7 +523,7 @@ def merge_video_segments(segment_files, output_file):
     ]
     
     print(f"Executing merge command: {' '.join(cmd)}")
-    result = subprocess.run(cmd)
+    result = run_command(cmd, token=token)
     
     # Clean up the list file
     if os.path.exists(list_file_path):
@@ -464,41 +531,124 @@ def merge_video_segments(segment_files, output_file):
         
     return result.returncode == 0
 
-def youtube_downloader(config):
+def deferred_aspect(config):
+    """
+    Aspect ratio settings the final render applies instead of the download
+    (youtube.defer_aspect), so the video is encoded once. None when the
+    download has to apply them: deferring is off, or the segments use
+    different aspect ratios (they're cut from the same source, so only one
+    transform can be applied to the merged video).
+    """
+    youtube = config.youtube
+    if not youtube.defer_aspect:
+        return None
+    if youtube.direct_segment_download or (not youtube.download_full and not youtube.segments):
+        if youtube.aspect_ratio is not None:
+            return youtube.aspect_ratio
+    if youtube.segments:
+        first = youtube.segments[0].aspect_ratio
+        if youtube.download_full or youtube.direct_segment_download:
+            return first
+        return first if all(segment.aspect_ratio == first for segment in youtube.segments) else None
+    return AspectRatioConfig()
+
+def write_pending_aspect(video_path, aspect_config, is_short):
+    """Sidecar json telling the render which crop/scale is still to be applied to the video."""
+    if aspect_config.mode not in ('crop', 'scale'):
+        return
+    pending = {
+        "mode": aspect_config.mode,
+        "ratio": aspect_config.ratio,
+        "crop_position": aspect_config.crop_position,
+        "is_short": is_short,
+    }
+    with open(video_path + ASPECT_SIDECAR, 'w') as file:
+        json.dump(pending, file)
+
+def read_pending_aspect(video_path):
+    """Crop/scale settings the downloader left to the render, None if the video needs none."""
+    try:
+        with open(video_path + ASPECT_SIDECAR, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+def audio_time_range(config):
+    """
+    Time range the downloaded video will cover, for the audio-only download.
+    None when the video is made of several segments (its audio isn't one range).
+    """
+    youtube = config.youtube
+    if youtube.direct_segment_download or (not youtube.download_full and not youtube.segments):
+        return youtube.time or TimeConfig()
+    if youtube.download_full:
+        return TimeConfig()
+    return youtube.segments[0].time if len(youtube.segments) == 1 else None
+
+def download_audio(config, token=None):
+    """
+    Download only the audio of the video (same time range) so transcription can
+    start while the video is still downloading. Returns the audio path, or None
+    when there is no single time range or yt-dlp fails.
+    """
+    time_range = audio_time_range(config)
+    if time_range is None:
+        return None
+    url = config.video_path
+    
+    audio_dir = config.cache_dir("audio")
+    Path(audio_dir).mkdir(parents=True, exist_ok=True)
+    section = f"{time_range.start or 0}-{time_range.end or 'end'}".replace(':', '.')
+    output_template = os.path.join(audio_dir, f"{metadata.cache_key(url)}_{section}")
+    
+    cmd = [config.youtube.ytdlp_path, url, '-f', 'bestaudio/best', '--no-playlist',
+           '-o', f'{output_template}.%(ext)s', '--print', 'after_move:filepath', '--no-simulate']
+    if time_range.start or time_range.end:
+        cmd.extend(['--download-sections', f"*{time_range.start or '0'}-{time_range.end or 'inf'}"])
+    
+    print(f"Downloading the audio first: {' '.join(cmd)}")
+    returncode, stdout, stderr = run_command_output(cmd, token=token)
+    lines = stdout.strip().splitlines()
+    if returncode != 0 or not lines or not os.path.exists(lines[-1]):
+        print(f"Audio download failed: {stderr.strip()[-500:]}")
+        return None
+    return lines[-1]
+
+def youtube_downloader(config, token=None):
+    youtube = config.youtube
+    metadata_cache = MetadataCache.from_config(config)
+    aspect = deferred_aspect(config)
     # Check if we want to directly use download_segment or the regular flow
-    if config['youtube'].get('direct_segment_download', False):
-        # Direct call to download_segment with parameters from config
-        url = config.get('video_path', '')
-        quality = config['youtube'].get('quality', 'best')
-        resolution = config['youtube'].get('resolution', None)
-        output_dir = config.get('output_dir', './output')
-        base_filename = config['youtube'].get('output', {}).get('filename', None)
-        manual_video_type = config['youtube'].get('video_type', None)
-        
+    if youtube.direct_segment_download:
         # Create segment from time and aspect_ratio if available
-        segment = {}
-        if 'time' in config['youtube']:
-            segment['time'] = config['youtube']['time']
-        if 'aspect_ratio' in config['youtube']:
-            segment['aspect_ratio'] = config['youtube']['aspect_ratio']
-        elif config['youtube'].get('segments') and len(config['youtube']['segments']) > 0:
+        segment = SegmentConfig()
+        if youtube.time is not None:
+            segment.time = youtube.time
+        if youtube.aspect_ratio is not None:
+            segment.aspect_ratio = youtube.aspect_ratio
+        elif youtube.segments:
             # If no direct aspect_ratio but segments exist, use the first segment's aspect_ratio
-            segment['aspect_ratio'] = config['youtube']['segments'][0].get('aspect_ratio', {})
+            segment.aspect_ratio = youtube.segments[0].aspect_ratio
         
         # Call download_segment directly
-        result = download_segment(url, segment, quality, resolution, output_dir, base_filename, manual_video_type)
-        print(f"Download result: {result}")
-        return result
+        result = download_segment(config.video_path, segment, youtube.quality, youtube.resolution, config.output_dir,
+                                  youtube.output.filename, youtube.video_type, token, apply_aspect=aspect is None,
+                                  retry=youtube.retry, preflight=youtube.preflight_format,
+                                  metadata_cache=metadata_cache)
     else:
         # Regular flow
-        result = download_video(config)
-        print(f"Download result: {result}")
-        return result
+        result = download_video(config, token, apply_aspect=aspect is None, metadata_cache=metadata_cache)
+    print(f"Download result: {result}")
+    
+    # Leave the crop/scale to the final render, in the same encode as captions and logo
+    if result and aspect is not None:
+        is_short = is_short_target(config.video_path, aspect.mode, youtube.video_type)
+        for video_path in (result if isinstance(result, list) else [result]):
+            write_pending_aspect(video_path, aspect, is_short)
+    return result
 
 if __name__ == '__main__':
     
-    config_path = '/home/rteam2/m15kh/auto-subtitle/config/config.yaml'
-    with open(config_path, 'r') as file:
-        config = yaml.safe_load(file)
+    config = load_config()
     
     video_path = youtube_downloader(config)
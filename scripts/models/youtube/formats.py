@@ -0,0 +1,75 @@
+"""
+Pre-flight format selection from the (cached) yt-dlp metadata.
+
+Like `best[height<=N]`, no format taller than N is downloaded. Within that
+cap, the smallest video stream whose frame is still at least N pixels on its
+short side *after* the crop is picked (h264 and lower bitrate first), and
+the best format under the cap when none is. Black padding adds no picture, so
+it doesn't count as resolution.
+"""
+from scripts.models.youtube.metadata import MetadataCache
+
+
+def parse_ratio(ratio):
+    width, height = map(int, ratio.split(':'))
+    return width / height
+
+
+def output_size(width, height, aspect_config=None):
+    """Size of the picture a width x height source keeps after the crop of `aspect_config` (padding excluded)."""
+    if aspect_config is None or aspect_config.mode != 'crop':
+        return width, height
+    ratio = parse_ratio(aspect_config.ratio)
+    if width / height > ratio:
+        return height * ratio, height
+    return width, width / ratio
+
+
+def _video_formats(info):
+    return [
+        fmt for fmt in info.get("formats") or []
+        if fmt.get("vcodec") not in (None, "none") and fmt.get("width") and fmt.get("height")
+        and fmt.get("protocol", "https") in ("https", "http")  # no storyboards/HLS fragments
+    ]
+
+
+def _size_key(fmt):
+    # smaller frame first, then h264 (cuts and concat without re-encoding), then lower bitrate
+    is_avc = str(fmt.get("vcodec", "")).startswith("avc")
+    return fmt["width"] * fmt["height"], not is_avc, fmt.get("tbr") or fmt.get("filesize") or 0
+
+
+def select_format(info, target, aspect_config=None):
+    """
+    Among the formats at most `target` pixels high, the smallest one whose
+    cropped output has a short side of at least `target` pixels - or the
+    largest of them if none does. None if no usable video format is under the cap.
+    """
+    formats = sorted((fmt for fmt in _video_formats(info) if fmt["height"] <= target), key=_size_key)
+    if not formats:
+        return None
+    for fmt in formats:
+        if min(output_size(fmt["width"], fmt["height"], aspect_config)) >= target - 1:
+            return fmt
+    largest = max(fmt["width"] * fmt["height"] for fmt in formats)
+    # same frame size: h264 first, then the higher bitrate
+    return min((fmt for fmt in formats if fmt["width"] * fmt["height"] == largest),
+               key=lambda fmt: (_size_key(fmt)[1], -_size_key(fmt)[2]))
+
+
+def preflight_selector(url, resolution, aspect_config=None, token=None, metadata_cache=None):
+    """
+    yt-dlp -f value for the format picked by select_format (video + best audio,
+    falling back to the usual selector), None when the metadata can't be read.
+    """
+    info = (metadata_cache or MetadataCache()).fetch(url, token)
+    if not info or not resolution:
+        return None
+    fmt = select_format(info, int(resolution.rstrip("p")), aspect_config)
+    if fmt is None:
+        return None
+
+    print(f"Pre-flight format: {fmt['format_id']} ({fmt['width']}x{fmt['height']}, {fmt.get('vcodec')})")
+    if fmt.get("acodec") not in (None, "none"):
+        return f"{fmt['format_id']}/best"
+    return f"{fmt['format_id']}+bestaudio[ext=m4a]/{fmt['format_id']}+bestaudio/best"
@@ -0,0 +1,40 @@
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+@contextmanager
+def file_lock(lock_path, poll_interval=0.1):
+    """
+    Exclusive lock shared by threads and processes (and workers on the same
+    machine), held while the with-block runs.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+
+    if fcntl is not None:
+        with open(lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        return
+
+    # Fallback: the lock is the existence of the file
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            time.sleep(poll_interval)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+
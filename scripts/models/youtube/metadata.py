@@ -0,0 +1,103 @@
+"""
+yt-dlp metadata (`--dump-json`) fetched once per video and cached on disk.
+
+The cache is one json file per video ID in `cache_dir`, written atomically and
+guarded by a file lock, so segments of one run, later runs and parallel
+workers all share a single extractor round-trip per video until `ttl` expires.
+The settings live on a MetadataCache, created once per run from the config.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from scripts.src.cancel import run_command_output
+from scripts.models.youtube.locks import file_lock
+from scripts.src.files import atomic_write_text
+
+DEFAULT_YTDLP = "yt-dlp"
+DEFAULT_CACHE_DIR = os.path.join("output", "cache", "metadata")
+DEFAULT_TTL = 24 * 3600
+
+VIDEO_ID_PATTERN = re.compile(r"(?:[?&]v=|/shorts/|youtu\.be/|/embed/|/live/|/v/)([0-9A-Za-z_-]{11})")
+
+
+def extract_video_id(url):
+    """YouTube video ID of the URL, None if it has none (other sites, playlists)."""
+    match = VIDEO_ID_PATTERN.search(url)
+    return match.group(1) if match else None
+
+
+def cache_key(url):
+    return extract_video_id(url) or "url_" + hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+
+
+class MetadataCache:
+    """
+    Metadata of videos from memory, else <cache_dir>/<key>.json, else
+    `ytdlp --dump-json`. An entry expires `ttl` seconds after it was fetched
+    (the mtime of its file), wherever it is read from. One instance is shared
+    by the threads of a run; the file lock shares a fetch between processes.
+    """
+
+    def __init__(self, ytdlp=DEFAULT_YTDLP, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL):
+        self.ytdlp = ytdlp or DEFAULT_YTDLP
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.ttl = DEFAULT_TTL if ttl is None else ttl
+        self._memo = {}  # key -> (fetched at, metadata)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.youtube.ytdlp_path, config.cache_dir("metadata"), config.cache.metadata_ttl)
+
+    def path(self, url):
+        return os.path.join(self.cache_dir, f"{cache_key(url)}.json")
+
+    def _fresh(self, fetched_at):
+        return time.time() - fetched_at <= self.ttl
+
+    def _read(self, path):
+        """(fetched at, metadata) of the cache file if it hasn't expired, else None."""
+        try:
+            fetched_at = os.path.getmtime(path)
+            if not self._fresh(fetched_at):
+                return None
+            with open(path, 'r', encoding='utf-8') as file:
+                return fetched_at, json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def fetch(self, url, token=None, refresh=False):
+        """
+        Full yt-dlp metadata of `url` as a dict, from the cache when it is younger
+        than `ttl`. Returns None when yt-dlp fails (nothing is cached then).
+        """
+        key = cache_key(url)
+        path = self.path(url)
+
+        with self._lock:
+            entry = self._memo.get(key)
+        if entry is not None and not refresh and self._fresh(entry[0]):
+            return entry[1]
+
+        entry = None if refresh else self._read(path)
+        if entry is None:
+            # one fetch per video: whoever holds the lock fetches, the others read its result
+            with file_lock(path + ".lock"):
+                entry = None if refresh else self._read(path)
+                if entry is None:
+                    cmd = [self.ytdlp, '--dump-json', '--skip-download', '--no-playlist', url]
+                    returncode, stdout, stderr = run_command_output(cmd, token=token)
+                    if returncode != 0 or not stdout.strip():
+                        print(f"Error getting video metadata: {stderr.strip()[-500:]}")
+                        return None
+                    metadata = json.loads(stdout.splitlines()[0])
+                    atomic_write_text(path, json.dumps(metadata, ensure_ascii=False))
+                    entry = os.path.getmtime(path), metadata
+
+        with self._lock:
+            self._memo[key] = entry
+        return entry[1]
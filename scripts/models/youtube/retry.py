@@ -0,0 +1,126 @@
+"""
+Retry policy for yt-dlp downloads.
+
+yt-dlp's stderr is classified into an error kind, and each kind has its own
+strategy: wait (exponential backoff with jitter) and keep the command so the
+`.part` file is resumed, change the command (drop the format selector, force
+the generic extractor, skip the certificate check), or give up at once when
+retrying can't help (private/removed video).
+"""
+import glob
+import os
+import random
+import tempfile
+
+from scripts.src.cancel import run_command, sleep
+
+# (kind, stderr substrings), first match wins - so the fatal ones come first
+ERROR_PATTERNS = [
+    ("unavailable", ["Video unavailable", "Private video", "This video has been removed", "members-only",
+                     "Sign in to confirm your age", "This live event will begin", "is not a valid URL"]),
+    ("rate_limited", ["HTTP Error 429", "Too Many Requests", "rate-limited", "confirm you're not a bot"]),
+    ("format_unavailable", ["Requested format is not available", "requested format not available"]),
+    ("certificate", ["CERTIFICATE_VERIFY_FAILED", "certificate verify failed", "SSL: "]),
+    ("extractor", ["Signature extraction failed", "Unable to extract", "nsig extraction failed",
+                   "Unsupported URL", "Failed to parse JSON"]),
+    ("network", ["timed out", "Connection reset", "Connection refused", "Temporary failure in name resolution",
+                 "IncompleteRead", "HTTP Error 5", "Got error:", "Unable to download", "Network is unreachable",
+                 "Remote end closed connection"]),
+]
+
+
+def classify(stderr):
+    """Error kind of a failed yt-dlp run from its stderr ("unknown" if nothing matches)."""
+    for kind, patterns in ERROR_PATTERNS:
+        if any(pattern in stderr for pattern in patterns):
+            return kind
+    return "unknown"
+
+
+def _without_format(cmd):
+    if '-f' not in cmd:
+        return cmd
+    i = cmd.index('-f')
+    return cmd[:i] + cmd[i + 2:]
+
+
+def _with_flag(flag):
+    return lambda cmd: cmd if flag in cmd else cmd + [flag]
+
+
+# kind -> (retry at all, wait before retrying, backoff multiplier, command change or None)
+# Without a command change the same .part file is resumed on the next attempt (but see
+# run_with_retry: downloads with --download-sections are restarted, not resumed)
+STRATEGIES = {
+    "unavailable": (False, False, 1, None),
+    "rate_limited": (True, True, 4, None),
+    "network": (True, True, 1, None),
+    "format_unavailable": (True, False, 1, _without_format),
+    "certificate": (True, False, 1, _with_flag('--no-check-certificate')),
+    "extractor": (True, True, 1, _with_flag('--force-generic-extractor')),
+    "unknown": (True, True, 1, None),
+}
+
+
+def backoff_delay(attempt, base_delay, max_delay, multiplier=1):
+    """Exponential backoff with full jitter: uniform(0, min(max_delay, base * 2^attempt))."""
+    return random.uniform(0, min(max_delay, base_delay * multiplier * 2 ** attempt))
+
+
+def _run(cmd, token):
+    # stdout stays on the console (progress), stderr goes to a file so it can be classified
+    with tempfile.TemporaryFile(mode='w+', encoding='utf-8', errors='replace') as stderr_file:
+        result = run_command(cmd, token=token, stderr=stderr_file)
+        stderr_file.seek(0)
+        stderr = stderr_file.read()
+    if stderr:
+        print(stderr.rstrip()[-2000:])
+    return result.returncode, stderr
+
+
+def _remove_partials(output_template):
+    # a changed command may pick another format, resuming its .part would corrupt the file
+    for path in glob.glob(glob.escape(output_template) + '*.part'):
+        os.remove(path)
+
+
+def run_with_retry(cmd, output_template=None, max_attempts=5, base_delay=2.0, max_delay=60.0, token=None):
+    """
+    Run a yt-dlp command, retrying according to the error kind of each failure.
+    `output_template` (the -o path without extension) locates the .part files.
+    Returns (returncode, error kind of the last failure or None).
+    """
+    cmd = list(cmd)
+    # --continue only resumes yt-dlp's own downloader: with --download-sections ffmpeg
+    # downloads the range and starts over on every attempt, whatever .part is left
+    if '--continue' not in cmd:
+        cmd.append('--continue')
+
+    kind = None
+    for attempt in range(max_attempts):
+        if attempt:
+            print(f"Retrying ({attempt + 1}/{max_attempts}): {' '.join(cmd)}")
+        returncode, stderr = _run(cmd, token)
+        if returncode == 0:
+            return 0, None
+
+        kind = classify(stderr)
+        retry, wait, multiplier, change = STRATEGIES[kind]
+        print(f"Download failed ({kind})")
+        if not retry or attempt == max_attempts - 1:
+            return returncode, kind
+
+        if change is not None:
+            changed = change(cmd)
+            if changed == cmd and not wait:
+                # the fix was already applied, retrying the same command won't help
+                return returncode, kind
+            if changed != cmd and output_template:
+                _remove_partials(output_template)
+            cmd = changed
+        if wait:
+            delay = backoff_delay(attempt, base_delay, max_delay, multiplier)
+            print(f"Waiting {delay:.1f}s before retrying")
+            sleep(delay, token)
+
+    return returncode, kind
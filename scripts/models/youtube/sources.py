@@ -0,0 +1,63 @@
+"""
+Cache of full source downloads, one file per (video ID, format selector).
+
+Segments are cut from the cached file (see cutter.py), so editing the segments
+of a video that was already downloaded doesn't touch the network again.
+The least recently used sources are evicted when the cache grows over `max_mb`.
+"""
+import hashlib
+import os
+
+from scripts.models.youtube.locks import file_lock
+from scripts.models.youtube.metadata import cache_key
+
+
+def source_path(cache_dir, url, format_selector):
+    digest = hashlib.sha1(format_selector.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(cache_dir, f"{cache_key(url)}_{digest}.mp4")
+
+
+def cached_source(url, format_selector, cache_dir):
+    """Path of the cached source if it was downloaded already, else None."""
+    path = source_path(cache_dir, url, format_selector)
+    return path if os.path.exists(path) else None
+
+
+def get_source(url, format_selector, cache_dir, download, max_mb=None):
+    """
+    Path of the full source video, downloaded with `download(output_dir, filename)`
+    (returns the downloaded path or None) if it isn't cached yet. Concurrent
+    callers for the same source wait for a single download.
+    """
+    path = source_path(cache_dir, url, format_selector)
+    with file_lock(path + ".lock"):
+        if not os.path.exists(path):
+            filename = os.path.splitext(os.path.basename(path))[0] + ".download"
+            downloaded = download(cache_dir, filename)
+            if not downloaded:
+                return None
+            os.replace(downloaded, path)
+            if max_mb:
+                evict(cache_dir, max_mb, keep=path)
+
+    # mark as recently used for eviction
+    os.utime(path)
+    return path
+
+
+def evict(cache_dir, max_mb, keep=None):
+    """Delete the least recently used sources until the cache fits in `max_mb`."""
+    sources = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir)
+               if name.endswith(".mp4") and not name.endswith(".download.mp4")]
+    sources.sort(key=os.path.getmtime)
+    total = sum(os.path.getsize(path) for path in sources)
+    for path in sources:
+        if total <= max_mb * 1024 * 1024:
+            break
+        if path == keep:
+            continue
+        total -= os.path.getsize(path)
+        print(f"Evicting cached source {os.path.basename(path)}")
+        os.remove(path)
+        if os.path.exists(path + ".keyframes.json"):
+            os.remove(path + ".keyframes.json")
@@ -0,0 +1,130 @@
+"""
+Suggest Shorts segments from a long video.
+
+Scene-change scores come from one ffmpeg pass over a small, low-fps copy of
+the frames (`select` scene score), which runs many times faster than real
+time on a CPU. If a transcript (subtitle json) exists, its word timings give
+the speech density. Candidate windows start on scene cuts; the speech and
+visual scores rank them, and the best non-overlapping ones are returned in the
+`youtube.segments` config format.
+"""
+import bisect
+import json
+import os
+import re
+
+from scripts.src.cancel import run_command_output
+
+
+def format_time(seconds):
+    seconds = int(round(seconds))
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def scene_scores(video_path, sample_fps=5, width=160, token=None):
+    """[(time, scene score 0..1)] of every sampled frame."""
+    video_filter = f"fps={sample_fps},scale={width}:-2,select='gte(scene,0)',metadata=print:file=-"
+    cmd = ['ffmpeg', '-hide_banner', '-nostats', '-threads', '0', '-i', video_path, '-an', '-sn',
+           '-vf', video_filter, '-f', 'null', '-']
+    returncode, stdout, stderr = run_command_output(cmd, token=token)
+    if returncode != 0:
+        raise RuntimeError(f"scene detection failed: {stderr.strip()[-500:]}")
+
+    scores = []
+    current_time = None
+    for line in stdout.splitlines():
+        match = re.search(r"pts_time:([\d.]+)", line)
+        if match:
+            current_time = float(match.group(1))
+        elif current_time is not None and line.startswith("lavfi.scene_score="):
+            scores.append((current_time, float(line.split("=", 1)[1])))
+    return scores
+
+
+def word_times(subtitle):
+    """Start times of every spoken word of a subtitle (whisper segments with or without words)."""
+    times = []
+    for segment in subtitle:
+        words = segment.get("words")
+        if words:
+            times.extend(word["start"] for word in words)
+        else:
+            # no word timings: spread the words of the segment over its duration
+            count = len(segment.get("text", "").split())
+            step = (segment["end"] - segment["start"]) / max(count, 1)
+            times.extend(segment["start"] + i * step for i in range(count))
+    return sorted(times)
+
+
+def _count_between(sorted_values, start, end):
+    return bisect.bisect_left(sorted_values, end) - bisect.bisect_left(sorted_values, start)
+
+
+def rank_windows(scores, duration, words=None, scene_threshold=0.3, min_seconds=15, max_seconds=60,
+                 speech_weight=0.6):
+    """
+    Candidate (start, end, score) windows, best first. A window starts on a
+    scene cut (or at 0) and ends on the last cut before `max_seconds`, but
+    never before `min_seconds`. Scores are normalized to 0..1 over all windows.
+    """
+    cuts = [0.0] + [time for time, score in scores if score >= scene_threshold]
+    score_times = [time for time, _ in scores]
+    prefix = [0.0]
+    for _, score in scores:
+        prefix.append(prefix[-1] + score)
+
+    windows = []
+    for start in cuts:
+        if start + min_seconds > duration:
+            break
+        first = bisect.bisect_left(cuts, start + min_seconds)
+        last = bisect.bisect_right(cuts, start + max_seconds) - 1
+        end = cuts[last] if last >= first else min(start + max_seconds, duration)
+
+        i, j = bisect.bisect_left(score_times, start), bisect.bisect_left(score_times, end)
+        visual = (prefix[j] - prefix[i]) / max(j - i, 1)  # mean scene activity
+        speech = _count_between(words, start, end) / (end - start) if words else 0.0  # words per second
+        windows.append([start, end, speech, visual])
+
+    if not windows:
+        return []
+    max_speech = max(w[2] for w in windows) or 1.0
+    max_visual = max(w[3] for w in windows) or 1.0
+    weight = speech_weight if words else 0.0
+    ranked = [(start, end, weight * speech / max_speech + (1 - weight) * visual / max_visual)
+              for start, end, speech, visual in windows]
+    return sorted(ranked, key=lambda w: w[2], reverse=True)
+
+
+def pick(ranked, count):
+    """The best `count` windows that don't overlap, in time order."""
+    chosen = []
+    for start, end, score in ranked:
+        if all(end <= other[0] or start >= other[1] for other in chosen):
+            chosen.append((start, end, score))
+            if len(chosen) == count:
+                break
+    return sorted(chosen)
+
+
+def suggest_segments(video_path, duration, subtitle_path=None, settings=None, aspect_ratio=None, token=None):
+    """
+    Ranked candidate segments of the video as `youtube.segments` dicts
+    (plus their "score"). `settings` is the SuggestConfig section.
+    """
+    scores = scene_scores(video_path, settings.sample_fps, token=token)
+
+    words = None
+    if subtitle_path and os.path.exists(subtitle_path):
+        with open(subtitle_path, 'r', encoding='utf-8') as file:
+            words = word_times(json.load(file))
+
+    ranked = rank_windows(scores, duration, words, settings.scene_threshold, settings.min_seconds,
+                          settings.max_seconds, settings.speech_weight)
+    segments = []
+    for start, end, score in pick(ranked, settings.count):
+        segment = {"time": {"start": format_time(start), "end": format_time(end)}, "score": round(score, 3)}
+        if aspect_ratio is not None:
+            segment["aspect_ratio"] = aspect_ratio
+        segments.append(segment)
+    return segments
@@ -0,0 +1,53 @@
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from time import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from scripts.src import pipeline
+from scripts.src.cancel import CancelToken
+from scripts.src.scheduler import ResourceScheduler
+
+
+def run_batch(configs, scheduler=None, max_workers=None, token=None, on_result=None):
+    """
+    Run the pipeline for many videos at once.
+
+    Up to `max_workers` pipelines run in parallel, but their Whisper and encode
+    stages all go through one ResourceScheduler so the box stays inside the
+    RAM/core budget of `config.scheduler`. A failing video doesn't stop the others;
+    cancelling `token` stops all of them.
+
+    Returns (results, metrics): one {"video_path", "output", "error", "seconds"}
+    dict per config in input order, and the scheduler metrics. `on_result(result)`
+    is called as soon as each video finishes.
+    """
+    if not configs:
+        return [], {}
+    settings = configs[0].scheduler
+    scheduler = scheduler or ResourceScheduler.from_config(settings)
+    max_workers = max_workers or settings.max_workers
+    token = token or CancelToken("batch")
+
+    def run_one(config):
+        start_time = time()
+        try:
+            token.check()
+            output = pipeline.main(config, scheduler, token.child(config.video_path))
+            return {"video_path": config.video_path, "output": output, "error": None, "seconds": time() - start_time}
+        except Exception as e:
+            print(f"Error processing {config.video_path}: {str(e)}")
+            return {"video_path": config.video_path, "output": None, "error": str(e), "seconds": time() - start_time}
+
+    results = [None] * len(configs)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(run_one, config): i for i, config in enumerate(configs)}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            if on_result is not None:
+                on_result(results[futures[future]])
+            metrics = scheduler.metrics()
+            print(f"[batch] {sum(r is not None for r in results)}/{len(configs)} done, "
+                  f"queue depth {metrics['queue_depth']}, running stages {metrics['running']}")
+
+    return results, scheduler.metrics()
@@ -0,0 +1,149 @@
+"""
+Cooperative cancellation and per-stage timeouts.
+
+A `CancelToken` is passed down the pipeline; long loops call `token.check()`
+and external commands run through `run_command`, which kills the process when
+the token is cancelled or the stage deadline passes.
+
+    token = CancelToken()
+    download_token = token.child("download", timeout=1800)
+    run_command(["yt-dlp", url], token=download_token)   # raises StageTimeout after 30 min
+    token.cancel()                                       # every child raises Cancelled
+"""
+import signal
+import subprocess
+import threading
+import time
+from time import monotonic
+
+POLL_INTERVAL = 0.2
+KILL_GRACE = 5.0
+
+
+class Cancelled(Exception):
+    """The run was cancelled (Ctrl+C, batch shutdown, ...)."""
+
+
+class StageTimeout(Cancelled):
+    """A stage ran longer than its configured timeout."""
+
+
+class CancelToken:
+    def __init__(self, name="pipeline", timeout=None, parent=None):
+        self.name = name
+        self.parent = parent
+        self.deadline = monotonic() + timeout if timeout else None
+        self._event = threading.Event()
+
+    def child(self, name, timeout=None):
+        """Token for one stage: cancelled with its parent, or on its own after `timeout` seconds."""
+        return CancelToken(name, timeout, parent=self)
+
+    def cancel(self):
+        self._event.set()
+
+    def timed_out(self):
+        return self.deadline is not None and monotonic() > self.deadline
+
+    @property
+    def cancelled(self):
+        return self._event.is_set() or self.timed_out() or (self.parent is not None and self.parent.cancelled)
+
+    def check(self):
+        """Raise Cancelled/StageTimeout if the stage must stop."""
+        if self.parent is not None:
+            self.parent.check()
+        if self._event.is_set():
+            raise Cancelled(f"{self.name} was cancelled")
+        if self.timed_out():
+            raise StageTimeout(f"{self.name} timed out")
+
+    def remaining(self):
+        """Seconds left before the nearest deadline, None if there is none."""
+        deadlines = []
+        token = self
+        while token is not None:
+            if token.deadline is not None:
+                deadlines.append(token.deadline - monotonic())
+            token = token.parent
+        return max(0.0, min(deadlines)) if deadlines else None
+
+
+def check(token):
+    if token is not None:
+        token.check()
+
+
+def sleep(seconds, token=None):
+    """time.sleep() that wakes up to raise Cancelled/StageTimeout as soon as the token stops."""
+    deadline = monotonic() + seconds
+    while True:
+        check(token)
+        left = deadline - monotonic()
+        if left <= 0:
+            return
+        time.sleep(min(left, POLL_INTERVAL))
+
+
+def run_command(cmd, token=None, **popen_kwargs):
+    """
+    subprocess.run() that can be cancelled. stdout/stderr may be files or
+    subprocess.DEVNULL; pipes are not supported because the output is not
+    drained while polling.
+    """
+    if token is None:
+        return subprocess.run(cmd, **popen_kwargs)
+
+    token.check()
+    process = subprocess.Popen(cmd, **popen_kwargs)
+    try:
+        while True:
+            try:
+                process.wait(timeout=POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                if token.cancelled:
+                    process.terminate()
+                    try:
+                        process.wait(timeout=KILL_GRACE)
+                    except subprocess.TimeoutExpired:
+                        process.kill()
+                        process.wait()
+                    token.check()
+    except BaseException:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        raise
+    return subprocess.CompletedProcess(cmd, process.returncode)
+
+
+def run_command_output(cmd, token=None, timeout=None):
+    """Run a command and return (returncode, stdout, stderr) as text; killed when the token is cancelled."""
+    if token is None:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        return result.returncode, result.stdout, result.stderr
+
+    token.check()
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    started = monotonic()
+    while True:
+        try:
+            stdout, stderr = process.communicate(timeout=POLL_INTERVAL)
+            return process.returncode, stdout, stderr
+        except subprocess.TimeoutExpired:
+            if token.cancelled or (timeout is not None and monotonic() - started > timeout):
+                process.kill()
+                process.communicate()
+                token.check()
+                raise subprocess.TimeoutExpired(cmd, timeout)
+
+
+def install_signal_handler(token):
+    """First Ctrl+C cancels the token (stages stop at the next check), the second one exits at once."""
+    def handler(signum, frame):
+        print("\nCancelling ... (press Ctrl+C again to exit immediately)")
+        token.cancel()
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    signal.signal(signal.SIGINT, handler)
@@ -0,0 +1,186 @@
+"""
+Command line entry point of VidAI-Gen.
+
+    python -m scripts.src.cli run        [--config config/config.yaml]
+    python -m scripts.src.cli transcribe --video video.mp4
+    python -m scripts.src.cli render     --video video.mp4 --subtitle video.json
+    python -m scripts.src.cli describe   --subtitle video.json [--output content.json]
+    python -m scripts.src.cli batch      video1.mp4 video2.mp4 https://... [--workers 2]
+    python -m scripts.src.cli suggest    --video video.mp4 [--subtitle video.json] [--count 5]
+    python -m scripts.src.cli ingest     https://youtube.com/@channel [--limit 10] [--workers 2] [--dry-run]
+
+Only argparse and yaml are imported at start-up, every subcommand imports the
+models it needs when it runs (see scripts/src/pipeline.py). The config is
+validated before anything is downloaded or loaded; `--set key.path=value`
+overrides single values (see scripts/src/config.py).
+"""
+import argparse
+import os
+import sys
+from time import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from scripts.src import pipeline
+from scripts.src.cancel import Cancelled, CancelToken, install_signal_handler
+from scripts.src.config import DEFAULT_CONFIG_PATH, load_config, parse_overrides
+
+
+def load(args, **overrides):
+    """Resolve the config once: yaml < VIDAI__* environment < --set < subcommand flags."""
+    overrides = {**parse_overrides(args.set), **overrides}
+    return load_config(args.config, overrides, check_files=args.command not in ("describe", "describe-batch"))
+
+
+def cmd_run(args):
+    config = load(args, **({"video_path": args.video} if args.video else {}))
+    return pipeline.main(config, token=args.token)
+
+
+def cmd_transcribe(args):
+    config = load(args, video_path=args.video, subtitle_path=None)
+    output_dir = pipeline.prepare_dirs(args.video)
+    pipeline.transcribe_stage(config, args.video, output_dir, token=args.token.child("transcribe", config.timeouts.transcribe))
+    return os.path.join(output_dir[2], f"{output_dir[1]}.json")
+
+
+def cmd_render(args):
+    config = load(args, video_path=args.video, subtitle_path=args.subtitle)
+    output_dir = pipeline.prepare_dirs(args.video)
+    subtitle = pipeline.transcribe_stage(config, args.video, output_dir, args.subtitle)
+    return pipeline.render_stage(config, args.video, subtitle, output_dir, token=args.token.child("render", config.timeouts.render),
+                                 subtitle_path=args.subtitle)
+
+
+def cmd_batch(args):
+    from scripts.src.batch import run_batch
+
+    # every video is validated before the first one starts
+    configs = [load(args, video_path=video, subtitle_path=None) for video in args.videos]
+    results, metrics = run_batch(configs, max_workers=args.workers, token=args.token)
+    for name, stats in metrics["waits"].items():
+        print(f"{name}: {stats['count']} runs, avg wait {stats['avg_wait']:.1f}s, max wait {stats['max_wait']:.1f}s")
+    return [result["output"] for result in results]
+
+
+def cmd_ingest(args):
+    from scripts.src.ingest import ingest
+
+    # the listing itself stands in for video_path (an URL, or the json dump which exists)
+    config = load(args, video_path=args.source)
+    results, skipped = ingest(config, args.source, lambda url: load(args, video_path=url, subtitle_path=None),
+                              limit=args.limit, max_workers=args.workers, dry_run=args.dry_run, token=args.token)
+    failed = [result for result in results if result["error"]]
+    return f"{len(results) - len(failed)} processed, {len(failed)} failed, {len(skipped)} skipped"
+
+
+def cmd_describe(args):
+    config = load(args)
+    return pipeline.describe_stage(config, args.subtitle, args.output)
+
+
+def cmd_describe_batch(args):
+    config = load(args)
+    subtitle_paths = []
+    for path in args.subtitles:
+        if os.path.isdir(path):
+            # the subtitle jsons of a folder, not the caption layouts older versions saved next to them
+            subtitle_paths += sorted(os.path.join(path, name) for name in os.listdir(path)
+                                     if name.endswith(".json") and not name.endswith(".layout.json"))
+        else:
+            subtitle_paths.append(path)
+    records, skipped = pipeline.describe_batch_stage(config, subtitle_paths, args.output, token=args.token)
+    failed = [record for record in records if "error" in record]
+    return f"{len(records) - len(failed)} described, {len(failed)} failed, {skipped} already done -> {args.output}"
+
+
+def cmd_suggest(args):
+    import yaml
+    from scripts.models.youtube.suggest import suggest_segments
+    from scripts.src.probe import probe_video
+
+    config = load(args, video_path=args.video, **({"suggest.count": args.count} if args.count else {}))
+    info = probe_video(args.video)
+    if info is None:
+        raise SystemExit(f"can't read {args.video} with ffprobe")
+
+    # the transcript of the `transcribe` subcommand, if there is one (see pipeline.prepare_dirs)
+    filename = os.path.splitext(os.path.basename(args.video))[0]
+    subtitle_dir = os.path.join(os.path.dirname(os.path.dirname(args.video)), "subtitle")
+    subtitle_path = args.subtitle or os.path.join(subtitle_dir, f"{filename}.json")
+    aspect_ratio = {"mode": "crop", "ratio": "9:16", "crop_position": "center"}
+    segments = suggest_segments(args.video, info["duration"], subtitle_path, config.suggest, aspect_ratio,
+                                token=args.token)
+
+    print("segments:")
+    for segment in segments:
+        print(f"  # score {segment.pop('score')}")
+        print("  " + yaml.safe_dump([segment], sort_keys=False).replace("\n", "\n  ").rstrip())
+    return f"{len(segments)} segments"
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m scripts.src.cli", description="Download, subtitle and edit videos for social media.")
+    parser.add_argument("--config", default=DEFAULT_CONFIG_PATH, help="path of the yaml config file")
+    parser.add_argument("--set", action="append", metavar="KEY.PATH=VALUE", help="override a config value, e.g. youtube.quality=worst")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run the whole pipeline")
+    run_parser.add_argument("--video", default=None, help="overrides video_path of the config (file or URL)")
+    run_parser.set_defaults(func=cmd_run)
+
+    transcribe_parser = subparsers.add_parser("transcribe", help="create the subtitle json of a video")
+    transcribe_parser.add_argument("--video", required=True)
+    transcribe_parser.set_defaults(func=cmd_transcribe)
+
+    render_parser = subparsers.add_parser("render", help="burn an existing subtitle json and the logo into a video")
+    render_parser.add_argument("--video", required=True)
+    render_parser.add_argument("--subtitle", required=True)
+    render_parser.set_defaults(func=cmd_render)
+
+    batch_parser = subparsers.add_parser("batch", help="run the pipeline for many videos within the scheduler budget")
+    batch_parser.add_argument("videos", nargs="+", help="video files or URLs")
+    batch_parser.add_argument("--workers", type=int, default=None, help="overrides scheduler.max_workers")
+    batch_parser.set_defaults(func=cmd_batch)
+
+    ingest_parser = subparsers.add_parser("ingest", help="process the new videos of a playlist or channel")
+    ingest_parser.add_argument("source", help="playlist/channel URL, or a json dump of yt-dlp --flat-playlist -J")
+    ingest_parser.add_argument("--limit", type=int, default=None, help="process at most this many new videos")
+    ingest_parser.add_argument("--workers", type=int, default=None, help="overrides scheduler.max_workers")
+    ingest_parser.add_argument("--dry-run", action="store_true", help="only list what would be processed")
+    ingest_parser.set_defaults(func=cmd_ingest)
+
+    describe_parser = subparsers.add_parser("describe", help="generate title, description and hashtags")
+    describe_parser.add_argument("--subtitle", required=True)
+    describe_parser.add_argument("--output", default=None)
+    describe_parser.set_defaults(func=cmd_describe)
+
+    describe_batch_parser = subparsers.add_parser("describe-batch", help="describe many subtitle jsons into one JSONL file")
+    describe_batch_parser.add_argument("subtitles", nargs="+", help="subtitle json files or folders of them")
+    describe_batch_parser.add_argument("--output", required=True, help="JSONL file, results are appended as they finish")
+    describe_batch_parser.set_defaults(func=cmd_describe_batch)
+
+    suggest_parser = subparsers.add_parser("suggest", help="propose Shorts segments from scene cuts and speech density")
+    suggest_parser.add_argument("--video", required=True, help="downloaded video file")
+    suggest_parser.add_argument("--subtitle", default=None, help="subtitle json (default: the one of `transcribe`)")
+    suggest_parser.add_argument("--count", type=int, default=None, help="overrides suggest.count")
+    suggest_parser.set_defaults(func=cmd_suggest)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.token = CancelToken()
+    install_signal_handler(args.token)
+    start_time = time()
+    try:
+        result = args.func(args)
+    except Cancelled as e:
+        print(f"{args.command} stopped: {e}")
+        sys.exit(130)
+    print(f"{args.command} finished in {time() - start_time:.2f} seconds: {result}")
+    return result
+
+
+if __name__ == "__main__":
+    main()
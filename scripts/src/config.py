@@ -1,22 +1,600 @@
+"""
+Typed view of config/config.yaml.
+
+The yaml file is loaded, overridden (environment, CLI) and validated once by
+`load_config`; every stage then reads plain attributes of the returned `Config`
+instead of digging through the raw dict. All defaults live here.
+
+Overrides use dotted paths of the yaml keys:
+    CLI:  --set youtube.quality=worst --set video_editor.Add_subtitle.font_size=40
+    env:  VIDAI__youtube__quality=worst
+Values are parsed as yaml, so `true`, `40` and `[center, top]` keep their types.
+"""
+import copy
+import dataclasses
+import hashlib
+import json
+import os
+import re
+import types
+import typing
+import warnings
+from dataclasses import dataclass, field
+
+import yaml
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))
+DEFAULT_CONFIG_PATH = os.path.join(ROOT_DIR, "config", "config.yaml")
+DEFAULT_FONT = os.path.join(ROOT_DIR, "fonts", "english", "Bangers-Regular.ttf")
+ENV_PREFIX = "VIDAI__"
+
+WHISPER_MODELS = ["tiny", "base", "small", "medium", "large", "large-v1", "large-v2", "large-v3", "turbo"]
+ASPECT_MODES = ["auto", "force", "crop", "scale"]
+CROP_POSITIONS = ["center", "left", "right", "top", "bottom"]
+LOGO_POSITIONS = ["top-left", "top-right", "bottom-left", "bottom-right", "center", "random"]
+TEXT_EFFECTS = ["none", "fade_in_out", "pulse", "bounce"]
+WATERMARK_MOVEMENTS = ["random", "diagonal", "horizontal", "vertical", "waypoints"]
+EASINGS = ["linear", "ease_in", "ease_out", "ease_in_out"]
+GPT_MODES = ["concurrent", "structured"]
+GPT_BACKENDS = ["openai", "local"]
+
+
+class ConfigError(ValueError):
+    """Raised when the config file has a wrong type or value."""
+
+
+#-----------------------------------youtube-----------------------------------
+@dataclass(slots=True)
+class TimeConfig:
+    start: str | None = None  # Format: HH:MM:SS
+    end: str | None = None
+
+
+@dataclass(slots=True)
+class AspectRatioConfig:
+    mode: str = "auto"  # auto, force, crop, scale
+    ratio: str = "16:9"
+    crop_position: str = "center"  # center, left, right, top, bottom
+
+
+@dataclass(slots=True)
+class SegmentConfig:
+    time: TimeConfig = field(default_factory=TimeConfig)
+    aspect_ratio: AspectRatioConfig = field(default_factory=AspectRatioConfig)
+
+
+@dataclass(slots=True)
+class FilenameFormatConfig:
+    use_counter: bool = True
+    use_channel: bool = True
+    prefix: str = ""
+    use_nested_folders: bool = True
+
+
+@dataclass(slots=True)
+class YoutubeOutputConfig:
+    filename: str | None = None
+    merge: bool = True
+
+
+@dataclass(slots=True)
+class RetryConfig:
+    max_attempts: int = 5  # yt-dlp runs per download, the strategy depends on the error (see retry.py)
+    base_delay: float = 2.0  # seconds, doubled on every attempt (with jitter)
+    max_delay: float = 60.0
+
+
+@dataclass(slots=True)
+class YoutubeConfig:
+    ytdlp_path: str = "yt-dlp"
+    quality: str = "best"
+    resolution: str | None = None
+    download_full: bool = False
+    video_type: str | None = None  # short, regular or None for auto-detection
+    direct_segment_download: bool = False
+    max_parallel_downloads: int = 3
+    preflight_format: bool = True  # smallest format under the height cap meeting `resolution` after the crop
+    audio_first: bool = True  # transcribe the audio-only stream while the video downloads
+    defer_aspect: bool = True  # crop/scale in the final render instead of re-encoding at download
+    local_cut_min_segments: int = 3  # download once and cut locally from this many segments, 0 = only if cached
+    filename_format: FilenameFormatConfig = field(default_factory=FilenameFormatConfig)
+    retry: RetryConfig = field(default_factory=RetryConfig)
+    segments: list[SegmentConfig] = field(default_factory=list)
+    output: YoutubeOutputConfig = field(default_factory=YoutubeOutputConfig)
+    # old format: a single time/aspect_ratio instead of segments
+    time: TimeConfig | None = None
+    aspect_ratio: AspectRatioConfig | None = None
+
+
+#-----------------------------------subtitle-----------------------------------
+@dataclass(slots=True)
+class SubtitleConfig:
+    enabled: bool = True
+    model: str = "large"
+    verbose: bool = False
+    task: str = "transcribe"  # transcribe, translate
+    language: str = "auto"
+    translate_to: str | None = None
+
+
+#-----------------------------------video_editor-----------------------------------
+@dataclass(slots=True)
+class ShadowConfig:
+    enabled: bool = False
+    color: str = "black"
+    offset_x: int = 2
+    offset_y: int = 2
+    blur: float = 3
+
+
+@dataclass(slots=True)
+class WatermarkConfig:
+    enabled: bool = True
+    text: str = "Sample Subtitle"
+    fontsize: int = 30
+    color: str = "white"
+    background_color: str = "rgba(0,0,0,0.5)"
+    font: str = DEFAULT_FONT
+    shadow: ShadowConfig = field(default_factory=ShadowConfig)
+    effect: str = "none"  # none, fade_in_out, pulse, bounce
+    animation_speed: float = 1.0
+    movement: str = "random"  # random (diagonal/horizontal/vertical), diagonal, horizontal, vertical, waypoints
+    easing: str = "linear"  # linear, ease_in, ease_out, ease_in_out
+
+
+@dataclass(slots=True)
+class LogoConfig:
+    enabled: bool = False
+    output_video_path: str | None = None
+    image: str | None = None  # png or svg logo, null for the text watermark only
+    size: float = 0.15  # logo width as a share of the frame width
+    opacity: float = 1.0
+    position: str = "top-right"  # top-left, top-right, bottom-left, bottom-right, center, random
+    margin: int = 20  # pixels from the frame border
+
+
+@dataclass(slots=True)
+class CaptionStyle:
+    enabled: bool = True
+    font: str = DEFAULT_FONT
+    font_size: int = 50
+    font_color: str = "white"
+    stroke_width: int = 2
+    stroke_color: str = "black"
+    shadow_strength: float = 1.0
+    shadow_blur: float = 0.8
+    highlight_current_word: bool = True
+    word_highlight_color: str = "red"
+    position: tuple[str, str] = ("center", "bottom")  # [horizontal, vertical]
+    line_count: int = 1
+    padding: int = 50
+
+
+@dataclass(slots=True)
+class VideoEditorConfig:
+    logo: LogoConfig = field(default_factory=LogoConfig)
+    subtitle: WatermarkConfig = field(default_factory=WatermarkConfig)
+    add_subtitle: CaptionStyle = field(default_factory=CaptionStyle, metadata={"key": "Add_subtitle"})
+
+
+#-----------------------------------GPT-----------------------------------
+@dataclass(slots=True)
+class PromptConfig:
+    system_prompt: str = ""
+    user_prompt_template: str = "{content}"
+    max_tokens: int = 100
+
+
+@dataclass(slots=True)
+class TitlePromptConfig(PromptConfig):
+    max_tokens: int = 50
+
+
+@dataclass(slots=True)
+class DescriptionPromptConfig(PromptConfig):
+    max_length: int = 150
+
+
+@dataclass(slots=True)
+class HashtagsPromptConfig(PromptConfig):
+    count: int = 10
+
+
+@dataclass(slots=True)
+class GptConfig:
+    backend: str = "openai"  # openai (any OpenAI-compatible server) or local (transformers model on the CPU)
+    api_key: str | None = None
+    model: str = "gpt-4o"
+    local_model: str = "meta-llama/Llama-3.2-1B-Instruct"  # model of the local backend
+    batch_size: int = 8  # prompts generated together by the local backend
+    batch_wait: float = 0.05  # seconds the local backend waits for more prompts to batch
+    base_url: str | None = None  # OpenAI-compatible endpoint, null for api.openai.com
+    timeout: float = 60.0  # seconds per request
+    max_retries: int = 2
+    mode: str = "concurrent"  # concurrent (3 requests at once) or structured (one json request)
+    cache: bool = True  # keep the answers in <cache>/gpt, an unchanged transcript costs no request
+    digest_tokens: int | None = 2000  # longer transcripts are cut to their most informative sentences, null for all
+    # `describe-batch`: videos in flight at the same time and the API rate limits (null for none)
+    max_concurrent: int = 16
+    requests_per_minute: int | None = 500
+    tokens_per_minute: int | None = 30000
+    title: TitlePromptConfig = field(default_factory=TitlePromptConfig)
+    description: DescriptionPromptConfig = field(default_factory=DescriptionPromptConfig)
+    hashtags: HashtagsPromptConfig = field(default_factory=HashtagsPromptConfig)
+
+
+#-----------------------------------scheduler-----------------------------------
+@dataclass(slots=True)
+class SchedulerConfig:
+    ram_mb: int | None = None  # RAM budget shared by Whisper/translator/encoder stages, null for all RAM
+    cores: int | None = None  # core budget, null for os.cpu_count()
+    max_wait: float = 600.0  # seconds after which a waiting stage stops smaller ones from jumping ahead
+    max_workers: int = 2  # videos processed at the same time by the batch runner
+
+
+#-----------------------------------cache-----------------------------------
+@dataclass(slots=True)
+class CacheConfig:
+    dir: str | None = None  # shared by runs and workers, null for <output_dir>/cache
+    metadata_ttl: float = 24 * 3600  # seconds a cached yt-dlp metadata json stays valid
+    sources_max_mb: int = 20000  # full source downloads kept for local segment cuts, 0 = no limit
+
+
+#-----------------------------------runtime-----------------------------------
+@dataclass(slots=True)
+class TimeoutsConfig:
+    # seconds per stage, null for no limit
+    download: float | None = None
+    transcribe: float | None = None
+    render: float | None = None
+
+
+@dataclass(slots=True)
+class RenderConfig:
+    chunk_seconds: float | None = 60.0  # render in resumable chunks of this length, null to write in one go
+    codec: str = "libx264"
+    streaming: bool = False  # draw captions while rendering instead of building them all up front
+    window_seconds: float = 30.0  # captions laid out ahead of the current frame in streaming mode
+    layout_cache: bool = True  # <subtitle>.layout.jsonl with the caption layout, reused by re-renders
+
+
+@dataclass(slots=True)
+class SuggestConfig:
+    scene_threshold: float = 0.3  # ffmpeg scene score (0..1) counted as a cut
+    sample_fps: float = 5.0  # frames per second analysed (on a 160px wide copy)
+    min_seconds: float = 15.0
+    max_seconds: float = 60.0
+    speech_weight: float = 0.6  # share of speech density vs scene activity in the score (with a transcript)
+    count: int = 5
+
+
+@dataclass(slots=True)
+class IngestConfig:
+    index_path: str | None = None  # json index of processed video IDs, null for <cache>/ingest/index.json
+    fingerprint: bool = True  # also skip re-uploads with the same audio
+    sample_seconds: float = 60.0  # audio downloaded per video for the fingerprint
+    max_distance: float = 0.1  # share of differing fingerprint bits still counted as the same audio
+
+
+#-----------------------------------MAIN-----------------------------------
+@dataclass(slots=True)
+class Config:
+    video_path: str = ""
+    subtitle_path: str | None = None
+    output_dir: str = "output"
+    debug_mode: bool = False
+    youtube: YoutubeConfig = field(default_factory=YoutubeConfig)
+    process_subtitle: SubtitleConfig = field(default_factory=SubtitleConfig)
+    video_editor: VideoEditorConfig = field(default_factory=VideoEditorConfig)
+    gpt: GptConfig = field(default_factory=GptConfig)
+    scheduler: SchedulerConfig = field(default_factory=SchedulerConfig)
+    cache: CacheConfig = field(default_factory=CacheConfig)
+    timeouts: TimeoutsConfig = field(default_factory=TimeoutsConfig)
+    render: RenderConfig = field(default_factory=RenderConfig)
+    suggest: SuggestConfig = field(default_factory=SuggestConfig)
+    ingest: IngestConfig = field(default_factory=IngestConfig)
+
+    def cache_dir(self, *parts):
+        """Path inside the cache directory."""
+        return os.path.join(self.cache.dir or os.path.join(self.output_dir, "cache"), *parts)
+
+    def to_dict(self):
+        """Plain dict (json/yaml friendly) with the yaml key names."""
+        return _dump(self)
+
+    def fingerprint(self):
+        """Stable hash of the resolved config, used as a cache key."""
+        payload = json.dumps(self.to_dict(), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _key(f):
+    return f.metadata.get("key", f.name)
+
+
+def _type_name(tp):
+    return getattr(tp, "__name__", str(tp))
+
+
+def _coerce(value, tp, path):
+    """Convert a yaml value to the annotated type `tp` or raise ConfigError."""
+    origin = typing.get_origin(tp)
+
+    if origin in (types.UnionType, typing.Union):
+        options = typing.get_args(tp)
+        if value is None and type(None) in options:
+            return None
+        errors = []
+        for option in options:
+            if option is type(None):
+                continue
+            try:
+                return _coerce(value, option, path)
+            except ConfigError as e:
+                errors.append(str(e))
+        raise ConfigError(errors[0] if errors else f"{path}: invalid value {value!r}")
+
+    if dataclasses.is_dataclass(tp):
+        if value is None:
+            return tp()
+        if not isinstance(value, dict):
+            raise ConfigError(f"{path}: expected a mapping, got {value!r}")
+        return _build(tp, value, f"{path}.")
+
+    if origin is list:
+        if value is None:
+            return []
+        if not isinstance(value, list):
+            raise ConfigError(f"{path}: expected a list, got {value!r}")
+        (item_type,) = typing.get_args(tp)
+        return [_coerce(item, item_type, f"{path}[{i}]") for i, item in enumerate(value)]
+
+    if origin is tuple:
+        item_types = typing.get_args(tp)
+        if not isinstance(value, (list, tuple)) or len(value) != len(item_types):
+            raise ConfigError(f"{path}: expected a list of {len(item_types)} items, got {value!r}")
+        return tuple(_coerce(item, item_type, f"{path}[{i}]") for i, (item, item_type) in enumerate(zip(value, item_types)))
+
+    if tp is float and isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if tp is int and isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if tp is bool and isinstance(value, bool):
+        return value
+    if tp is str and isinstance(value, str):
+        return value
+    raise ConfigError(f"{path}: expected {_type_name(tp)}, got {value!r}")
+
+
+def _build(cls, data, path=""):
+    hints = typing.get_type_hints(cls)
+    known = set()
+    kwargs = {}
+    for f in dataclasses.fields(cls):
+        key = _key(f)
+        known.add(key)
+        if key in data:
+            kwargs[f.name] = _coerce(data[key], hints[f.name], f"{path}{key}")
+
+    unknown = [key for key in data if key not in known]
+    if unknown:
+        warnings.warn(f"unknown config keys ignored: {', '.join(path + str(key) for key in unknown)}")
+    return cls(**kwargs)
+
+
+def _dump(obj):
+    if dataclasses.is_dataclass(obj):
+        return {_key(f): _dump(getattr(obj, f.name)) for f in dataclasses.fields(obj)}
+    if isinstance(obj, (list, tuple)):
+        return [_dump(item) for item in obj]
+    return obj
+
+
+def _set_path(raw, dotted_path, value):
+    """Set raw['a']['b']['c'] for 'a.b.c', matching existing keys case-insensitively."""
+    node = raw
+    parts = dotted_path.split(".")
+    for i, part in enumerate(parts):
+        match = next((key for key in node if str(key).lower() == part.lower()), part)
+        if i == len(parts) - 1:
+            node[match] = value
+        else:
+            if not isinstance(node.get(match), dict):
+                node[match] = {}
+            node = node[match]
+
+
+def parse_overrides(items):
+    """['youtube.quality=worst', ...] -> {'youtube.quality': 'worst', ...}"""
+    overrides = {}
+    for item in items or []:
+        if "=" not in item:
+            raise ConfigError(f"override '{item}' must look like key.path=value")
+        key, value = item.split("=", 1)
+        overrides[key.strip()] = yaml.safe_load(value) if value.strip() else None
+    return overrides
+
+
+def env_overrides(environ=None):
+    """VIDAI__youtube__quality=worst -> {'youtube.quality': 'worst'}"""
+    environ = os.environ if environ is None else environ
+    overrides = {}
+    for name, value in environ.items():
+        if name.startswith(ENV_PREFIX):
+            overrides[name[len(ENV_PREFIX):].replace("__", ".")] = yaml.safe_load(value) if value.strip() else None
+    return overrides
+
+
+def is_url(path):
+    return path.startswith("http://") or path.startswith("https://")
+
+
+def _check_choice(value, choices, path):
+    if value not in choices:
+        raise ConfigError(f"{path}: '{value}' is not one of {', '.join(choices)}")
+
+
+def _check_ratio(ratio, path):
+    match = re.fullmatch(r"\s*(\d+)\s*:\s*(\d+)\s*", ratio)
+    if not match or int(match.group(1)) == 0 or int(match.group(2)) == 0:
+        raise ConfigError(f"{path}: aspect ratio must look like '16:9', got '{ratio}'")
+
+
+def _check_time(value, path):
+    if value is not None and not re.fullmatch(r"(\d+:)?(\d+:)?\d+(\.\d+)?", str(value)):
+        raise ConfigError(f"{path}: time must look like HH:MM:SS, got '{value}'")
+
+
+def _check_positive(value, path, allow_zero=False):
+    if value < 0 or (value == 0 and not allow_zero):
+        raise ConfigError(f"{path}: must be {'>= 0' if allow_zero else '> 0'}, got {value}")
+
+
+def _check_aspect(aspect, path):
+    _check_choice(aspect.mode, ASPECT_MODES, f"{path}.mode")
+    _check_ratio(aspect.ratio, f"{path}.ratio")
+    _check_choice(aspect.crop_position, CROP_POSITIONS, f"{path}.crop_position")
+
+
+def validate(config, check_files=True):
+    """Check values that types alone can't catch. Raises ConfigError."""
+    if not config.video_path:
+        raise ConfigError("video_path: is empty")
+    if check_files and not is_url(config.video_path) and not os.path.isfile(config.video_path):
+        raise ConfigError(f"video_path: file not found '{config.video_path}'")
+    if check_files and config.subtitle_path is not None and not os.path.isfile(config.subtitle_path):
+        raise ConfigError(f"subtitle_path: file not found '{config.subtitle_path}'")
+
+    youtube = config.youtube
+    if youtube.video_type is not None:
+        _check_choice(youtube.video_type.lower(), ["short", "regular"], "youtube.video_type")
+    if youtube.resolution is not None and not re.fullmatch(r"\d+p?", youtube.resolution):
+        raise ConfigError(f"youtube.resolution: must look like '1080p', got '{youtube.resolution}'")
+    _check_positive(youtube.max_parallel_downloads, "youtube.max_parallel_downloads")
+    _check_positive(youtube.retry.max_attempts, "youtube.retry.max_attempts")
+    _check_positive(youtube.retry.base_delay, "youtube.retry.base_delay", allow_zero=True)
+    _check_positive(youtube.retry.max_delay, "youtube.retry.max_delay", allow_zero=True)
+    _check_positive(youtube.local_cut_min_segments, "youtube.local_cut_min_segments", allow_zero=True)
+    for i, segment in enumerate(youtube.segments):
+        _check_time(segment.time.start, f"youtube.segments[{i}].time.start")
+        _check_time(segment.time.end, f"youtube.segments[{i}].time.end")
+        _check_aspect(segment.aspect_ratio, f"youtube.segments[{i}].aspect_ratio")
+    if youtube.time is not None:
+        _check_time(youtube.time.start, "youtube.time.start")
+        _check_time(youtube.time.end, "youtube.time.end")
+    if youtube.aspect_ratio is not None:
+        _check_aspect(youtube.aspect_ratio, "youtube.aspect_ratio")
+
+    subtitle = config.process_subtitle
+    model = subtitle.model[:-3] if subtitle.model.endswith(".en") else subtitle.model
+    if not os.path.exists(subtitle.model):
+        _check_choice(model, WHISPER_MODELS, "process_subtitle.model")
+    _check_choice(subtitle.task, ["transcribe", "translate"], "process_subtitle.task")
+
+    style = config.video_editor.add_subtitle
+    _check_positive(style.font_size, "video_editor.Add_subtitle.font_size")
+    _check_positive(style.stroke_width, "video_editor.Add_subtitle.stroke_width", allow_zero=True)
+    _check_positive(style.line_count, "video_editor.Add_subtitle.line_count")
+    _check_positive(style.padding, "video_editor.Add_subtitle.padding", allow_zero=True)
+    _check_choice(style.position[0], ["left", "center", "right"], "video_editor.Add_subtitle.position[0]")
+    _check_choice(style.position[1], ["top", "center", "bottom"], "video_editor.Add_subtitle.position[1]")
+    if check_files and config.process_subtitle.enabled and style.enabled and not os.path.isfile(style.font):
+        raise ConfigError(f"video_editor.Add_subtitle.font: file not found '{style.font}'")
+
+    logo = config.video_editor.logo
+    if logo.image is not None:
+        if check_files and logo.enabled and not os.path.isfile(logo.image):
+            raise ConfigError(f"video_editor.logo.image: file not found '{logo.image}'")
+        if not logo.image.lower().endswith((".png", ".svg")):
+            raise ConfigError(f"video_editor.logo.image: must be a .png or .svg file, got '{logo.image}'")
+    if not 0 < logo.size <= 1 or not 0 <= logo.opacity <= 1:
+        raise ConfigError("video_editor.logo.size must be in (0, 1] and video_editor.logo.opacity in [0, 1]")
+    _check_choice(logo.position, LOGO_POSITIONS, "video_editor.logo.position")
+    _check_positive(logo.margin, "video_editor.logo.margin", allow_zero=True)
+
+    watermark = config.video_editor.subtitle
+    _check_positive(watermark.fontsize, "video_editor.subtitle.fontsize")
+    _check_choice(watermark.effect, TEXT_EFFECTS, "video_editor.subtitle.effect")
+    _check_positive(watermark.animation_speed, "video_editor.subtitle.animation_speed")
+    _check_choice(watermark.movement, WATERMARK_MOVEMENTS, "video_editor.subtitle.movement")
+    _check_choice(watermark.easing, EASINGS, "video_editor.subtitle.easing")
+
+    gpt = config.gpt
+    _check_positive(gpt.timeout, "gpt.timeout")
+    _check_positive(gpt.max_retries, "gpt.max_retries", allow_zero=True)
+    _check_choice(gpt.mode, GPT_MODES, "gpt.mode")
+    _check_choice(gpt.backend, GPT_BACKENDS, "gpt.backend")
+    _check_positive(gpt.batch_size, "gpt.batch_size")
+    _check_positive(gpt.batch_wait, "gpt.batch_wait", allow_zero=True)
+    _check_positive(gpt.max_concurrent, "gpt.max_concurrent")
+    for name in ("requests_per_minute", "tokens_per_minute"):
+        if getattr(gpt, name) is not None:
+            _check_positive(getattr(gpt, name), f"gpt.{name}")
+    if gpt.digest_tokens is not None:
+        _check_positive(gpt.digest_tokens, "gpt.digest_tokens")
+
+    scheduler = config.scheduler
+    if scheduler.ram_mb is not None:
+        _check_positive(scheduler.ram_mb, "scheduler.ram_mb")
+    if scheduler.cores is not None:
+        _check_positive(scheduler.cores, "scheduler.cores")
+    _check_positive(scheduler.max_wait, "scheduler.max_wait", allow_zero=True)
+    _check_positive(scheduler.max_workers, "scheduler.max_workers")
+
+    _check_positive(config.cache.metadata_ttl, "cache.metadata_ttl", allow_zero=True)
+    _check_positive(config.cache.sources_max_mb, "cache.sources_max_mb", allow_zero=True)
+    for name in ("download", "transcribe", "render"):
+        timeout = getattr(config.timeouts, name)
+        if timeout is not None:
+            _check_positive(timeout, f"timeouts.{name}")
+    if config.render.chunk_seconds is not None:
+        _check_positive(config.render.chunk_seconds, "render.chunk_seconds")
+    _check_positive(config.render.window_seconds, "render.window_seconds")
+    _check_positive(config.ingest.sample_seconds, "ingest.sample_seconds")
+    if not 0 <= config.ingest.max_distance <= 1:
+        raise ConfigError(f"ingest.max_distance: must be between 0 and 1, got {config.ingest.max_distance}")
+    suggest = config.suggest
+    _check_positive(suggest.sample_fps, "suggest.sample_fps")
+    _check_positive(suggest.min_seconds, "suggest.min_seconds")
+    _check_positive(suggest.count, "suggest.count")
+    if suggest.max_seconds < suggest.min_seconds:
+        raise ConfigError(f"suggest.max_seconds: must be >= suggest.min_seconds, got {suggest.max_seconds}")
+    if not 0 <= suggest.scene_threshold <= 1 or not 0 <= suggest.speech_weight <= 1:
+        raise ConfigError("suggest.scene_threshold and suggest.speech_weight must be between 0 and 1")
+
+    return config
+
+
+def from_dict(raw, overrides=None, environ=None, check_files=True):
+    """Build a validated Config from the raw yaml dict. Overrides win over environment."""
+    raw = copy.deepcopy(raw or {})  # the caller's dict is left untouched
+    for dotted_path, value in {**env_overrides(environ), **(overrides or {})}.items():
+        _set_path(raw, dotted_path, value)
+    config = _build(Config, raw)
+    return validate(config, check_files=check_files)
+
+
+def load_config(config_path=None, overrides=None, environ=None, check_files=True):
+    """Load, override and validate config.yaml. Raises ConfigError on invalid values."""
+    config_path = config_path or DEFAULT_CONFIG_PATH
+    if not os.path.exists(config_path):
+        raise FileNotFoundError(f"Configuration file not found at {config_path}")
+    with open(config_path, 'r') as file:
+        raw = yaml.safe_load(file)
+    return from_dict(raw, overrides, environ, check_files)
+
+
+def load_general_config(config):
+
+    return config.debug_mode, config.video_path, config.subtitle_path
 
-def load_general_config(config):   
-    
-    debugger = config['debug_mode']
-    video_path = config["video_path"]
-    subtitle_path = config["subtitle_path"]
-        
-        
-    return debugger, video_path, subtitle_path
 
 def load_subtitle_config(config):
-     
-    model_name = config["process_subtitle"].get("model", "large")
-    language = config["process_subtitle"].get("language", "auto")
-    translate_to = config["process_subtitle"].get("translate_to", None)
+
+    subtitle = config.process_subtitle
     args = {
-        "task": config["process_subtitle"].get("task", "transcribe"),
-        "verbose": config["process_subtitle"].get("verbose", False),
+        "task": subtitle.task,
+        "verbose": subtitle.verbose,
         "language": None  # Default to None, will be set later if needed
     }
-    return model_name, language, translate_to, args
-    
+    return subtitle.model, subtitle.language, subtitle.translate_to, args
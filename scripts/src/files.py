@@ -0,0 +1,10 @@
+import os
+import threading
+
+
+def atomic_write_text(path, text):
+    """Write a file so readers see either the old or the new content, never half of it."""
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        file.write(text)
+    os.replace(temp_path, path)
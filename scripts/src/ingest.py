@@ -0,0 +1,220 @@
+"""
+Ingest a whole playlist or channel.
+
+The listing (yt-dlp --flat-playlist -J, or a saved dump of it) is expanded to
+videos, videos whose ID is already in the ingest index are dropped, and a short
+audio sample of each new video is fingerprinted so re-uploads of the same
+content under another ID are dropped too. Only the remaining videos go through
+run_batch (bounded concurrency, shared scheduler); every result is written to
+the index as soon as it finishes, so an interrupted ingest resumes where it was.
+"""
+import array
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+from scripts.src.cancel import CancelToken, run_command, run_command_output
+from scripts.models.youtube import metadata
+from scripts.models.youtube.locks import file_lock
+from scripts.src.files import atomic_write_text
+
+FINGERPRINT_RATE = 4000  # Hz, plenty for a loudness envelope
+FRAME_SECONDS = 0.25
+
+
+#-----------------------------------listing-----------------------------------
+def _flatten(entries):
+    for entry in entries or []:
+        if entry is None:
+            continue
+        # channels list their tabs (videos, shorts, ...) as nested playlists
+        if entry.get("_type") == "playlist" or "entries" in entry:
+            yield from _flatten(entry.get("entries"))
+        elif entry.get("id"):
+            yield entry
+
+
+def load_listing(source, token=None, ytdlp="yt-dlp"):
+    """
+    Videos of a playlist/channel URL, or of a local json dump of
+    `yt-dlp --flat-playlist -J` (one json document or one entry per line).
+    Returns [{"id", "url", "title"}] without duplicated IDs, in listing order.
+    """
+    if os.path.exists(source):
+        with open(source, 'r', encoding='utf-8') as file:
+            text = file.read()
+        try:
+            listing = json.loads(text)
+        except ValueError:
+            listing = {"entries": [json.loads(line) for line in text.splitlines() if line.strip()]}
+    else:
+        cmd = [ytdlp, '--flat-playlist', '-J', source]
+        returncode, stdout, stderr = run_command_output(cmd, token=token)
+        if returncode != 0:
+            raise RuntimeError(f"listing {source} failed: {stderr.strip()[-500:]}")
+        listing = json.loads(stdout)
+
+    videos, seen = [], set()
+    for entry in _flatten(listing.get("entries") if isinstance(listing, dict) else listing):
+        if entry["id"] in seen:
+            continue
+        seen.add(entry["id"])
+        url = entry.get("url") or ""
+        if not url.startswith("http"):
+            url = f"https://www.youtube.com/watch?v={entry['id']}"
+        videos.append({"id": entry["id"], "url": url, "title": entry.get("title")})
+    return videos
+
+
+#-----------------------------------index-----------------------------------
+def load_index(index_path):
+    try:
+        with open(index_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def update_index(index_path, video_id, **fields):
+    """Merge `fields` into the index entry of the video (read-modify-write under a file lock)."""
+    with file_lock(index_path + ".lock"):
+        index = load_index(index_path)
+        index.setdefault(video_id, {}).update(fields, updated=time())
+        atomic_write_text(index_path, json.dumps(index, indent=2, ensure_ascii=False))
+
+
+#-----------------------------------fingerprint-----------------------------------
+def audio_fingerprint(audio_path, seconds=60, token=None):
+    """
+    Hex string of bits "loudness goes up" between 0.25s frames of the first
+    `seconds` of audio - survives re-encoding and volume changes, so a re-upload
+    of the same content has (almost) the same bits.
+    """
+    with tempfile.TemporaryFile() as pcm_file:
+        cmd = ['ffmpeg', '-v', 'error', '-i', audio_path, '-t', str(seconds), '-ac', '1',
+               '-ar', str(FINGERPRINT_RATE), '-f', 's16le', '-']
+        result = run_command(cmd, token=token, stdout=pcm_file)
+        if result.returncode != 0:
+            return None
+        pcm_file.seek(0)
+        samples = array.array('h', pcm_file.read())
+
+    frame = int(FINGERPRINT_RATE * FRAME_SECONDS)
+    energies = [sum(s * s for s in samples[i:i + frame]) for i in range(0, len(samples) - frame + 1, frame)]
+    bits = "".join("1" if b > a else "0" for a, b in zip(energies, energies[1:]))
+    if len(bits) < 32:
+        return None
+    return f"{len(bits)}:{int(bits, 2):x}"
+
+
+def fingerprint_distance(first, second):
+    """Share of differing bits (0 = same audio) over the common length, 1.0 if not comparable."""
+    if not first or not second:
+        return 1.0
+    first_len, first_value = first.split(":")
+    second_len, second_value = second.split(":")
+    first_bits = bin(int(first_value, 16))[2:].zfill(int(first_len))
+    second_bits = bin(int(second_value, 16))[2:].zfill(int(second_len))
+    length = min(len(first_bits), len(second_bits))
+    if length < 32:
+        return 1.0
+    return sum(a != b for a, b in zip(first_bits[:length], second_bits[:length])) / length
+
+
+def sample_fingerprint(url, sample_dir, seconds=60, token=None, ytdlp="yt-dlp"):
+    """Fingerprint of the first `seconds` of the audio, downloading only that part."""
+    output_template = os.path.join(sample_dir, metadata.cache_key(url))
+    cmd = [ytdlp, url, '-f', 'bestaudio/best', '--no-playlist', '--download-sections', f"*0-{seconds}",
+           '-o', f'{output_template}.%(ext)s', '--print', 'after_move:filepath', '--no-simulate']
+    returncode, stdout, _ = run_command_output(cmd, token=token)
+    lines = stdout.strip().splitlines()
+    if returncode != 0 or not lines or not os.path.exists(lines[-1]):
+        return None
+    try:
+        return audio_fingerprint(lines[-1], seconds, token)
+    finally:
+        os.remove(lines[-1])
+
+
+#-----------------------------------ingest-----------------------------------
+def plan_ingest(config, videos, token=None, limit=None, dry_run=False):
+    """
+    Split the listing into new videos and skipped ones (already in the index,
+    or same audio as an indexed/earlier video). Fingerprints are computed in
+    parallel, the dedup itself runs in listing order so the first upload wins.
+    With `limit` only as many candidates as still needed are sampled, and a
+    `dry_run` leaves the index as it is (duplicates are only reported).
+    """
+    settings = config.ingest
+    index_path = settings.index_path or config.cache_dir("ingest", "index.json")
+    index = load_index(index_path)
+
+    # failed videos are tried again
+    finished = {video_id for video_id, entry in index.items() if entry.get("status") in ("done", "duplicate")}
+    fresh = [video for video in videos if video["id"] not in finished]
+    skipped = [(video, "already processed") for video in videos if video["id"] in finished]
+    if not settings.fingerprint or not fresh:
+        return fresh[:limit], skipped, index_path
+
+    sample_dir = config.cache_dir("ingest", "samples")
+    os.makedirs(sample_dir, exist_ok=True)
+    known = [(video_id, entry["fingerprint"]) for video_id, entry in index.items()
+             if entry.get("status") == "done" and entry.get("fingerprint")]
+    new = []
+    with ThreadPoolExecutor(max_workers=config.youtube.max_parallel_downloads) as pool:
+        while fresh and (limit is None or len(new) < limit):
+            # sample the next candidates only: a re-upload among them means another round
+            batch, fresh = (fresh, []) if limit is None else (fresh[:limit - len(new)], fresh[limit - len(new):])
+            fingerprints = list(pool.map(
+                lambda video: sample_fingerprint(video["url"], sample_dir, settings.sample_seconds, token,
+                                                 config.youtube.ytdlp_path), batch))
+
+            for video, fingerprint in zip(batch, fingerprints):
+                duplicate_of = next((video_id for video_id, other in known if video_id != video["id"]
+                                     and fingerprint_distance(fingerprint, other) <= settings.max_distance), None)
+                if duplicate_of:
+                    skipped.append((video, f"same audio as {duplicate_of}"))
+                    if not dry_run:
+                        update_index(index_path, video["id"], status="duplicate", duplicate_of=duplicate_of,
+                                     fingerprint=fingerprint, url=video["url"])
+                    continue
+                video["fingerprint"] = fingerprint
+                if fingerprint:
+                    known.append((video["id"], fingerprint))
+                new.append(video)
+    return new, skipped, index_path
+
+
+def ingest(config, source, load_video_config, limit=None, max_workers=None, dry_run=False, token=None):
+    """
+    Process the new videos of a playlist/channel. `load_video_config(url)` returns
+    the Config of one video. Returns (results of run_batch, skipped videos).
+    """
+    from scripts.src.batch import run_batch
+
+    token = token or CancelToken("ingest")
+
+    videos = load_listing(source, token, config.youtube.ytdlp_path)
+    print(f"[ingest] {len(videos)} videos in {source}")
+    new, skipped, index_path = plan_ingest(config, videos, token, limit or None, dry_run)
+    for video, reason in skipped:
+        print(f"[ingest] skip {video['id']}: {reason}")
+    print(f"[ingest] {len(new)} new videos to process")
+    if dry_run or not new:
+        return [], skipped
+
+    configs = [load_video_config(video["url"]) for video in new]
+    by_url = {video["url"]: video for video in new}
+
+    def record(result):
+        video = by_url[result["video_path"]]
+        update_index(index_path, video["id"], url=video["url"], title=video["title"],
+                     fingerprint=video.get("fingerprint"), output=result["output"], error=result["error"],
+                     status="failed" if result["error"] else "done")
+
+    results, metrics = run_batch(configs, max_workers=max_workers, token=token, on_result=record)
+    return results, skipped
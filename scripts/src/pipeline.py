@@ -1,131 +1,287 @@
-import yaml
 import sys
 import os
 import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from time import time
-from SmartAITool.core import *
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'))) # Add the parent directory of the 'models' folder to the system path
 #local
-from scripts.models.process_video import add_captions
-from scripts.models.subtitle.main import generate_subtitle
-from scripts.models.youtube.downloader import youtube_downloader
-from scripts.models.process_video.logo import add_logo
-from scripts.src.config import load_general_config, load_subtitle_config
-
-    
-def main(config):
-    #Load the configuration file [MAIN]
-    debugger, video_path, subtitle_path = load_general_config(config)
-    
-    cprint(f"the debug-mode is: {'ON' if debugger else 'OFF'}", "red" if debugger else "green")
+from scripts.src.cancel import Cancelled, CancelToken
+from scripts.src.config import DEFAULT_CONFIG_PATH, is_url, load_config, load_general_config, load_subtitle_config
+from scripts.src.probe import probe_video
+from scripts.src.scheduler import encode_cost, maybe_stage, transcribe_cost
 
-    if video_path.startswith("http://") or video_path.startswith("https://"):
-        cprint("[PIPELINE 1] downloading the video ...", "magenta")
-        video_path = youtube_downloader(config)
-        cprint(f"video is downloaded: {video_path}", "yellow")
+# NOTE: the heavy modules (moviepy, whisper/torch, SmartAITool, auto_subtitle_llama, openai)
+# are imported inside the stage that needs them, so importing this file stays cheap.
 
 
-    else:
-        cprint("The video path is an MP4 file [SKIP [PIPELINE 1]]", "red")
+def cprint(text, color=None):
+    """Colored print; SmartAITool is only imported the first time something is printed."""
+    from SmartAITool.core import cprint as _cprint
+    _cprint(text, color)
 
-    
-    # ---------------------[PIPELINE 1](download videos)----------------------
-   #download_video_path = "video is downloaded: output/youtube/25_youtube_Motivate_me/download/Cristiano_Ronaldo_Winning_Mentality__Cristiano_Ronaldo_Motivation.mp4"
 
-    # ---------------(create directory for videos and subtitle)----------------
+def prepare_dirs(video_path):
+    """Create the subtitle/final_video folders next to the download folder of the video."""
     filename = os.path.splitext(os.path.basename(video_path))[0]
     base_dir = os.path.dirname(os.path.dirname(video_path))  # Gets output/youtube/11_youtube_Motivate_me
     subtitle_dir = os.path.join(base_dir, "subtitle")
     os.makedirs(subtitle_dir, exist_ok=True)
     final_video_dir = os.path.join(base_dir, "final_video")
     os.makedirs(final_video_dir, exist_ok=True)
-    output_dir  = video_path, filename, subtitle_dir, final_video_dir 
+    return video_path, filename, subtitle_dir, final_video_dir
 
-    # ---------------------[PIPELINE 2](process subtitle)---------------------
-    model_name, language, translate_to, args = load_subtitle_config(config)
 
+def download_stage(config, token=None):
+    """[PIPELINE 1] download the video when video_path is an URL."""
+    _, video_path, _ = load_general_config(config)
 
+    if is_url(video_path):
+        from scripts.models.youtube.downloader import youtube_downloader
 
+        cprint("[PIPELINE 1] downloading the video ...", "magenta")
+        video_path = youtube_downloader(config, token)
+        if not video_path:
+            raise RuntimeError(f"downloading {config.video_path} failed")
+        cprint(f"video is downloaded: {video_path}", "yellow")
+    else:
+        cprint("The video path is an MP4 file [SKIP [PIPELINE 1]]", "red")
 
-    if subtitle_path == None:
+    return video_path
+
+
+def transcribe(config, media_path, output_dir, scheduler=None, token=None):
+    """Whisper subtitle of a video or audio file."""
+    from scripts.models.subtitle.main import generate_subtitle
+
+    model_name, language, translate_to, args = load_subtitle_config(config)
+    info = probe_video(media_path) if scheduler is not None else None
+    cost = transcribe_cost(model_name, info["duration"] if info else 0.0, translate=translate_to is not None)
+    with maybe_stage(scheduler, "transcribe", cost, token):
         cprint("[PIPELINE 2] creating subtitle model ...", "magenta")
-        subtitle = generate_subtitle(video_path, output_dir, model_name, language, translate_to, args)
-        
-        subtitle_json_path = os.path.join(subtitle_dir, f"{filename}.json")
-        with open(subtitle_json_path, 'w', encoding='utf-8') as json_file:
-            json.dump(subtitle, json_file, indent=4, ensure_ascii=False)
-        cprint(f"subtitle json format is saved: {subtitle_json_path}", 'yellow')
+        return generate_subtitle(media_path, output_dir, model_name, language, translate_to, args, token)
 
+
+def save_subtitle(subtitle, output_dir):
+    _, filename, subtitle_dir, _ = output_dir
+    subtitle_json_path = os.path.join(subtitle_dir, f"{filename}.json")
+    with open(subtitle_json_path, 'w', encoding='utf-8') as json_file:
+        json.dump(subtitle, json_file, indent=4, ensure_ascii=False)
+    cprint(f"subtitle json format is saved: {subtitle_json_path}", 'yellow')
+    return subtitle_json_path
+
+
+def transcribe_stage(config, video_path, output_dir, subtitle_path=None, scheduler=None, token=None):
+    """[PIPELINE 2] create the subtitle json with whisper, or load it from subtitle_path."""
+    if subtitle_path is None:
+        subtitle = transcribe(config, video_path, output_dir, scheduler, token)
+        save_subtitle(subtitle, output_dir)
     else:
         cprint("subtitle path is provided [SKIP [PIPELINE 2]]", "red")
         with open(subtitle_path, 'r') as file:
             subtitle = json.load(file)
-            
-            
+
+    return subtitle
+
+
+def audio_first_stage(config, scheduler=None, download_token=None, transcribe_token=None):
+    """
+    [PIPELINE 1+2] download the audio only and transcribe it while the video is
+    still downloading, so an URL takes max(download, transcribe) instead of the sum.
+    Returns (video_path, subtitle); subtitle is None if the audio path failed
+    and the video has to be transcribed as usual.
+    """
+    from scripts.models.youtube.downloader import download_audio
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        video_future = pool.submit(download_stage, config, download_token)
+        subtitle = None
+        try:
+            audio_path = download_audio(config, download_token)
+            if audio_path:
+                cprint(f"audio is downloaded, transcribing while the video downloads: {audio_path}", "yellow")
+                # the subtitle folder isn't known before the video is, it is saved after the join
+                subtitle = transcribe(config, audio_path, (audio_path, None, os.path.dirname(audio_path), None),
+                                      scheduler, transcribe_token)
+        except Cancelled:
+            if download_token is not None:
+                download_token.cancel()
+            raise
+        except Exception as e:
+            cprint(f"transcribing the audio failed, falling back to the video: {str(e)}", "red")
+        return video_future.result(), subtitle
+
+
+def pending_aspect(video_path):
+    """Crop/scale the downloader left to the render (None for local videos)."""
+    from scripts.models.youtube.downloader import read_pending_aspect
+    return read_pending_aspect(video_path)
+
+
+def render_fingerprint(config, video_path, subtitle):
+    """Hash of everything the rendered frames depend on; chunks of an older render are reused only if it matches."""
+    stat = os.stat(video_path)
+    payload = json.dumps([config.fingerprint(), os.path.abspath(video_path), stat.st_size, stat.st_mtime, subtitle,
+                          pending_aspect(video_path)],
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def render_stage(config, video_path, subtitle, output_dir, scheduler=None, token=None, subtitle_path=None):
+    """
+    [PIPELINE 3-7] burn the subtitle and the logo into the video and save the final video.
+    `subtitle_path` is the json the subtitle was loaded from, if not the one saved in output_dir.
+    """
+    info = probe_video(video_path) if scheduler is not None else None
+    cost = encode_cost(info["width"], info["height"], info["fps"], info["duration"]) if info else None
+    with maybe_stage(scheduler if cost else None, "encode", cost, token) as cost:
+        return _render(config, video_path, subtitle, output_dir, threads=cost.cores if cost else None, token=token,
+                       subtitle_path=subtitle_path)
+
+
+def _render(config, video_path, subtitle, output_dir, threads=None, token=None, subtitle_path=None):
+    _, filename, subtitle_dir, final_video_dir = output_dir
+    subtitle_path = subtitle_path or os.path.join(subtitle_dir, f"{filename}.json")
+    edit_video = video_path
+
+    # crop/scale deferred by the downloader, applied in the same encode as captions and logo
+    aspect = pending_aspect(video_path)
+    if aspect:
+        from moviepy.video.io.VideoFileClip import VideoFileClip
+        from scripts.models.process_video.aspect import apply_aspect
+
+        cprint(f"applying the {aspect['mode']} {aspect['ratio']} aspect ratio in the render", "magenta")
+        edit_video = apply_aspect(VideoFileClip(video_path), aspect)
+
     # ---------------------[PIPELINE 3](adding subtitle to video)---------------------
-    if config["process_subtitle"]["enabled"] == True:
+    if config.process_subtitle.enabled:
+        from scripts.models.process_video import add_captions
+        from scripts.models.process_video.layout_cache import layout_path
+
         cprint("[PIPELINE 3] adding subtitle to video ...", "magenta")
-        
-        # Get Add_subtitle config or use defaults if not present
-        add_subtitle_config = config["video_editor"].get("Add_subtitle", {})
-        
+        style = config.video_editor.add_subtitle
+
         edit_video = add_captions(
-            video_path=video_path,
+            video_path=edit_video,
             subtitle=subtitle,
-            font=add_subtitle_config.get("font", "/home/rteam2/.fonts/truetype/Vazir/vazirmatn-master/fonts/ttf/Vazirmatn-Black.ttf"),
-            font_size=add_subtitle_config.get("font_size", 20),
-            font_color=add_subtitle_config.get("font_color", "white"),
-            stroke_width=add_subtitle_config.get("stroke_width", 2),
-            stroke_color=add_subtitle_config.get("stroke_color", "black"),
-            shadow_strength=add_subtitle_config.get("shadow_strength", 1.0),
-            shadow_blur=add_subtitle_config.get("shadow_blur", 0.8),
-            highlight_current_word=add_subtitle_config.get("highlight_current_word", True),
-            word_highlight_color=add_subtitle_config.get("word_highlight_color", "red"),
-            position=tuple(add_subtitle_config.get("position", ["center", "center"])),
-            line_count=add_subtitle_config.get("line_count", 1),
-            padding=add_subtitle_config.get("padding", 50),
+            font=style.font,
+            font_size=style.font_size,
+            font_color=style.font_color,
+            stroke_width=style.stroke_width,
+            stroke_color=style.stroke_color,
+            shadow_strength=style.shadow_strength,
+            shadow_blur=style.shadow_blur,
+            highlight_current_word=style.highlight_current_word,
+            word_highlight_color=style.word_highlight_color,
+            position=style.position,
+            line_count=style.line_count,
+            padding=style.padding,
             print_info=True,
-            
+            streaming=config.render.streaming,
+            window_seconds=config.render.window_seconds,
+            # saved next to the subtitle json it was laid out from
+            layout_path=layout_path(subtitle_path) if config.render.layout_cache else None,
         )
     else:
         cprint("adding subtitle is disabled [SKIP [PIPELINE 3]]", "red")
-        
-    # ---------------------[PIPELINE 3](Adding logo to the video)---------------------
-    
-    if config["video_editor"]["logo"]["enabled"] == True:
+
+    # ---------------------[PIPELINE 4](Adding logo to the video)---------------------
+    if config.video_editor.logo.enabled:
+        from scripts.models.process_video.logo import add_logo
+
         cprint("[PIPELINE 4] Adding logo to the video ...", "magenta")
-        if config["process_subtitle"]["enabled"] == False:
-            edit_video = video_path
         edit_video = add_logo(config, edit_video)
     else:
         cprint("adding logo is disabled [SKIP [PIPELINE 4]]", "red")
-    
+
     # ---------------------[PIPELINE 5](Generate Descrption and Title)---------------------
     # cprint("[PIPELINE 5] Generate Descrption and Title ...", "magenta")
 
     # ---------------------[PIPELINE 6](Adding thumbail to the video)---------------------
     # cprint("[PIPELINE 6] Adding thumbail to the video ...", "magenta")
-    
-    
+
     # ---------------------[PIPELINE 7](Save Final-Video)---------------------
+    if isinstance(edit_video, str):
+        cprint("nothing to edit, the video is kept as it is [SKIP [PIPELINE 7]]", "red")
+        return edit_video
+
+    from scripts.models.process_video.render import CancellableLogger, write_chunked
+
     cprint("[PIPELINE 7] Saving Final-Video ...", "magenta")
     output_video_path = os.path.join(final_video_dir, f"{filename}_final.mp4")
-    edit_video.write_videofile(output_video_path, codec="libx264")
+    if config.render.chunk_seconds:
+        write_chunked(edit_video, output_video_path, config.render.chunk_seconds,
+                      fingerprint=render_fingerprint(config, video_path, subtitle), token=token,
+                      codec=config.render.codec, threads=threads)
+    else:
+        edit_video.write_videofile(output_video_path, codec=config.render.codec, threads=threads,
+                                   logger=CancellableLogger(token) if token is not None else "bar")
     cprint(f"Final video saved at: {output_video_path}", "yellow")
+    return output_video_path
+
+
+def describe_stage(config, subtitle_path, output_file=None):
+    """[PIPELINE 5] generate title, description and hashtags from a subtitle json."""
+    from scripts.models.description.gpt import main as generate_description
+
+    cprint("[PIPELINE 5] Generate Descrption and Title ...", "magenta")
+    return generate_description(subtitle_path, output_file, config=config.gpt, cache_dir=config.cache_dir("gpt"))
+
+
+def describe_batch_stage(config, subtitle_paths, output_path, token=None):
+    """[PIPELINE 5] title, description and hashtags of many subtitle jsons, streamed to a JSONL file."""
+    from scripts.models.description.batch import generate_batch
+
+    cprint(f"[PIPELINE 5] Generate Descrption and Title of {len(subtitle_paths)} videos ...", "magenta")
+    return generate_batch(subtitle_paths, output_path, config.gpt, cache_dir=config.cache_dir("gpt"), token=token)
+
+
+def main(config, scheduler=None, token=None):
+    #Load the configuration file [MAIN]
+    debugger, _, subtitle_path = load_general_config(config)
+    token = token or CancelToken()
+    timeouts = config.timeouts
+
+    cprint(f"the debug-mode is: {'ON' if debugger else 'OFF'}", "red" if debugger else "green")
+
+    # ---------------------[PIPELINE 1](download videos)----------------------
+    download_token = token.child("download", timeouts.download)
+    subtitle = None
+    if config.youtube.audio_first and subtitle_path is None and is_url(config.video_path):
+        # PIPELINE 2 runs on the audio-only stream while the video downloads
+        video_path, subtitle = audio_first_stage(config, scheduler, download_token,
+                                                 token.child("transcribe", timeouts.transcribe))
+    else:
+        video_path = download_stage(config, download_token)
+
+    # ---------------(create directory for videos and subtitle)----------------
+    output_dir = prepare_dirs(video_path)
+
+    # ---------------------[PIPELINE 2](process subtitle)---------------------
+    if subtitle is None:
+        subtitle = transcribe_stage(config, video_path, output_dir, subtitle_path, scheduler,
+                                    token.child("transcribe", timeouts.transcribe))
+    else:
+        save_subtitle(subtitle, output_dir)
+
+    # ---------------------[PIPELINE 3-7](edit and save the video)---------------------
+    output_video_path = render_stage(config, video_path, subtitle, output_dir, scheduler,
+                                     token.child("render", timeouts.render), subtitle_path)
+
     #----------------------[PIPELINE 8](upload telegram)---------------------
     #----------------------[PIPELINE 9](Removing temp files)---------------------
-    
+    return output_video_path
+
 
-        
 if __name__ == "__main__":
-    
+
     cprint("pipeline is running ...", "blue")
-    
+
     start_time = time()
-    with open("/home/rteam2/m15kh/auto-subtitle/config/config.yaml", 'r') as file:
-        config = yaml.safe_load(file)
-        
+    config_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CONFIG_PATH
+    config = load_config(config_path)
+
     main(config)
     end_time = time()
     execution_time = end_time - start_time
@@ -0,0 +1,30 @@
+import json
+import subprocess
+
+
+def probe_video(video_path):
+    """Read width, height, fps and duration of a video with ffprobe. Returns None if ffprobe fails."""
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'stream=width,height,avg_frame_rate:format=duration',
+        '-of', 'json',
+        video_path,
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+        data = json.loads(result.stdout)
+        stream = data["streams"][0]
+        num, den = stream.get("avg_frame_rate", "0/1").split("/")
+        fps = float(num) / float(den) if float(den) else 0.0
+        return {
+            "width": int(stream["width"]),
+            "height": int(stream["height"]),
+            "fps": fps or 30.0,
+            "duration": float(data.get("format", {}).get("duration", 0.0)),
+        }
+    except (OSError, ValueError, KeyError, IndexError) as e:
+        print(f"Error probing video: {str(e)}")
+        return None
@@ -0,0 +1,196 @@
+"""
+Admission control for the heavy stages of the pipeline.
+
+Several pipelines running on one box each load their own Whisper model and run
+their own libx264 encode. `ResourceScheduler` gives every stage an approximate
+cost (RAM in MB, cores, expected seconds) and only admits it while the
+configured budgets have room. Waiting stages are admitted shortest-first; a
+stage that waited longer than `max_wait` blocks smaller ones from jumping ahead
+so big jobs can't starve. A stage waiting with a CancelToken leaves the queue
+as soon as the token is cancelled or its deadline passes.
+"""
+import itertools
+import math
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from time import monotonic
+
+from scripts.src.cancel import POLL_INTERVAL, Cancelled, check
+
+# Approximate peak RAM of a loaded Whisper model while transcribing (MB)
+WHISPER_RAM_MB = {
+    "tiny": 1000,
+    "base": 1200,
+    "small": 2500,
+    "medium": 5500,
+    "large": 10000,
+    "turbo": 6500,
+}
+# mbart-large-50 translator used when translate_to is set
+TRANSLATOR_RAM_MB = 6000
+# Whisper runs at about this many seconds of audio per second on CPU for the large model
+WHISPER_SPEED = {"tiny": 30.0, "base": 16.0, "small": 6.0, "medium": 2.5, "large": 1.0, "turbo": 4.0}
+# libx264 on one core encodes roughly this many pixels per second (medium preset)
+ENCODE_PIXELS_PER_CORE = 1920 * 1080 * 12
+
+
+@dataclass(slots=True)
+class StageCost:
+    ram_mb: int
+    cores: int
+    est_seconds: float = 0.0
+
+
+def transcribe_cost(model_name, duration=0.0, translate=False, cores=None):
+    """Cost of [PIPELINE 2]: the Whisper model (plus the translator) for `duration` seconds of audio."""
+    name = model_name[:-3] if model_name.endswith(".en") else model_name
+    name = name.split("-")[0] if name not in WHISPER_RAM_MB else name
+    ram_mb = WHISPER_RAM_MB.get(name, WHISPER_RAM_MB["large"])
+    if translate:
+        ram_mb += TRANSLATOR_RAM_MB
+    cores = cores or min(4, os.cpu_count() or 1)
+    est_seconds = duration / WHISPER_SPEED.get(name, 1.0) if duration else 0.0
+    return StageCost(ram_mb, cores, est_seconds)
+
+
+def encode_cost(width, height, fps, duration=0.0, max_cores=None):
+    """Cost of [PIPELINE 7]: decoding, compositing and encoding width x height at fps."""
+    pixel_rate = width * height * fps
+    max_cores = max_cores or os.cpu_count() or 1
+    cores = max(1, min(max_cores, math.ceil(pixel_rate / ENCODE_PIXELS_PER_CORE)))
+    # frame buffers of moviepy (RGB float compositing) + libx264 lookahead
+    ram_mb = 300 + int(width * height * 3 * 40 / 1024 / 1024)
+    est_seconds = duration * pixel_rate / (ENCODE_PIXELS_PER_CORE * cores) if duration else 0.0
+    return StageCost(ram_mb, cores, est_seconds)
+
+
+def system_ram_mb():
+    try:
+        return int(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 1024 / 1024)
+    except (ValueError, OSError, AttributeError):
+        return 16 * 1024
+
+
+class _Ticket:
+    __slots__ = ("name", "cost", "seq", "enqueued", "admitted")
+
+    def __init__(self, name, cost, seq):
+        self.name = name
+        self.cost = cost
+        self.seq = seq
+        self.enqueued = monotonic()
+        self.admitted = False
+
+
+class ResourceScheduler:
+    """Admit stages while their RAM/cores fit in the budget, shortest expected job first."""
+
+    def __init__(self, ram_mb=None, cores=None, max_wait=600.0):
+        self.ram_mb = ram_mb or system_ram_mb()
+        self.cores = cores or os.cpu_count() or 1
+        self.max_wait = max_wait
+        self._ram_in_use = 0
+        self._cores_in_use = 0
+        self._running = 0
+        self._queue = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._waits = {}
+
+    @classmethod
+    def from_config(cls, scheduler_config):
+        return cls(scheduler_config.ram_mb, scheduler_config.cores, scheduler_config.max_wait)
+
+    def _clamp(self, cost):
+        # a stage bigger than the whole budget still runs, but alone
+        return StageCost(min(cost.ram_mb, self.ram_mb), min(cost.cores, self.cores), cost.est_seconds)
+
+    def _fits(self, cost):
+        return self._ram_in_use + cost.ram_mb <= self.ram_mb and self._cores_in_use + cost.cores <= self.cores
+
+    def _priority(self, ticket, now):
+        starving = now - ticket.enqueued > self.max_wait
+        return (not starving, ticket.cost.est_seconds, ticket.seq)
+
+    def _admit_waiting(self):
+        """Admit queued tickets in priority order; called with the condition held."""
+        now = monotonic()
+        for ticket in sorted(self._queue, key=lambda ticket: self._priority(ticket, now)):
+            if self._fits(ticket.cost):
+                ticket.admitted = True
+                self._ram_in_use += ticket.cost.ram_mb
+                self._cores_in_use += ticket.cost.cores
+                self._running += 1
+            elif now - ticket.enqueued > self.max_wait:
+                # reserve the budget for the starving stage: nobody behind it may jump ahead
+                break
+        self._queue = [ticket for ticket in self._queue if not ticket.admitted]
+
+    def acquire(self, name, cost, token=None):
+        """Wait until the stage is admitted; raises Cancelled/StageTimeout (and leaves the queue) if `token` stops."""
+        ticket = _Ticket(name, self._clamp(cost), next(self._counter))
+        with self._condition:
+            self._queue.append(ticket)
+            self._admit_waiting()
+            while not ticket.admitted:
+                try:
+                    check(token)
+                except Cancelled:
+                    # a starving ticket may have been holding the others back
+                    self._queue.remove(ticket)
+                    self._admit_waiting()
+                    self._condition.notify_all()
+                    raise
+                self._condition.wait(POLL_INTERVAL if token is not None else None)
+            waited = monotonic() - ticket.enqueued
+            stats = self._waits.setdefault(name, {"count": 0, "total_wait": 0.0, "max_wait": 0.0})
+            stats["count"] += 1
+            stats["total_wait"] += waited
+            stats["max_wait"] = max(stats["max_wait"], waited)
+        if waited > 0.5:
+            print(f"[scheduler] {name} waited {waited:.1f}s (ram {ticket.cost.ram_mb}MB, cores {ticket.cost.cores})")
+        return ticket
+
+    def release(self, ticket):
+        with self._condition:
+            self._ram_in_use -= ticket.cost.ram_mb
+            self._cores_in_use -= ticket.cost.cores
+            self._running -= 1
+            self._admit_waiting()
+            self._condition.notify_all()
+
+    @contextmanager
+    def stage(self, name, cost, token=None):
+        """with scheduler.stage("transcribe", cost, token) as cost: ...  (yields the clamped cost)"""
+        ticket = self.acquire(name, cost, token)
+        try:
+            yield ticket.cost
+        finally:
+            self.release(ticket)
+
+    def metrics(self):
+        with self._condition:
+            return {
+                "queue_depth": len(self._queue),
+                "running": self._running,
+                "ram_in_use_mb": self._ram_in_use,
+                "ram_budget_mb": self.ram_mb,
+                "cores_in_use": self._cores_in_use,
+                "cores_budget": self.cores,
+                "waits": {
+                    name: {**stats, "avg_wait": stats["total_wait"] / stats["count"]}
+                    for name, stats in self._waits.items()
+                },
+            }
+
+
+@contextmanager
+def maybe_stage(scheduler, name, cost, token=None):
+    """scheduler.stage() when a scheduler is given, a no-op otherwise."""
+    if scheduler is None:
+        yield cost
+    else:
+        with scheduler.stage(name, cost, token) as admitted_cost:
+            yield admitted_cost
@@ -0,0 +1,44 @@
+import importlib.util
+import json
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+
+def load_source(path, name=None):
+    """
+    Module of a file of the repo loaded on its own, without running the
+    __init__ of its package (process_video imports moviepy there).
+    """
+    name = name or os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def fake_ytdlp(directory, body):
+    """
+    Executable stand-in for yt-dlp in `directory`: appends its argv to
+    <directory>/calls.jsonl, then runs `body` (python, `args` = argv[1:]).
+    Returns (path of the script, function returning the logged calls).
+    """
+    path = os.path.join(str(directory), "yt-dlp")
+    calls_path = os.path.join(str(directory), "calls.jsonl")
+    with open(path, 'w') as file:
+        file.write(f"#!{sys.executable}\n"
+                   "import json, sys\n"
+                   "args = sys.argv[1:]\n"
+                   f"with open({calls_path!r}, 'a') as log:\n"
+                   "    log.write(json.dumps(args) + '\\n')\n"
+                   + body)
+    os.chmod(path, 0o755)
+
+    def calls():
+        if not os.path.exists(calls_path):
+            return []
+        with open(calls_path) as file:
+            return [json.loads(line) for line in file]
+    return path, calls
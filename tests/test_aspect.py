@@ -0,0 +1,89 @@
+import re
+import shutil
+import subprocess
+
+import pytest
+
+from conftest import load_source
+from scripts.models.youtube.downloader import build_aspect_filter
+from scripts.src.config import AspectRatioConfig, SegmentConfig
+
+np = pytest.importorskip("numpy")
+aspect = load_source("scripts/models/process_video/aspect.py")
+
+needs_ffmpeg = pytest.mark.skipif(not shutil.which("ffmpeg"), reason="ffmpeg is not installed")
+
+SIZES = [(1920, 1080), (1080, 1920), (854, 480), (720, 720), (426, 240)]
+RATIOS = ["9:16", "16:9", "4:5"]
+
+
+# (source size, ratio, position) -> crop window the ffmpeg crop filter of the downloader cuts (ffmpeg 7)
+@pytest.mark.parametrize("size, ratio, position, box", [
+    ((1920, 1080), "9:16", "center", (656, 0, 608, 1080)),
+    ((1080, 1920), "16:9", "bottom", (0, 1312, 1080, 608)),
+    ((854, 480), "4:5", "center", (234, 0, 384, 480)),
+    ((720, 720), "9:16", "right", (314, 0, 404, 720)),
+    ((720, 720), "16:9", "center", (0, 158, 720, 404)),
+    ((426, 240), "16:9", "center", (0, 0, 426, 240)),
+    ((426, 240), "9:16", "center", (146, 0, 134, 240)),
+])
+def test_crop_box_matches_ffmpeg(size, ratio, position, box):
+    assert aspect.crop_box(*size, aspect.parse_ratio(ratio), position) == box
+
+
+@pytest.mark.parametrize("size, ratio, box", [
+    ((640, 360), "16:9", (0, 0, 640, 360)),
+    ((854, 480), "16:9", (0, 0, 854, 480)),  # 480.4 high: ffmpeg doesn't pad either
+    ((640, 360), "9:16", (0, 389, 640, 1138)),  # ffmpeg pads to 1137, rounded up to even
+    ((1080, 1920), "16:9", (1167, 0, 3414, 1920)),
+])
+def test_pad_box(size, ratio, box):
+    assert aspect.pad_box(*size, aspect.parse_ratio(ratio)) == box
+
+
+def run_filter(image, video_filter):
+    """Gray `image` through format=yuv420p + `video_filter`, as (output gray frame, ffmpeg's output size)."""
+    height, width = image.shape
+    result = subprocess.run(['ffmpeg', '-v', 'info', '-f', 'rawvideo', '-pix_fmt', 'gray', '-s', f'{width}x{height}',
+                             '-i', '-', '-vf', f'format=yuv420p,{video_filter},format=gray,showinfo',
+                             '-f', 'rawvideo', '-'], input=image.tobytes(), capture_output=True, check=True)
+    out_width, out_height = map(int, re.search(r"\] n: *0 .* s:(\d+)x(\d+)", result.stderr.decode()).groups())
+    return np.frombuffer(result.stdout, np.uint8).reshape(out_height, out_width), (out_width, out_height)
+
+
+@needs_ffmpeg
+@pytest.mark.parametrize("position", ["center", "left", "right", "top", "bottom"])
+@pytest.mark.parametrize("size", SIZES)
+def test_crop_box_cuts_what_ffmpeg_cuts(size, position):
+    image = np.random.default_rng(0).integers(30, 220, size[::-1], dtype=np.uint8)
+    for ratio in RATIOS:
+        output, _ = run_filter(image, build_aspect_filter(AspectRatioConfig(mode="crop", ratio=ratio,
+                                                                            crop_position=position)))
+        x, y, width, height = aspect.crop_box(*size, aspect.parse_ratio(ratio), position)
+        assert output.shape == (height, width)
+        # only the yuv420p round trip differs
+        assert np.abs(output.astype(int) - image[y:y + height, x:x + width]).mean() < 1
+
+
+@needs_ffmpeg
+@pytest.mark.parametrize("size", SIZES)
+def test_pad_box_is_ffmpeg_pad_rounded_to_even(size):
+    image = np.full(size[::-1], 128, dtype=np.uint8)
+    for ratio in RATIOS:
+        _, (width, height) = run_filter(image, build_aspect_filter(AspectRatioConfig(mode="scale", ratio=ratio)))
+        _, _, pad_width, pad_height = aspect.pad_box(*size, aspect.parse_ratio(ratio))
+        assert (pad_width, pad_height) == (width + width % 2, height + height % 2)
+
+
+@pytest.mark.parametrize("mode, is_short", [("auto", True), ("crop", False), ("scale", False)])
+def test_source_format_follows_the_configured_aspect_mode(monkeypatch, tmp_path, mode, is_short):
+    from scripts.models.youtube import downloader
+
+    selected = []
+    monkeypatch.setattr(downloader, "format_selector", lambda short, *args: selected.append(short) or "best")
+    monkeypatch.setattr(downloader.sources, "get_source", lambda *args: None)
+    segment = SegmentConfig(aspect_ratio=AspectRatioConfig(mode=mode, ratio="9:16"))
+    url = "https://youtube.com/shorts/abc"
+    assert downloader.download_source_and_cut(url, [segment], "best", "720p", str(tmp_path), ["a"]) is None
+    # the same short/regular decision download_segment makes for the segment
+    assert selected == [is_short] == [downloader.is_short_target(url, mode)]
@@ -0,0 +1,123 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("moviepy")  # the process_video package imports it
+from scripts.models.process_video.caption_sprites import CaptionSprites  # noqa: E402
+from scripts.models.process_video.streaming import StreamingCaptions  # noqa: E402
+
+# a monospace "font": every character is an opaque 3x4 block, spaces are transparent
+CHAR_WIDTH, HEIGHT = 3, 4
+BASE, HIGHLIGHT = (200, 200, 200), (250, 200, 0)
+
+
+class FakeClip:
+    def __init__(self, rgb, alpha):
+        self.rgb = rgb
+        self.mask = FakeMask(alpha)
+
+    def get_frame(self, t):
+        return self.rgb
+
+
+class FakeMask:
+    def __init__(self, alpha):
+        self.alpha = alpha
+
+    def get_frame(self, t):
+        return self.alpha
+
+
+def render(text, highlight=None):
+    """Clip of `text` with word number `highlight` in the highlight color."""
+    rgb = np.zeros((HEIGHT, CHAR_WIDTH * len(text), 3), dtype=np.uint8)
+    alpha = np.zeros(rgb.shape[:2], dtype=np.float32)
+    position = 0
+    for i, word in enumerate(text.split(" ")):
+        for char in word:
+            columns = slice(position * CHAR_WIDTH, (position + 1) * CHAR_WIDTH)
+            rgb[:, columns] = HIGHLIGHT if i == highlight else BASE
+            alpha[:, columns] = 1.0
+            position += 1
+        position += 1
+    return FakeClip(rgb, alpha)
+
+
+def offsets(words):
+    starts, position = [], 0
+    for word in words:
+        starts.append(position * CHAR_WIDTH)
+        position += len(word) + 1
+    return starts
+
+
+def sprites(calls, **limits):
+    def draw_line(text):
+        calls.append(("line", text))
+        return render(text)
+
+    def draw_word(word):
+        calls.append(("word", word))
+        return render(word, highlight=0)
+    return CaptionSprites(draw_line, draw_word, lambda text: text.split(" "), offsets, **limits)
+
+
+def subcaptions(lines):
+    """One subcaption per highlighted word of each line, 0.5s each, as the layout yields them."""
+    start = 0.0
+    for text, y in lines:
+        for highlight in range(len(text.split(" "))):
+            yield {"start": start, "end": start + 0.5, "current_word": highlight,
+                   "lines": [{"text": text, "x": "center", "y": y, "highlight": highlight}]}
+            start += 0.5
+
+
+LINES = [("the quick fox", 2), ("jumps over", 10), ("the quick fox", 2)]
+
+
+def test_patched_lines_equal_the_fully_drawn_highlight():
+    # exact for opaque glyphs; anti-aliased edges of the word are blended twice (see CaptionSprites)
+    background = np.random.default_rng(5).integers(0, 256, (20, 60, 3), dtype=np.uint8)
+    full = StreamingCaptions(lambda: subcaptions(LINES), lambda line, word: render(line["text"], word))
+    patched = StreamingCaptions(lambda: subcaptions(LINES), None, sprites=sprites([]))
+
+    for t in np.arange(0, 8 * 0.5, 0.25):
+        assert (patched.draw(lambda _: background, t) == full.draw(lambda _: background, t)).all(), t
+
+
+def test_lines_and_words_are_drawn_once():
+    calls = []
+    caption_sprites = sprites(calls)
+    for subcaption in subcaptions(LINES):
+        for line in subcaption["lines"]:
+            caption_sprites.layers(line["text"], line["highlight"])
+
+    assert calls == [("line", "the quick fox"), ("word", "the"), ("word", "quick"), ("word", "fox"),
+                     ("line", "jumps over"), ("word", "jumps"), ("word", "over")]
+    assert caption_sprites.drawn_count == len(calls)
+    assert caption_sprites.layer_count == 8
+    assert caption_sprites.drawn_bytes < caption_sprites.full_bytes
+
+
+def test_layers_without_highlight():
+    layers = sprites([]).layers("the quick fox")
+    assert len(layers) == 1 and layers[0][2] == 0
+
+
+def test_bounded_caches_drop_the_least_recently_used():
+    calls = []
+    caption_sprites = sprites(calls, max_lines=2, max_words=1)
+    for text in ["a b", "c d", "a b", "e f", "c d"]:
+        caption_sprites.layers(text, 1)
+
+    # "c d" was dropped when "e f" came in, "a b" had been used again
+    assert [text for kind, text in calls if kind == "line"] == ["a b", "c d", "e f", "c d"]
+    assert list(caption_sprites.line_bitmaps) == ["e f", "c d"]
+    assert list(caption_sprites.word_bitmaps) == ["d"]
+
+
+def test_report(capsys):
+    caption_sprites = sprites([])
+    for _ in range(3):
+        caption_sprites.layers("the quick fox", 1)
+    caption_sprites.report()
+    assert "2 drawn for 3 line states" in capsys.readouterr().out
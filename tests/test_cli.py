@@ -0,0 +1,39 @@
+import json
+import subprocess
+import sys
+import textwrap
+import time
+
+from conftest import ROOT
+
+HEAVY = ["moviepy", "whisper", "torch", "openai", "transformers"]
+
+CHILD = textwrap.dedent('''
+    import json
+    import sys
+
+    sys.path.insert(0, ROOT)
+    import scripts.src.cli
+    import scripts.src.pipeline
+
+    print(json.dumps(sorted(name for name in HEAVY if name in sys.modules)))
+''')
+
+
+def test_startup_imports_no_models():
+    # a fresh interpreter: the test session may already have imported some of them
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", f"ROOT = {ROOT!r}\nHEAVY = {HEAVY!r}\n" + CHILD],
+                            capture_output=True, text=True, cwd=ROOT, timeout=60)
+    elapsed = time.perf_counter() - start
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout) == []
+    # argparse + yaml + the config schema; a model import alone takes seconds
+    assert elapsed < 2.0
+
+
+def test_help_shows_the_real_invocation():
+    result = subprocess.run([sys.executable, "-m", "scripts.src.cli", "--help"],
+                            capture_output=True, text=True, cwd=ROOT, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.startswith("usage: python -m scripts.src.cli")
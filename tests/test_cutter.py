@@ -0,0 +1,90 @@
+import shutil
+import subprocess
+
+import pytest
+
+from scripts.models.youtube import cutter
+
+needs_ffmpeg = pytest.mark.skipif(not (shutil.which("ffmpeg") and shutil.which("ffprobe")),
+                                  reason="ffmpeg is not installed")
+
+FPS = 25
+
+
+def test_plan_cut_copies_whole_gops_only():
+    keyframes = [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert cutter.plan_cut(keyframes, 1.52, 3.48) == [("encode", 1.52, 2.0), ("copy", 2.0, 3.0),
+                                                        ("encode", 3.0, 3.48)]
+    assert cutter.plan_cut(keyframes, 1.0, 3.0) == [("copy", 1.0, 3.0)]
+    assert cutter.plan_cut(keyframes, 1.2, 1.8) is None
+
+
+@pytest.mark.parametrize("keyframe", [2.0, 10.0005, 10.0004, 3599.9996])
+def test_copy_start_never_seeks_before_its_keyframe(keyframe):
+    args = cutter._range_args(keyframe, keyframe + 1, copy=True, exclusive=True)
+    seek = float(args[args.index('-ss') + 1])
+    assert keyframe < seek < keyframe + 1 / 120
+    # and stops before the frame at the next keyframe
+    assert seek + float(args[args.index('-t') + 1]) < keyframe + 1
+
+
+def test_encoder_args_match_the_source():
+    args = cutter.encoder_args({"codec": "h264", "profile": "High", "level": 40, "pix_fmt": "yuv420p"})
+    assert args[args.index('-profile:v') + 1] == "high"
+    assert args[args.index('-level') + 1] == "4"
+    assert "repeat-headers=1" in args[args.index('-x264-params') + 1]
+    args = cutter.encoder_args({"codec": "hevc", "profile": "Main 10", "level": 120, "pix_fmt": "yuv420p10le"})
+    assert args[args.index('-profile:v') + 1] == "main10"
+    assert "level-idc=4" in args[args.index('-x265-params') + 1]
+
+
+def test_parse_rate():
+    assert cutter.parse_rate("25/1") == 25
+    assert abs(cutter.parse_rate("30000/1001") - 29.97) < 0.01
+    assert cutter.parse_rate("0/0") is None
+    assert cutter.parse_rate(None) is None
+
+
+def frames(path):
+    result = subprocess.run(['ffprobe', '-v', 'error', '-count_frames', '-select_streams', 'v:0',
+                             '-show_entries', 'stream=nb_read_frames', '-of', 'csv=p=0', path],
+                            capture_output=True, text=True, check=True)
+    return int(result.stdout.strip())
+
+
+def decode_errors(path):
+    result = subprocess.run(['ffmpeg', '-v', 'error', '-i', path, '-f', 'null', '-'], capture_output=True, text=True)
+    return result.returncode, result.stderr.strip()
+
+
+@pytest.fixture(scope="module")
+def source(tmp_path_factory):
+    """6s of 25 fps H.264 (High profile) with a keyframe every second, and audio."""
+    if not (shutil.which("ffmpeg") and shutil.which("ffprobe")):
+        pytest.skip("ffmpeg is not installed")
+    path = str(tmp_path_factory.mktemp("cutter") / "source.mp4")
+    subprocess.run(['ffmpeg', '-y', '-v', 'error', '-f', 'lavfi', '-i', f'testsrc2=size=320x240:rate={FPS}:duration=6',
+                    '-f', 'lavfi', '-i', 'sine=frequency=440:duration=6',
+                    '-c:v', 'libx264', '-profile:v', 'high', '-preset', 'veryslow', '-g', str(FPS),
+                    '-keyint_min', str(FPS), '-sc_threshold', '0', '-pix_fmt', 'yuv420p',
+                    '-c:a', 'aac', '-shortest', path], check=True)
+    return path
+
+
+@needs_ffmpeg
+@pytest.mark.parametrize("start, end", [(1.52, 3.48), (1.0, 4.0), (0.6, 5.0)])
+def test_smart_cut_has_every_frame_once(source, tmp_path, start, end):
+    assert cutter.keyframes(source)[:3] == pytest.approx([0.0, 1.0, 2.0], abs=1e-3)
+    output = cutter.cut(source, start, end, str(tmp_path / "cut.mp4"))
+    assert output is not None
+    # a duplicated GOP would add 25 frames, a dropped boundary frame would remove one
+    assert frames(output) == round((end - start) * FPS)
+    assert decode_errors(output) == (0, "")
+
+
+@needs_ffmpeg
+def test_smart_cut_keeps_the_source_profile(source, tmp_path):
+    output = cutter.cut(source, 1.52, 3.48, str(tmp_path / "cut.mp4"))
+    info = cutter.probe_streams(output)
+    assert (info["codec"], info["profile"], info["has_audio"]) == ("h264", "High", True)
+    assert cutter.validate_cut(output, 1.96, [0.48, 1.48])
@@ -0,0 +1,44 @@
+from scripts.models.youtube import formats
+from scripts.src.config import AspectRatioConfig
+
+
+def fmt(format_id, width, height, vcodec="avc1.640028", tbr=1000, **extra):
+    return {"format_id": format_id, "width": width, "height": height, "vcodec": vcodec, "tbr": tbr,
+            "acodec": "none", "protocol": "https", **extra}
+
+
+INFO = {"formats": [
+    fmt("sb0", 160, 90, vcodec="none"),  # storyboard
+    fmt("hls720", 1280, 720, protocol="m3u8_native"),
+    fmt("360", 640, 360, tbr=300),
+    fmt("720vp9", 1280, 720, vcodec="vp9", tbr=1200),
+    fmt("720", 1280, 720, tbr=1500),
+    fmt("1080vp9", 1920, 1080, vcodec="vp9", tbr=2500),
+    fmt("1080", 1920, 1080, tbr=3000),
+    fmt("2160", 3840, 2160, vcodec="vp9", tbr=12000),
+]}
+
+CROP_9_16 = AspectRatioConfig(mode="crop", ratio="9:16")
+
+
+def test_never_above_the_height_cap():
+    # a 9:16 crop of 1080p is only 607 wide, but that is what best[height<=1080] gets too: no 4K
+    assert formats.select_format(INFO, 1080, CROP_9_16)["format_id"] == "1080"
+    assert formats.select_format(INFO, 720, CROP_9_16)["format_id"] == "720"
+
+
+def test_smallest_format_meeting_the_target():
+    assert formats.select_format(INFO, 720)["format_id"] == "720"
+    assert formats.select_format(INFO, 360)["format_id"] == "360"
+
+
+def test_padding_is_not_resolution():
+    scale_9_16 = AspectRatioConfig(mode="scale", ratio="9:16")
+    assert formats.output_size(1280, 720, scale_9_16) == (1280, 720)
+    assert formats.output_size(1280, 720, CROP_9_16) == (405, 720)
+    assert formats.select_format(INFO, 720, scale_9_16)["format_id"] == "720"
+
+
+def test_nothing_under_the_cap():
+    assert formats.select_format(INFO, 240) is None
+    assert formats.select_format({"formats": [fmt("sb0", 160, 90, vcodec="none")]}, 1080) is None
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("openai")
+
+from scripts.models.description import gpt
+from scripts.src.config import from_dict
+
+SUBTITLE = [{"start": 0.0, "end": 4.0, "text": "Today we test the description stage against a local server."}]
+
+
+class ChatServer(ThreadingHTTPServer):
+    """OpenAI-compatible /v1/chat/completions answering after `delay` seconds."""
+
+    daemon_threads = True
+
+    def __init__(self, delay=0.3, structured_answer=None):
+        super().__init__(("127.0.0.1", 0), ChatHandler)
+        self.delay = delay
+        self.structured_answer = structured_answer
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class ChatHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.requests.append(body)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(server.delay)
+
+        system_prompt = body["messages"][0]["content"]
+        if body.get("response_format", {}).get("type") == "json_object":
+            content = server.structured_answer
+        elif "title" in system_prompt:
+            content = '"A title"'
+        elif "hashtags" in system_prompt:
+            content = " ".join(f"#tag{i}" for i in range(10))
+        else:
+            content = "A description."
+        answer = json.dumps({
+            "id": "chatcmpl-test", "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20},
+        }).encode()
+        with server.lock:
+            server.in_flight -= 1
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(answer)))
+        self.end_headers()
+        self.wfile.write(answer)
+
+
+@pytest.fixture
+def server():
+    servers = []
+
+    def start(**kwargs):
+        chat_server = ChatServer(**kwargs)
+        threading.Thread(target=chat_server.serve_forever, daemon=True).start()
+        servers.append(chat_server)
+        return chat_server
+
+    yield start
+    for chat_server in servers:
+        chat_server.shutdown()
+        chat_server.server_close()
+
+
+def gpt_config(base_url, **settings):
+    prompts = {name: {"system_prompt": f"You write {name} for videos.", "user_prompt_template": "{content}"}
+               for name in ("title", "description", "hashtags")}
+    return from_dict({"video_path": "video.mp4", "gpt": dict(api_key="test", base_url=base_url, max_retries=0,
+                                                            **prompts, **settings)},
+                     check_files=False).gpt
+
+
+def generate(config, cache_dir):
+    return asyncio.run(gpt.agenerate_all(SUBTITLE, config, str(cache_dir)))
+
+
+def test_three_requests_at_once_then_cached(server, tmp_path):
+    chat_server = server(delay=0.5)
+    config = gpt_config(chat_server.base_url)
+
+    started = time.perf_counter()
+    title, description, hashtags = generate(config, tmp_path)
+    elapsed = time.perf_counter() - started
+    assert (title, description) == ("A title", "A description.")
+    assert hashtags.split() == [f"#tag{i}" for i in range(10)]
+    assert len(chat_server.requests) == 3
+    assert chat_server.max_in_flight == 3
+    assert elapsed < 1.4  # not 3 x 0.5 s one after the other
+
+    # a re-run of the same transcript is answered by the ResponseCache
+    assert generate(config, tmp_path) == (title, description, hashtags)
+    assert len(chat_server.requests) == 3
+
+
+def test_sync_wrappers_share_the_answer_cache(server, tmp_path):
+    chat_server = server(delay=0.0)
+    config = gpt_config(chat_server.base_url)
+    title = gpt.generate_video_title(SUBTITLE, config, str(tmp_path))
+    assert gpt.generate_video_title(SUBTITLE, config, str(tmp_path)) == title == "A title"
+    # and agenerate_all finds the cached title
+    generate(config, tmp_path)
+    assert len(chat_server.requests) == 3
+
+
+def test_structured_mode_is_one_request(server, tmp_path):
+    answer = json.dumps({"title": "One title", "description": "One description.",
+                         "hashtags": [f"#one{i}" for i in range(10)]})
+    chat_server = server(delay=0.0, structured_answer=answer)
+    title, description, hashtags = generate(gpt_config(chat_server.base_url, mode="structured"), tmp_path)
+    assert (title, description) == ("One title", "One description.")
+    assert len(hashtags.split()) == 10
+    assert len(chat_server.requests) == 1
+    assert chat_server.requests[0]["response_format"] == {"type": "json_object"}
+
+
+def test_structured_mode_falls_back_to_three_requests(server, tmp_path):
+    chat_server = server(delay=0.0, structured_answer="Sure! Here is your title: ...")
+    title, description, hashtags = generate(gpt_config(chat_server.base_url, mode="structured"), tmp_path)
+    assert (title, description) == ("A title", "A description.")
+    assert len(chat_server.requests) == 4
+    assert "response_format" not in chat_server.requests[1]
+
+
+def test_backend_without_json_mode_asks_per_field():
+    from scripts.models.description.backends import LocalBackend
+    from scripts.models.description.client import ChatClient
+
+    class PlainBackend:
+        supports_json = LocalBackend.supports_json
+
+        def __init__(self):
+            self.calls = []
+
+        async def start(self):
+            pass
+
+        async def close(self):
+            pass
+
+        async def complete(self, system_prompt, prompt, max_tokens, json_mode=False):
+            self.calls.append(json_mode)
+            return "#a #b" if "hashtags" in system_prompt else '"Text"'
+
+    async def run():
+        async with ChatClient(PlainBackend(), "plain") as client:
+            return await gpt.agenerate_with(client, "content", config), client.backend.calls
+
+    config = gpt_config("http://unused/v1", mode="structured")
+    (title, _, _), calls = asyncio.run(run())
+    assert title == "Text"
+    assert calls == [False, False, False]  # no structured request first
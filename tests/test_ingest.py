@@ -0,0 +1,142 @@
+import json
+
+import pytest
+
+from scripts.src import ingest
+from scripts.src.config import from_dict
+
+# `yt-dlp --flat-playlist -J` of a channel: the tabs are nested playlists, and a
+# video is listed in two tabs
+CHANNEL_DUMP = {
+    "_type": "playlist",
+    "id": "UCchannel",
+    "entries": [
+        {"_type": "playlist", "id": "UCchannel_videos", "title": "Videos", "entries": [
+            {"_type": "url", "id": "aaaaaaaaaaa", "url": "https://www.youtube.com/watch?v=aaaaaaaaaaa", "title": "A"},
+            {"_type": "url", "id": "bbbbbbbbbbb", "url": "https://www.youtube.com/watch?v=bbbbbbbbbbb", "title": "B"},
+            None,
+        ]},
+        {"_type": "playlist", "id": "UCchannel_shorts", "title": "Shorts", "entries": [
+            {"_type": "url", "id": "ccccccccccc", "url": "https://www.youtube.com/shorts/ccccccccccc", "title": "C"},
+            {"_type": "url", "id": "aaaaaaaaaaa", "url": "https://www.youtube.com/watch?v=aaaaaaaaaaa", "title": "A"},
+            {"_type": "url", "id": "ddddddddddd", "url": "ddddddddddd", "title": "D"},
+        ]},
+    ],
+}
+
+
+def fingerprint(bits):
+    return f"{len(bits)}:{int(bits, 2):x}"
+
+
+def make_config(tmp_path, **ingest_settings):
+    return from_dict({"video_path": "https://www.youtube.com/watch?v=aaaaaaaaaaa", "output_dir": str(tmp_path),
+                      "ingest": dict(index_path=str(tmp_path / "index.json"), **ingest_settings)},
+                     check_files=False)
+
+
+@pytest.fixture
+def dump(tmp_path):
+    path = tmp_path / "channel.json"
+    path.write_text(json.dumps(CHANNEL_DUMP))
+    return str(path)
+
+
+def test_load_listing_flattens_tabs_and_drops_duplicates(dump):
+    videos = ingest.load_listing(dump)
+    assert [video["id"] for video in videos] == ["aaaaaaaaaaa", "bbbbbbbbbbb", "ccccccccccc", "ddddddddddd"]
+    assert videos[3]["url"] == "https://www.youtube.com/watch?v=ddddddddddd"
+
+
+def test_load_listing_of_json_lines(tmp_path):
+    path = tmp_path / "lines.json"
+    path.write_text("\n".join(json.dumps(entry) for entry in CHANNEL_DUMP["entries"][1]["entries"]))
+    assert [video["id"] for video in ingest.load_listing(str(path))] == ["ccccccccccc", "aaaaaaaaaaa", "ddddddddddd"]
+
+
+def test_plan_ingest_skips_indexed_videos(dump, tmp_path):
+    config = make_config(tmp_path, fingerprint=False)
+    ingest.update_index(config.ingest.index_path, "aaaaaaaaaaa", status="done")
+    ingest.update_index(config.ingest.index_path, "bbbbbbbbbbb", status="failed")
+
+    new, skipped, index_path = ingest.plan_ingest(config, ingest.load_listing(dump))
+    assert index_path == config.ingest.index_path
+    # failed videos are tried again
+    assert [video["id"] for video in new] == ["bbbbbbbbbbb", "ccccccccccc", "ddddddddddd"]
+    assert [(video["id"], reason) for video, reason in skipped] == [("aaaaaaaaaaa", "already processed")]
+
+
+def test_plan_ingest_skips_reuploads(dump, tmp_path, monkeypatch):
+    config = make_config(tmp_path, max_distance=0.1)
+    indexed = "01" * 32
+    ingest.update_index(config.ingest.index_path, "zzzzzzzzzzz", status="done", fingerprint=fingerprint(indexed))
+    fingerprints = {
+        "aaaaaaaaaaa": fingerprint("1" + indexed[1:]),  # 1 of 64 bits differs: a re-upload
+        "bbbbbbbbbbb": fingerprint("1" * 64),
+        "ccccccccccc": fingerprint("1" * 62 + "00"),  # same audio as B, listed later
+        "ddddddddddd": None,  # no sample, never a duplicate
+    }
+    monkeypatch.setattr(ingest, "sample_fingerprint", lambda url, *args: fingerprints[url[-11:]])
+
+    new, skipped, index_path = ingest.plan_ingest(config, ingest.load_listing(dump))
+    assert [video["id"] for video in new] == ["bbbbbbbbbbb", "ddddddddddd"]
+    assert [(video["id"], reason) for video, reason in skipped] == [
+        ("aaaaaaaaaaa", "same audio as zzzzzzzzzzz"), ("ccccccccccc", "same audio as bbbbbbbbbbb")]
+    index = ingest.load_index(index_path)
+    assert index["aaaaaaaaaaa"]["status"] == index["ccccccccccc"]["status"] == "duplicate"
+    assert "bbbbbbbbbbb" not in index
+
+
+REUPLOADS = {
+    "aaaaaaaaaaa": fingerprint("01" * 32),
+    "bbbbbbbbbbb": fingerprint("01" * 32),  # re-upload of A
+    "ccccccccccc": fingerprint("1" * 64),
+    "ddddddddddd": fingerprint("0011" * 16),
+}
+
+
+def test_plan_ingest_samples_only_what_the_limit_needs(dump, tmp_path, monkeypatch):
+    config = make_config(tmp_path, max_distance=0.1)
+    sampled = []
+
+    def sample(url, *args):
+        sampled.append(url[-11:])
+        return REUPLOADS[url[-11:]]
+    monkeypatch.setattr(ingest, "sample_fingerprint", sample)
+
+    new, skipped, _ = ingest.plan_ingest(config, ingest.load_listing(dump), limit=2)
+    assert [video["id"] for video in new] == ["aaaaaaaaaaa", "ccccccccccc"]
+    # B turned out to be a duplicate, so one more candidate was sampled - D never was
+    assert sampled == ["aaaaaaaaaaa", "bbbbbbbbbbb", "ccccccccccc"]
+    assert [video["id"] for video, _ in skipped] == ["bbbbbbbbbbb"]
+
+
+def test_dry_run_leaves_the_index_unchanged(dump, tmp_path, monkeypatch):
+    config = make_config(tmp_path, max_distance=0.1)
+    ingest.update_index(config.ingest.index_path, "zzzzzzzzzzz", status="done", fingerprint=REUPLOADS["ccccccccccc"])
+    before = (tmp_path / "index.json").read_bytes()
+    monkeypatch.setattr(ingest, "sample_fingerprint", lambda url, *args: REUPLOADS[url[-11:]])
+
+    results, skipped = ingest.ingest(config, dump, lambda url: pytest.fail("nothing is processed"), dry_run=True)
+    assert results == []
+    assert sorted(reason for _, reason in skipped) == ["same audio as aaaaaaaaaaa", "same audio as zzzzzzzzzzz"]
+    assert (tmp_path / "index.json").read_bytes() == before
+
+
+def test_fingerprint_distance():
+    bits = "0110" * 16
+    assert ingest.fingerprint_distance(fingerprint(bits), fingerprint(bits)) == 0.0
+    assert ingest.fingerprint_distance(fingerprint(bits), fingerprint("1" + bits[1:])) == 1 / 64
+    flipped = "".join("1" if bit == "0" else "0" for bit in bits)
+    assert ingest.fingerprint_distance(fingerprint(bits), fingerprint(flipped)) == 1.0
+
+
+def test_fingerprint_distance_keeps_leading_zeros_and_common_length():
+    # the hex value drops leading zero bits, the length restores them
+    assert ingest.fingerprint_distance(fingerprint("0" * 40), fingerprint("0" * 40)) == 0.0
+    assert ingest.fingerprint_distance(fingerprint("01" * 20), fingerprint("01" * 30)) == 0.0
+
+
+def test_fingerprint_distance_not_comparable():
+    assert ingest.fingerprint_distance(None, fingerprint("01" * 20)) == 1.0
+    assert ingest.fingerprint_distance(fingerprint("01" * 10), fingerprint("01" * 10)) == 1.0
@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+from conftest import ROOT, load_source
+
+layout_cache = load_source("scripts/models/process_video/layout_cache.py")
+
+FONT = os.path.join(ROOT, "fonts", "PoetsenOne-Regular.ttf")
+
+
+def subcaptions(count, produced):
+    """`count` one-second subcaptions, counting how many were generated."""
+    for i in range(count):
+        produced.append(i)
+        yield {"start": float(i), "end": i + 1.0, "current_word": 0,
+               "lines": [{"text": f"word {i}", "height": 20, "x": "center", "y": 30, "highlight": 0}]}
+
+
+def test_layout_is_written_and_read_one_row_at_a_time(tmp_path):
+    path = str(tmp_path / "video.layout.jsonl")
+    produced = []
+    saving = layout_cache.save_layout(path, "key", subcaptions(1000, produced))
+    first = [next(saving) for _ in range(3)]
+    assert len(produced) == 3
+    assert not layout_cache.has_layout(path, "key")  # not complete yet
+
+    assert len(list(saving)) == 997
+    assert layout_cache.has_layout(path, "key")
+    assert not layout_cache.has_layout(path, "other key")
+
+    loading = layout_cache.load_layout(path)
+    assert [next(loading) for _ in range(3)] == first
+
+
+def test_interrupted_layout_leaves_no_file(tmp_path):
+    path = str(tmp_path / "video.layout.jsonl")
+    saving = layout_cache.save_layout(path, "key", subcaptions(1000, []))
+    next(saving)
+    saving.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_streaming_render_with_layout_cache_stays_lazy(tmp_path, monkeypatch):
+    pytest.importorskip("moviepy")
+    pytest.importorskip("numpy")
+    import scripts.models.process_video as process_video
+    from moviepy.video.VideoClip import ColorClip
+
+    produced = []
+    monkeypatch.setattr(process_video, "iter_subcaptions", lambda *args: subcaptions(100_000, produced))
+    path = str(tmp_path / "video.layout.jsonl")
+    video = ColorClip((160, 90), color=(0, 0, 0), duration=100_000)
+    subtitle = [{"start": 0.0, "end": 1.0, "text": "word", "words": [{"word": "word", "start": 0.0, "end": 1.0}]}]
+
+    clip = process_video.add_captions(video, subtitle, font=FONT, font_size=10, streaming=True,
+                                      window_seconds=30.0, layout_path=path)
+    clip.get_frame(0)
+    clip.get_frame(10)
+    # only the look-ahead window was laid out (and written), not the 100000 rows
+    assert len(produced) < 100
+    assert not os.path.exists(path)
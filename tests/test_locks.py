@@ -0,0 +1,75 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+from conftest import ROOT
+from scripts.models.youtube.locks import file_lock
+from scripts.src.files import atomic_write_text
+
+PROCESSES = 8
+ALLOCATIONS = 10
+
+# Each worker reserves folders and records them in a shared json index with a
+# read-modify-write under the lock, as downloads and ingest do.
+WORKER = textwrap.dedent('''
+    import json, os, sys
+    sys.path.append(sys.argv[1])
+    from scripts.models.youtube.downloader import allocate_nested_folders
+    from scripts.models.youtube.locks import file_lock
+    from scripts.src.files import atomic_write_text
+
+    base, worker = sys.argv[2], sys.argv[3]
+    counter_file, index_path = os.path.join(base, "counter.txt"), os.path.join(base, "index.json")
+    while not os.path.exists(os.path.join(base, "go")):
+        pass
+    for i in range({allocations}):
+        counter, folders = allocate_nested_folders(base, "channel", counter_file)
+        with open(os.path.join(folders["main_folder"], "owner"), "x") as owner:
+            owner.write(worker)
+        with file_lock(index_path + ".lock"):
+            try:
+                with open(index_path) as file:
+                    index = json.load(file)
+            except OSError:
+                index = {{}}
+            index[str(counter)] = worker
+            atomic_write_text(index_path, json.dumps(index))
+        print("allocated", counter)
+''').format(allocations=ALLOCATIONS)
+
+
+def test_parallel_processes_get_distinct_folders_and_keep_every_index_update(tmp_path):
+    base = str(tmp_path)
+    # a folder left from before the counter was reset: its counter is skipped, not shared
+    os.makedirs(os.path.join(base, "youtube", "3_youtube_channel"))
+
+    workers = [subprocess.Popen([sys.executable, "-c", WORKER, ROOT, base, str(i)],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+               for i in range(PROCESSES)]
+    open(os.path.join(base, "go"), "w").close()
+    counters = []
+    for worker in workers:
+        stdout, stderr = worker.communicate(timeout=120)
+        assert worker.returncode == 0, stderr
+        counters.extend(int(line.split()[1]) for line in stdout.splitlines() if line.startswith("allocated "))
+
+    total = PROCESSES * ALLOCATIONS
+    assert len(counters) == total
+    assert len(set(counters)) == total
+    assert 3 not in counters
+    with open(os.path.join(base, "index.json")) as file:
+        index = json.load(file)
+    assert sorted(map(int, index)) == sorted(counters)
+    with open(os.path.join(base, "counter.txt")) as file:
+        assert int(file.read()) == total + 2
+
+
+def test_atomic_write_leaves_no_temp_files(tmp_path):
+    path = str(tmp_path / "value.txt")
+    with file_lock(path + ".lock"):
+        atomic_write_text(path, "1")
+        atomic_write_text(path, "2")
+    assert open(path).read() == "2"
+    assert sorted(os.listdir(tmp_path)) == ["value.txt", "value.txt.lock"]
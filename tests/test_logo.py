@@ -0,0 +1,125 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+pytest.importorskip("moviepy")  # logo.py loads clips with it
+from scripts.models.process_video import logo  # noqa: E402
+
+
+def blend(frame, rgb, alpha, x, y):
+    """Float reference: rgb over frame with straight alpha, clipped to the frame."""
+    out = frame.astype(np.float64)
+    height, width = alpha.shape
+    for row in range(max(y, 0), min(y + height, frame.shape[0])):
+        for col in range(max(x, 0), min(x + width, frame.shape[1])):
+            a = alpha[row - y, col - x]
+            out[row, col] = rgb[row - y, col - x] * a + out[row, col] * (1 - a)
+    return out
+
+
+def random_sprite(rng, height, width):
+    rgb = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    alpha = rng.uniform(0, 1, (height, width)).astype(np.float32)
+    alpha[0, 0], alpha[-1, -1] = 0.0, 1.0
+    return rgb, alpha
+
+
+#-----------------------------------sprite overlay-----------------------------------
+@pytest.mark.parametrize("x, y", [(5, 7), (-3, -4), (36, 20), (100, 100)])
+def test_sprite_overlay_blends_like_the_float_reference(x, y):
+    rng = np.random.default_rng(1)
+    frame = rng.integers(0, 256, (30, 40, 3), dtype=np.uint8)
+    rgb, alpha = random_sprite(rng, 9, 11)
+    overlay = logo.SpriteOverlay([(rgb, alpha, 0, 0)], 25, lambda t: (x, y))
+
+    drawn = overlay.draw(lambda t: frame, 0.0)
+    # blit truncates to uint8
+    assert np.abs(drawn.astype(np.float64) - blend(frame, rgb, alpha, x, y)).max() < 1.0
+    assert drawn is not frame
+
+
+def test_sprite_overlay_loops_over_the_phases():
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    alpha = np.ones((1, 1), dtype=np.float32)
+    phases = [(np.full((1, 1, 3), value, dtype=np.uint8), alpha, value // 100, 0) for value in (0, 100, 200)]
+    overlay = logo.SpriteOverlay(phases, 3, lambda t: (0, 0))
+
+    def drawn_at(t):
+        out = overlay.draw(lambda _: frame, t)
+        return [(col, int(out[0, col, 0])) for col in range(4) if out[0, col, 0]]
+
+    # phase i is drawn at its (dx, dy) offset
+    assert drawn_at(0.0) == []
+    assert drawn_at(1 / 3) == [(1, 100)]
+    assert drawn_at(2 / 3 + 1e-6) == [(2, 200)]
+    assert drawn_at(1.0 + 1 / 3) == [(1, 100)]
+
+
+def test_sprite_overlay_opacity():
+    frame = np.full((2, 2, 3), 100, dtype=np.uint8)
+    sprite = [(np.full((2, 2, 3), 200, dtype=np.uint8), np.ones((2, 2), dtype=np.float32), 0, 0)]
+
+    hidden = logo.SpriteOverlay(sprite, 25, lambda t: (0, 0), opacity=lambda t: 0.0)
+    assert hidden.draw(lambda t: frame, 0.0) is frame
+    half = logo.SpriteOverlay(sprite, 25, lambda t: (0, 0), opacity=lambda t: 0.5)
+    assert (half.draw(lambda t: frame, 0.0) == 150).all()
+    assert (frame == 100).all()
+
+
+def test_pulse_sprite_is_one_cycle_centered_on_the_image():
+    image = Image.new("RGBA", (40, 20), (255, 255, 255, 255))
+    frames = logo.build_sprite(image, "pulse", fps=30, speed=2.0)
+    assert len(frames) == 15
+    widths = [rgb.shape[1] for rgb, _, _, _ in frames]
+    assert min(widths) == 36 and max(widths) == 44
+    for rgb, alpha, dx, dy in frames:
+        assert alpha.shape == rgb.shape[:2]
+        assert (dx, dy) == ((40 - rgb.shape[1]) // 2, (20 - rgb.shape[0]) // 2)
+
+    assert len(logo.build_sprite(image, "bounce", fps=30)) == 1
+
+
+def test_fade_factor():
+    assert logo.fade_factor("bounce", 0.0, 10) == 1.0
+    assert logo.fade_factor("fade_in_out", 0.0, 10) == 0.0
+    assert logo.fade_factor("fade_in_out", 0.5, 10) == pytest.approx(0.5)
+    assert logo.fade_factor("fade_in_out", 5.0, 10) == 1.0
+    assert logo.fade_factor("fade_in_out", 10.0, 10) == 0.0
+
+
+#-----------------------------------image logo-----------------------------------
+@pytest.fixture
+def logo_png(tmp_path):
+    rng = np.random.default_rng(2)
+    pixels = rng.integers(0, 256, (12, 16, 4), dtype=np.uint8)
+    pixels[0, :, 3], pixels[1, :, 3] = 0, 255
+    path = str(tmp_path / "logo.png")
+    Image.fromarray(pixels).save(path)
+    return path, pixels
+
+
+@pytest.mark.parametrize("x, y", [(3, 2), (-5, -6), (30, 25), (50, 50)])
+@pytest.mark.parametrize("opacity", [1.0, 0.6])
+def test_blit_premultiplied_matches_the_float_reference(logo_png, x, y, opacity):
+    path, pixels = logo_png
+    premultiplied, alpha = logo.load_logo(path, 16, opacity)
+    frame = np.random.default_rng(3).integers(0, 256, (32, 40, 3), dtype=np.uint8)
+
+    expected = blend(frame, pixels[:, :, :3], pixels[:, :, 3] / 255.0 * opacity, x, y)
+    drawn = logo.blit_premultiplied(frame.copy(), premultiplied, alpha, x, y)
+    # integer premultiplication and 8-bit alpha: at most one rounding step per term
+    assert np.abs(drawn - expected).max() <= 1.5
+
+
+def test_load_logo_is_cached_per_size_and_opacity(logo_png):
+    path, _ = logo_png
+    first = logo.load_logo(path, 16, 0.5)
+    assert logo.load_logo(path, 16, 0.5) is first
+    assert logo.load_logo(path, 8, 0.5)[1].shape == (6, 8)
+    assert logo.load_logo(path, 16, 1.0) is not first
+
+
+def test_logo_position():
+    assert logo.logo_position("top-left", (100, 50), (20, 10), 5) == (5, 5)
+    assert logo.logo_position("bottom-right", (100, 50), (20, 10), 5) == (75, 35)
+    assert logo.logo_position("center", (100, 50), (20, 10), 5) == (40, 20)
@@ -0,0 +1,84 @@
+import json
+import os
+import time
+
+import pytest
+
+from conftest import fake_ytdlp
+from scripts.models.youtube import metadata
+from scripts.models.youtube.metadata import MetadataCache
+
+URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+DUMP_JSON = """
+if "fail" in args[-1]:
+    sys.stderr.write("ERROR: Video unavailable\\n")
+    sys.exit(1)
+print(json.dumps({"id": args[-1][-11:], "title": "a video", "formats": []}))
+"""
+
+
+@pytest.fixture
+def ytdlp(tmp_path):
+    return fake_ytdlp(tmp_path, DUMP_JSON)
+
+
+def test_cache_key():
+    assert metadata.cache_key(URL) == "dQw4w9WgXcQ"
+    assert metadata.cache_key("https://youtu.be/dQw4w9WgXcQ?t=3") == "dQw4w9WgXcQ"
+    assert metadata.cache_key("https://example.com/video").startswith("url_")
+
+
+def test_memo_and_disk_hits(ytdlp, tmp_path):
+    path, calls = ytdlp
+    cache = MetadataCache(path, str(tmp_path / "cache"), ttl=3600)
+    assert cache.fetch(URL)["id"] == "dQw4w9WgXcQ"
+    assert cache.fetch(URL)["title"] == "a video"
+    assert len(calls()) == 1
+    assert calls()[0][:3] == ['--dump-json', '--skip-download', '--no-playlist']
+
+    # another run: read from the disk cache
+    assert MetadataCache(path, str(tmp_path / "cache"), ttl=3600).fetch(URL)["id"] == "dQw4w9WgXcQ"
+    assert len(calls()) == 1
+
+    assert cache.fetch(URL, refresh=True) is not None
+    assert len(calls()) == 2
+
+
+def test_expired_file_is_fetched_again(ytdlp, tmp_path):
+    path, calls = ytdlp
+    cache = MetadataCache(path, str(tmp_path / "cache"), ttl=100)
+    cache.fetch(URL)
+    old = time.time() - 101
+    os.utime(cache.path(URL), (old, old))
+    MetadataCache(path, str(tmp_path / "cache"), ttl=100).fetch(URL)
+    assert len(calls()) == 2
+
+
+def test_memo_expires_with_the_file_timestamp(ytdlp, tmp_path, monkeypatch):
+    path, calls = ytdlp
+    cache = MetadataCache(path, str(tmp_path / "cache"), ttl=100)
+    os.makedirs(cache.cache_dir)
+    with open(cache.path(URL), 'w') as file:
+        json.dump({"id": "dQw4w9WgXcQ", "title": "cached"}, file)
+    fetched_at = time.time() - 90
+    os.utime(cache.path(URL), (fetched_at, fetched_at))
+
+    assert cache.fetch(URL)["title"] == "cached"
+    assert calls() == []
+
+    # memoized 10 s before it expires: the memo doesn't restart the TTL
+    now = time.time()
+    monkeypatch.setattr(metadata.time, "time", lambda: now + 20)
+    assert cache.fetch(URL)["title"] == "a video"
+    assert len(calls()) == 1
+
+
+def test_failure_is_not_cached(ytdlp, tmp_path):
+    path, calls = ytdlp
+    cache = MetadataCache(path, str(tmp_path / "cache"))
+    url = "https://www.youtube.com/watch?v=failfailfai"
+    assert cache.fetch(url) is None
+    assert cache.fetch(url) is None
+    assert len(calls()) == 2
+    assert not os.path.exists(cache.path(url))
@@ -0,0 +1,77 @@
+import re
+
+import pytest
+
+from conftest import load_source
+
+np = pytest.importorskip("numpy")
+motion = load_source("scripts/models/process_video/motion.py")
+
+FPS = 30
+
+
+def evaluate(expression, t):
+    """Value of an overlay x/y expression at time t (the subset piecewise_expression writes)."""
+    assert re.fullmatch(r"[-+*/().,\d\sa-z]*", expression)
+    functions = {"gte": lambda a, b: float(a >= b), "lt": lambda a, b: float(a < b), "min": min}
+    return eval(expression, {"__builtins__": {}}, {**functions, "t": t})
+
+
+def assert_follows(values, tolerance):
+    expression = motion.piecewise_expression(values, FPS, tolerance)
+    # ffmpeg evaluates the overlay position at the frame times
+    for i, value in enumerate(values):
+        assert abs(evaluate(expression, i / FPS) - value) <= tolerance + 1e-3, i
+    # held after the last frame
+    assert evaluate(expression, len(values) / FPS + 5) == pytest.approx(values[-1], abs=0.01)
+    return expression
+
+
+@pytest.mark.parametrize("tolerance", [0.5, 1.0, 3.0])
+def test_piecewise_expression_follows_the_waypoints(tolerance):
+    path = motion.waypoint_path(10 * FPS, FPS, (0, 0), (600, 1200), leg_seconds=1.5, seed=3)
+    assert_follows(path.xs, tolerance)
+    assert_follows(path.ys, tolerance)
+
+
+def test_piecewise_expression_follows_a_bounce():
+    offsets = motion.bounce_offsets(4 * FPS, FPS, height=20, speed=1.3)
+    assert_follows(np.rint(offsets), 1.0)
+
+
+def test_breakpoints_of_straight_and_constant_paths():
+    path = motion.linear_path((-50, 300), (650, 300), 5 * FPS + 1, FPS)
+    assert motion.breakpoints(path.xs) == [0, 5 * FPS]
+    assert motion.piecewise_expression(path.ys, FPS) == "300"
+    assert motion.breakpoints(np.r_[np.zeros(10), np.arange(10) * 5.0]) == [0, 10, 19]
+
+
+def test_breakpoints_stay_within_tolerance():
+    values = np.cumsum(np.random.default_rng(4).normal(0, 3, 500))
+    points = motion.breakpoints(values, 2.0)
+    assert points[0] == 0 and points[-1] == len(values) - 1
+    fitted = np.interp(np.arange(len(values)), points, values[points])
+    assert np.abs(fitted - values).max() <= 2.0
+    # fewer segments than frames, or the export is pointless
+    assert len(points) < len(values) / 2
+
+
+def test_overlay_filter():
+    path = motion.linear_path((0, 10), (90, 10), 3 * FPS + 1, FPS)
+    x, y = path.to_ffmpeg()
+    assert path.overlay_filter() == f"overlay=x='{x}':y='{y}':eval=frame"
+    assert y == "10"
+
+
+def test_path_lookup():
+    path = motion.linear_path((0, 0), (29, 58), FPS, FPS)
+    assert len(path) == FPS
+    assert path(0) == (0, 0)
+    assert path(7 / FPS) == (7, 14)
+    assert path(10.0) == (29, 58)
+    assert path.shifted(dx=1, dy=-1)(7 / FPS) == (8, 13)
+
+    pulsed = motion.pulse_path(path, (100, 40), speed=1.0, amplitude=0.1)
+    assert pulsed.scale(0.25) == pytest.approx(1.1, abs=1e-3)
+    # shifted so the scaled overlay stays centered
+    assert pulsed(0.25) == (path(0.25)[0] - 5, path(0.25)[1] - 2)
@@ -0,0 +1,41 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("moviepy")  # add_captions lives in the process_video package
+import scripts.models.process_video as process_video  # noqa: E402
+from scripts.src import pipeline  # noqa: E402
+from scripts.src.config import from_dict  # noqa: E402
+
+
+@pytest.fixture
+def rendered_layouts(monkeypatch):
+    """layout_path of every add_captions call; the captions themselves are skipped."""
+    layouts = []
+
+    def add_captions(video_path, layout_path=None, **style):
+        layouts.append(layout_path)
+        return video_path  # a str: nothing to encode
+    monkeypatch.setattr(process_video, "add_captions", add_captions)
+    return layouts
+
+
+def render(tmp_path, subtitle_path=None):
+    video_path = str(tmp_path / "download" / "clip.mp4")
+    config = from_dict({"video_path": video_path, "video_editor": {"logo": {"enabled": False}}}, check_files=False)
+    output_dir = pipeline.prepare_dirs(video_path)
+    return pipeline.render_stage(config, video_path, [], output_dir, subtitle_path=subtitle_path)
+
+
+def test_layout_is_cached_next_to_the_saved_subtitle(tmp_path, rendered_layouts):
+    render(tmp_path)
+    assert rendered_layouts == [str(tmp_path / "subtitle" / "clip.layout.jsonl")]
+
+
+def test_layout_is_cached_next_to_a_given_subtitle(tmp_path, rendered_layouts):
+    subtitle_path = tmp_path / "edited" / "clip_v2.json"
+    os.makedirs(subtitle_path.parent)
+    subtitle_path.write_text(json.dumps([]))
+    render(tmp_path, str(subtitle_path))
+    assert rendered_layouts == [str(tmp_path / "edited" / "clip_v2.layout.jsonl")]
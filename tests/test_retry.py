@@ -0,0 +1,127 @@
+import json
+import os
+
+import pytest
+
+from conftest import fake_ytdlp
+from scripts.models.youtube import retry
+
+# Fails with the stderr lines of plan.json in turn (null = succeed), leaving a
+# .part file behind like an interrupted download, and logs whether the .part of
+# the previous attempt was there when it started.
+FAKE = """
+import os
+directory = os.path.dirname(os.path.abspath(sys.argv[0]))
+with open(os.path.join(directory, "plan.json")) as file:
+    plan = json.load(file)
+with open(os.path.join(directory, "calls.jsonl")) as file:
+    attempt = len(file.readlines()) - 1
+template = args[args.index("-o") + 1].replace(".%(ext)s", "")
+part = template + ".f137.mp4.part"
+with open(os.path.join(directory, "parts.jsonl"), "a") as log:
+    log.write(json.dumps(os.path.exists(part)) + "\\n")
+error = plan[attempt] if attempt < len(plan) else None
+if error:
+    with open(part, "a") as file:
+        file.write("x")
+    sys.stderr.write("ERROR: " + error + "\\n")
+    sys.exit(1)
+if os.path.exists(part):
+    os.replace(part, template + ".mp4")
+else:
+    open(template + ".mp4", "w").close()
+"""
+
+ERRORS = {
+    "unavailable": "[youtube] abc: Private video. Sign in if you've been granted access",
+    "rate_limited": "unable to download video data: HTTP Error 429: Too Many Requests",
+    "format_unavailable": "[youtube] abc: Requested format is not available. Use --list-formats",
+    "certificate": "[SSL: CERTIFICATE_VERIFY_FAILED] certificate verify failed",
+    "extractor": "[youtube] abc: Signature extraction failed: Some formats may be missing",
+    "network": "unable to download video data: <urlopen error timed out>",
+    "unknown": "something nobody has seen before",
+}
+
+
+@pytest.fixture
+def download(tmp_path, monkeypatch):
+    """run(plan, **kwargs) -> (result, calls, .part seen at each start, waits)."""
+    path, calls = fake_ytdlp(tmp_path, FAKE)
+    waits = []
+    monkeypatch.setattr(retry, "sleep", lambda seconds, token=None: waits.append(seconds))
+    # the top of the jitter range, so the backoff is deterministic
+    monkeypatch.setattr(retry.random, "uniform", lambda low, high: high)
+    template = str(tmp_path / "video")
+
+    def run(plan, **kwargs):
+        with open(tmp_path / "plan.json", "w") as file:
+            json.dump([ERRORS.get(kind) for kind in plan], file)
+        cmd = [path, "https://www.youtube.com/watch?v=abcdefghijk", "-f", "137+140", "-o", template + ".%(ext)s"]
+        result = retry.run_with_retry(cmd, template, base_delay=1.0, max_delay=60.0, **kwargs)
+        with open(tmp_path / "parts.jsonl") as file:
+            parts = [json.loads(line) for line in file]
+        return result, calls(), parts, waits
+
+    return run
+
+
+@pytest.mark.parametrize("kind", ERRORS)
+def test_classify(kind):
+    assert retry.classify(ERRORS[kind]) == kind
+
+
+def test_network_errors_back_off_and_resume_the_part(download, tmp_path):
+    result, calls, parts, waits = download(["network", "network", None])
+    assert result == (0, None)
+    assert len(calls) == 3
+    assert all("--continue" in call for call in calls)
+    # same command every time, the .part of the failed attempt is resumed
+    assert calls[0] == calls[1] == calls[2]
+    assert parts == [False, True, True]
+    assert waits == [1.0, 2.0]
+    assert os.path.exists(tmp_path / "video.mp4")
+
+
+def test_rate_limit_backs_off_longer(download):
+    result, calls, parts, waits = download(["rate_limited", None])
+    assert result == (0, None)
+    assert waits == [4.0]
+
+
+def test_unavailable_gives_up_at_once(download):
+    result, calls, parts, waits = download(["unavailable", None])
+    assert result == (1, "unavailable")
+    assert len(calls) == 1
+    assert waits == []
+
+
+def test_format_unavailable_drops_the_selector_and_the_part(download):
+    result, calls, parts, waits = download(["format_unavailable", None])
+    assert result == (0, None)
+    assert "-f" in calls[0] and "-f" not in calls[1]
+    # another format: the .part of the first one is removed, not resumed
+    assert parts == [False, False]
+    assert waits == []
+
+
+@pytest.mark.parametrize("kind, flag, waited", [("certificate", "--no-check-certificate", False),
+                                                 ("extractor", "--force-generic-extractor", True)])
+def test_command_changes(download, kind, flag, waited):
+    result, calls, parts, waits = download([kind, None])
+    assert result == (0, None)
+    assert flag not in calls[0] and flag in calls[1]
+    assert parts == [False, False]
+    assert bool(waits) == waited
+
+
+def test_same_fix_twice_gives_up(download):
+    result, calls, parts, waits = download(["certificate", "certificate", None])
+    assert result == (1, "certificate")
+    assert len(calls) == 2
+
+
+def test_attempts_are_bounded(download):
+    result, calls, parts, waits = download(["unknown"] * 5, max_attempts=3)
+    assert result == (1, "unknown")
+    assert len(calls) == 3
+    assert len(waits) == 2
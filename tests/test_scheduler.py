@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+from scripts.src.cancel import Cancelled, CancelToken, StageTimeout
+from scripts.src.scheduler import ResourceScheduler, StageCost
+
+
+def acquire_in_thread(scheduler, name, cost, token=None):
+    """Start acquire() in a thread; returns (thread, result dict with "ticket" or "error")."""
+    result = {}
+
+    def run():
+        try:
+            result["ticket"] = scheduler.acquire(name, cost, token)
+        except Cancelled as error:
+            result["error"] = error
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, result
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    scheduler = ResourceScheduler(ram_mb=1000, cores=4)
+    running = scheduler.acquire("encode", StageCost(800, 1))
+    token = CancelToken("job")
+    thread, result = acquire_in_thread(scheduler, "transcribe", StageCost(500, 1), token)
+    time.sleep(0.1)
+    assert scheduler.metrics()["queue_depth"] == 1
+
+    start = time.monotonic()
+    token.cancel()
+    thread.join(timeout=2)
+    assert not thread.is_alive() and time.monotonic() - start < 1.0
+    assert isinstance(result["error"], Cancelled)
+    assert scheduler.metrics()["queue_depth"] == 0
+
+    scheduler.release(running)
+    assert scheduler.metrics()["ram_in_use_mb"] == 0
+
+
+def test_waiter_times_out_with_its_stage():
+    scheduler = ResourceScheduler(ram_mb=1000, cores=4)
+    scheduler.acquire("encode", StageCost(1000, 1))
+    with pytest.raises(StageTimeout):
+        with scheduler.stage("transcribe", StageCost(500, 1), CancelToken("transcribe", timeout=0.3)):
+            pass
+    assert scheduler.metrics()["queue_depth"] == 0
+
+
+def test_cancelled_starving_waiter_unblocks_the_others():
+    scheduler = ResourceScheduler(ram_mb=1000, cores=4, max_wait=0.05)
+    running = scheduler.acquire("encode", StageCost(600, 1))
+    token = CancelToken("big")
+    big, big_result = acquire_in_thread(scheduler, "big", StageCost(900, 1, est_seconds=100), token)
+    time.sleep(0.1)
+    # starving, the big stage keeps the small one out although it fits
+    small, small_result = acquire_in_thread(scheduler, "small", StageCost(300, 1, est_seconds=1), CancelToken())
+    time.sleep(0.3)
+    assert "ticket" not in small_result
+
+    token.cancel()
+    big.join(timeout=2)
+    small.join(timeout=2)
+    assert isinstance(big_result["error"], Cancelled)
+    assert small_result["ticket"].name == "small"
+    scheduler.release(small_result["ticket"])
+    scheduler.release(running)
+
+
+def test_waiters_are_admitted_on_release():
+    scheduler = ResourceScheduler(ram_mb=1000, cores=4)
+    running = scheduler.acquire("encode", StageCost(1000, 1))
+    thread, result = acquire_in_thread(scheduler, "transcribe", StageCost(500, 1))
+    time.sleep(0.1)
+    scheduler.release(running)
+    thread.join(timeout=2)
+    assert result["ticket"].cost.ram_mb == 500
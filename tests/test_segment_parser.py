@@ -0,0 +1,119 @@
+import random
+
+import pytest
+
+from conftest import ROOT, load_source
+
+segment_parser = load_source("scripts/models/process_video/segment_parser.py")
+LineFitter = segment_parser.LineFitter
+
+ADVANCE = {c: 10 + (ord(c) * 7) % 13 for c in "abcdefghijklmnopqrstuvwxyz. x"}
+
+
+def clip_width(text):
+    # like get_text_size_ex: the advances of all characters but the last, plus the last
+    # character's own clip with its (50, 50) margin, so not additive over words
+    return sum(ADVANCE[c] for c in text[:-1]) + ADVANCE[text[-1]] + 100
+
+
+def calculate_lines(text, measure, max_width):
+    """The greedy wrap of process_video.calculate_lines, measuring the growing line for every word."""
+    lines, line = [], ""
+    for word in text.split():
+        if line and measure(f"{line} {word}") < max_width:
+            line = f"{line} {word}"
+        else:
+            if line:
+                lines.append(line)
+            line = word
+    return lines + [line] if line else lines
+
+
+def transcript(word_count, seed=0):
+    rng = random.Random(seed)
+    vocabulary = ["a", "the", "video", "subtitle", "caption", "frame", "word.", "un", "believable", "x"]
+    segments, t = [], 0.0
+    for s in range(word_count // 10):
+        words = []
+        for w in range(10):
+            text = rng.choice(vocabulary)
+            words.append({"word": text if w and rng.random() < 0.05 else " " + text, "start": t, "end": t + 0.3})
+            t += 0.3
+        segments.append({"words": words})
+    return segments
+
+
+def reference_fit(measure, max_width, line_count, process=lambda text: text):
+    return lambda text: len(calculate_lines(process(text), measure, max_width)) <= line_count
+
+
+def test_short_line_fits_despite_margin():
+    fitter = LineFitter(clip_width, max_width=clip_width("the video") + 1, line_count=1)
+    assert fitter("the video")
+    assert not fitter("the video a")
+
+
+@pytest.mark.parametrize("line_count, max_width", [(1, 300), (2, 400), (3, 900)])
+def test_line_breaks_match_calculate_lines(line_count, max_width):
+    segments = transcript(3000)
+    fitted = segment_parser.parse(segments, LineFitter(clip_width, max_width, line_count))
+    expected = segment_parser.parse(segments, reference_fit(clip_width, max_width, line_count))
+    assert [c["text"] for c in fitted] == [c["text"] for c in expected]
+
+
+def test_processed_captions_wrap_whole():
+    # stands in for process_arabic_text: the caption is reordered as a whole, not word by word
+    def process(text):
+        return " ".join(text.split()[::-1]) if "un" in text.split() else text
+
+    segments = transcript(2000, seed=1)
+    fitted = segment_parser.parse(segments, LineFitter(clip_width, 400, 2, process=process))
+    expected = segment_parser.parse(segments, reference_fit(clip_width, 400, 2, process))
+    assert [c["text"] for c in fitted] == [c["text"] for c in expected]
+
+
+def test_words_measured_once():
+    calls = []
+
+    def measure(text):
+        calls.append(text)
+        return clip_width(text)
+
+    segment_parser.parse(transcript(2000), LineFitter(measure, 600, 2))
+    assert len(calls) < 2000
+
+
+def test_parse_does_not_modify_segments():
+    segments = [{"words": [{"word": " un", "start": 0, "end": 1}, {"word": "believable", "start": 1, "end": 2},
+                           {"word": " video", "start": 2, "end": 3}]}]
+    captions = segment_parser.parse(segments, LineFitter(clip_width, 1000, 1))
+    assert [w["word"] for w in segments[0]["words"]] == [" un", "believable", " video"]
+    assert [w["word"] for w in captions[0]["words"]] == [" unbelievable", " video"]
+
+
+def test_fits_frame_matches_calculate_lines_with_real_fonts():
+    pytest.importorskip("moviepy")
+    pytest.importorskip("PIL")
+    pytest.importorskip("arabic_reshaper")
+    pytest.importorskip("bidi")
+    pytest.importorskip("SmartAITool")
+    import os
+    from scripts.models import process_video
+
+    texts = {
+        "fonts/PoetsenOne-Regular.ttf": "Welcome back to the channel. Today we are looking at how captions are "
+                                        "split into lines that fit the frame, word by word, for a whole video.",
+        "fonts/Mj Aramco Bold.ttf": "سلام به کانال خوش آمدید. امروز می بینیم که زیرنویس ها چگونه به خط هایی "
+                                    "تقسیم می شوند که در قاب ویدیو جا می گیرند.",
+    }
+    for font, text in texts.items():
+        font = os.path.join(ROOT, font)
+        segments = [{"words": [{"word": " " + word, "start": i, "end": i + 1}
+                               for i, word in enumerate(text.split())]}]
+
+        def baseline(caption):
+            return len(process_video.calculate_lines(caption, font, 60, 3, 620)["lines"]) <= 2
+
+        fitted = process_video.segment_parser.parse(segments, process_video.fits_frame(2, font, 60, 3, 620))
+        expected = process_video.segment_parser.parse(segments, baseline)
+        assert [c["text"] for c in fitted] == [c["text"] for c in expected]
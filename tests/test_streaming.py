@@ -0,0 +1,105 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from conftest import ROOT
+
+pytest.importorskip("numpy")
+resource = pytest.importorskip("resource")
+
+# The child process runs a synthetic one-hour transcript end to end through the
+# streaming path: lazily generated whisper segments -> iter_reformat_subtitle ->
+# iter_parse -> laid out subcaptions -> StreamingCaptions.draw for every frame.
+# Line bitmaps are ~0.5 MB, so keeping the ~9000 line states of the hour would
+# take gigabytes; streaming keeps only the lines on screen.
+CHILD = textwrap.dedent('''
+    import resource
+    import sys
+
+    import numpy as np
+
+    sys.path[:0] = [ROOT, ROOT + "/tests"]
+    from conftest import load_source
+    from scripts.models.subtitle.utils import iter_reformat_subtitle
+
+    segment_parser = load_source("scripts/models/process_video/segment_parser.py")
+    streaming = load_source("scripts/models/process_video/streaming.py")
+
+    DURATION, FPS, FRAME = 3600, 2, (360, 1100)
+    VOCABULARY = ["the", "video", "caption", "streaming", "memory", "render", "frame", "podcast", "hour", "word"]
+
+    def segments():
+        # one 5 s segment of 12 words at a time, the whole hour is never in memory
+        for i in range(DURATION // 5):
+            words = [VOCABULARY[(i * 7 + j) % len(VOCABULARY)] for j in range(12)]
+            yield {"start": i * 5.0, "end": i * 5.0 + 5.0, "text": " ".join(words) + "."}
+
+    def layout():
+        fitter = segment_parser.LineFitter(lambda text: 30 * len(text) + 100, 1000, 2)
+        for caption in segment_parser.iter_parse(iter_reformat_subtitle(segments()), fitter):
+            for i, word in enumerate(caption["words"]):
+                end = caption["words"][i + 1]["start"] if i + 1 < len(caption["words"]) else word["end"]
+                yield {"start": word["start"], "end": end, "current_word": word["word"],
+                       "lines": [{"text": caption["text"], "height": 100, "x": "center", "y": 200}]}
+
+    class Bitmap:
+        mask = None
+
+        def __init__(self, text):
+            self.text = text
+
+        def get_frame(self, t):
+            return np.full((100, 1000, 3), len(self.text) % 255, dtype=np.uint8)
+
+    background = np.zeros(FRAME + (3,), dtype=np.uint8)
+    captions = streaming.StreamingCaptions(layout, lambda line, word: Bitmap(line["text"] + word), 30.0)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    drawn = 0
+    for frame_index in range(DURATION * FPS):
+        frame = captions.draw(lambda t: background, frame_index / FPS)
+        drawn += frame is not background
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(drawn, (peak - baseline) // 1024)
+''')
+
+MAX_RSS_GROWTH_MB = 150
+
+
+def test_one_hour_stream_stays_under_rss_ceiling():
+    result = subprocess.run([sys.executable, "-c", f"ROOT = {ROOT!r}\n" + CHILD],
+                            capture_output=True, text=True, cwd=ROOT, timeout=600)
+    assert result.returncode == 0, result.stderr
+    drawn, growth_mb = map(int, result.stdout.split())
+    # nearly every frame of the hour has a caption on it
+    assert drawn > 3600 * 2 * 0.9
+    assert growth_mb < MAX_RSS_GROWTH_MB, f"peak RSS grew by {growth_mb} MB"
+
+
+def test_subtitle_json_is_written_as_it_is_reformatted():
+    import io
+    import json
+
+    from scripts.models.subtitle.utils import iter_reformat_subtitle, reforamt_subtitle, write_subtitle_json
+
+    segments = [{"start": i * 2.0, "end": i * 2.0 + 2.0, "text": f"segment {i}, señor."} for i in range(3)]
+    produced = []
+
+    def lazy():
+        for segment in segments:
+            produced.append(segment)
+            yield segment
+
+    entries = iter_reformat_subtitle(lazy())
+    assert produced == []  # nothing reformatted until the writer asks
+
+    streamed, dumped = io.StringIO(), io.StringIO()
+    write_subtitle_json(entries, streamed)
+    json.dump(reforamt_subtitle(segments), dumped, indent=4, ensure_ascii=False)
+    assert streamed.getvalue() == dumped.getvalue()
+
+    empty = io.StringIO()
+    write_subtitle_json(iter([]), empty)
+    assert empty.getvalue() == "[]"